@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Микро-бенчмарк извлечения productSummaries со страниц xbox.com.
+
+Сравнивает прежний посимвольный подсчёт скобок с page_json.extract_object
+(JSONDecoder.raw_decode с позиции «{»).
+
+Сохранённые ds2_*.html – это страницы PS Store, а не xbox.com, поэтому
+страница Xbox собирается синтетически: JSON из их __NEXT_DATA__ (~400 КБ)
+кладётся в productSummaries внутри скрипта, как на xbox.com. В описание
+товара добавлена непарная «}» внутри строки – на ней прежний цикл режет
+объект не в том месте.
+Запуск:
+    python bench_ms_summaries.py [N]
+"""
+import json
+import pathlib
+import sys
+import time
+
+from telegram_videogame_bot import page_json
+
+ROOT = pathlib.Path(__file__).resolve().parent
+FIXTURES = sorted(ROOT.glob("ds2_*.html"))
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+KEY = '"productSummaries":'
+
+
+def old_extract(html: str) -> dict:
+    """Прежняя реализация ms_store._extract_product_summaries."""
+    start = html.find(KEY)
+    if start == -1:
+        return {}
+    brace_open = html.find('{', start)
+    if brace_open == -1:
+        return {}
+    depth = 1
+    i = brace_open + 1
+    length = len(html)
+    while i < length and depth:
+        ch = html[i]
+        if ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+        i += 1
+    if depth != 0:
+        return {}
+    try:
+        return json.loads(html[brace_open:i])
+    except Exception:
+        return {}
+
+
+def xbox_like_page(ps_html: str) -> str:
+    data = page_json.extract_next_data(ps_html)
+    summaries = {
+        "9NBLGGH4R315": {"title": "DEATH STRANDING", "description": "Sam :-} Porter", "data": data},
+    }
+    state = {"core2": {"products": {"productSummaries": summaries}}}
+    head, _, tail = ps_html.partition("</head>")
+    return f"{head}<script>window.__PRELOADED_STATE__ = {json.dumps(state)};</script></head>{tail}"
+
+
+def bench(func, html: str) -> float:
+    start = time.perf_counter()
+    for _ in range(N):
+        func(html)
+    return (time.perf_counter() - start) / N * 1000
+
+
+def main() -> None:
+    print(f"N={N}\n")
+    print(f"{'fixture':<14}{'KB':>6}{'old ms':>9}{'new ms':>9}{'x':>7}  old correct")
+    for path in FIXTURES:
+        html = xbox_like_page(path.read_text(encoding="utf-8", errors="ignore"))
+        expected = page_json.extract_object(html, KEY)
+        assert expected and "9NBLGGH4R315" in expected, path.name
+        old_ms = bench(old_extract, html)
+        new_ms = bench(lambda h: page_json.extract_object(h, KEY), html)
+        correct = old_extract(html) == expected
+        print(f"{path.name:<14}{len(html) // 1024:>6}{old_ms:>9.2f}{new_ms:>9.2f}{old_ms / new_ms:>7.1f}  {correct}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Микро-бенчмарк извлечения __NEXT_DATA__ на сохранённых HTML-страницах.
+
+Сравнивает прежний способ (DOTALL-регекс + json.loads) с page_json
+(str.find + orjson/json). Разбор идёт в event loop, так что время
+разбора – это и пауза loop'а на одну страницу.
+Запуск:
+    python bench_page_json.py [N]
+"""
+import json
+import pathlib
+import re
+import sys
+import time
+
+from telegram_videogame_bot import page_json
+
+ROOT = pathlib.Path(__file__).resolve().parent
+FIXTURES = sorted(ROOT.glob("*.html"))
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+
+def old_extract(html: str):
+    m = re.search(r"<script id=\"__NEXT_DATA__\"[^>]*>(\{.*?\})</script>", html, re.DOTALL)
+    return json.loads(m.group(1)) if m else None
+
+
+def bench(func, html: str) -> float:
+    start = time.perf_counter()
+    for _ in range(N):
+        func(html)
+    return (time.perf_counter() - start) / N * 1000
+
+
+def main() -> None:
+    print(f"JSON backend: {page_json.BACKEND}, N={N}\n")
+    print(f"{'fixture':<24}{'KB':>6}{'old ms':>9}{'new ms':>9}{'x':>6}")
+    for path in FIXTURES:
+        html = path.read_text(encoding="utf-8", errors="ignore")
+        if page_json.find_next_data(html) is None:
+            continue
+        assert old_extract(html) == page_json.extract_next_data(html), path.name
+        old_ms = bench(old_extract, html)
+        new_ms = bench(page_json.extract_next_data, html)
+        print(f"{path.name:<24}{len(html) // 1024:>6}{old_ms:>9.2f}{new_ms:>9.2f}{old_ms / new_ms:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,8 @@ from typing import List, Tuple, Dict, Any
 from cachetools import TTLCache
 from loguru import logger
 
+from telegram_videogame_bot import page_json
+
 # --- Caches ---
 _SEARCH_CACHE: TTLCache[str, List[Tuple[str, str]]] = TTLCache(maxsize=1024, ttl=12 * 60 * 60)  # 12h
 _PRODUCT_CACHE: TTLCache[Tuple[str, str], Dict[str, Any]] = TTLCache(maxsize=4096, ttl=30 * 60)  # 30m
@@ -331,14 +333,7 @@ _CURRENCY_SYMBOL_MAP = [
 
 def _extract_next_data(html: str) -> Dict[str, Any] | None:
     """Извлекает JSON из тега <script id="__NEXT_DATA__">...</script>."""
-    m = re.search(r"<script id=\"__NEXT_DATA__\"[^>]*>(\{.*?\})</script>", html, re.DOTALL)
-    if not m:
-        return None
-    try:
-        return json.loads(m.group(1))
-    except Exception as e:
-        logger.warning(f"[PS] JSON decode error: {e}")
-        return None
+    return page_json.extract_next_data(html, source="PS")
 
 
 def _currency_from_price(price_str: str, region: str) -> str:
@@ -18,6 +18,8 @@ from cachetools import TTLCache
 from loguru import logger
 from urllib.parse import urlencode as _urlencode
 
+from telegram_videogame_bot import page_json
+
 
 # --------------------------------------------------------------------------------------
 # Константы
@@ -195,14 +197,7 @@ async def get_offers(game_id: str, *, region: str = "US") -> List[Tuple]:
 
 def _extract_next_data(html: str) -> Dict[str, Any] | None:
     """Извлекает JSON из тега <script id="__NEXT_DATA__">...</script>."""
-    m = re.search(r"<script id=\"__NEXT_DATA__\"[^>]*>(\{.*?\})</script>", html, re.DOTALL)
-    if not m:
-        return None
-    try:
-        return json.loads(m.group(1))
-    except Exception as e:
-        logger.warning(f"[PS2] JSON decode error: {e}")
-        return None
+    return page_json.extract_next_data(html, source="PS2")
 
 _SEARCH_URL_TEMPLATE = "https://store.playstation.com/{locale}/search/{query}"
 
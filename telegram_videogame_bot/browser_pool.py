@@ -0,0 +1,191 @@
+"""Общий пул Playwright-страниц для магазинов без API (EA/Origin).
+
+Раньше каждый вызов origin_store поднимал новый Chromium через
+async_playwright(): секунды на старт и сотни МБ памяти на запрос. Здесь:
+
+• один долгоживущий браузер, запускается лениво при первом запросе;
+• по контексту на локаль, внутри – переиспользуемые страницы;
+• не больше MAX_PAGES страниц одновременно (остальные ждут в очереди);
+• картинки, шрифты, медиа и аналитика блокируются на уровне контекста;
+• браузер закрывается после IDLE_TTL простоя и перезапускается после
+  RECYCLE_AFTER выданных страниц (Chromium со временем разрастается);
+• если playwright не установлен или браузер не запускается, available()
+  возвращает False и магазин просто пропускается.
+
+shutdown() вызывается из main.py.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List
+
+from loguru import logger
+
+MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "3"))
+IDLE_TTL = float(os.getenv("BROWSER_IDLE_TTL", str(5 * 60)))       # сек. простоя до закрытия браузера
+RECYCLE_AFTER = int(os.getenv("BROWSER_RECYCLE_AFTER", "200"))      # страниц до перезапуска браузера
+_LAUNCH_RETRY = 10 * 60     # сек. до новой попытки запуска после ошибки
+
+_BLOCKED_TYPES = {"image", "font", "media"}
+_BLOCKED_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "facebook.net",
+    "hotjar.com", "optimizely.com", "demdex.net", "omtrdc.net", "onetrust.com", "cookielaw.org",
+)
+
+
+async def _block_heavy(route: Any) -> None:
+    request = route.request
+    if request.resource_type in _BLOCKED_TYPES or any(host in request.url for host in _BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    """Один Chromium, контексты по локалям и ограниченный набор страниц."""
+
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+        self._contexts: Dict[str, Any] = {}
+        self._idle: Dict[str, List[Any]] = {}
+        self._slots = asyncio.Semaphore(MAX_PAGES)
+        self._lock = asyncio.Lock()
+        self._in_use = 0
+        self._served = 0
+        self._last_used = 0.0
+        self._launch_failed_at: float | None = None
+        self._reaper: asyncio.Task | None = None
+
+    def available(self) -> bool:
+        """Можно ли сейчас рассчитывать на браузер (playwright есть, запуск не падал недавно)."""
+        if importlib.util.find_spec("playwright") is None:
+            return False
+        return self._launch_failed_at is None or time.monotonic() - self._launch_failed_at > _LAUNCH_RETRY
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._browser is not None,
+            "in_use": self._in_use,
+            "idle": sum(len(pages) for pages in self._idle.values()),
+            "served": self._served,
+            "max_pages": MAX_PAGES,
+        }
+
+    async def _ensure_browser(self) -> Any:
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        from playwright.async_api import async_playwright
+
+        await self._close()
+        try:
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                args=["--disable-dev-shm-usage", "--disable-gpu"]
+            )
+        except Exception:
+            self._launch_failed_at = time.monotonic()
+            await self._close()
+            raise
+        self._launch_failed_at = None
+        self._served = 0
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+        logger.info("[browser] Chromium запущен")
+        return self._browser
+
+    async def _context(self, locale: str) -> Any:
+        context = self._contexts.get(locale)
+        if context is None:
+            browser = await self._ensure_browser()
+            context = await browser.new_context(locale=locale)
+            await context.route("**/*", _block_heavy)
+            self._contexts[locale] = context
+        return context
+
+    async def _acquire(self, locale: str) -> Any:
+        async with self._lock:
+            if self._served >= RECYCLE_AFTER and self._in_use == 0:
+                logger.info(f"[browser] перезапуск после {self._served} страниц")
+                await self._close()
+            idle = self._idle.get(locale)
+            if idle:
+                return idle.pop()
+            context = await self._context(locale)
+            return await context.new_page()
+
+    async def _release(self, locale: str, page: Any, healthy: bool) -> None:
+        if healthy and self._browser is not None and not page.is_closed():
+            try:
+                await page.goto("about:blank")
+                # Простаивающих страниц (по всем локалям) не больше MAX_PAGES
+                if self._browser is not None and sum(map(len, self._idle.values())) < MAX_PAGES:
+                    self._idle.setdefault(locale, []).append(page)
+                    return
+            except Exception:
+                pass
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self, locale: str = "en-US") -> AsyncIterator[Any]:
+        """Страница из пула; после выхода возвращается в пул (или закрывается при ошибке)."""
+        async with self._slots:
+            page = await self._acquire(locale)
+            self._in_use += 1
+            self._served += 1
+            healthy = False
+            try:
+                yield page
+                healthy = True
+            finally:
+                self._in_use -= 1
+                self._last_used = time.monotonic()
+                await self._release(locale, page, healthy)
+
+    async def _reap_idle(self) -> None:
+        while self._browser is not None:
+            await asyncio.sleep(min(IDLE_TTL, 60))
+            if self._in_use == 0 and time.monotonic() - self._last_used > IDLE_TTL:
+                async with self._lock:
+                    if self._in_use == 0:
+                        logger.info("[browser] закрываю браузер после простоя")
+                        await self._close()
+
+    async def _close(self) -> None:
+        self._idle.clear()
+        contexts, self._contexts = list(self._contexts.values()), {}
+        for context in contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    async def shutdown(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._lock:
+            await self._close()
+
+
+pool = BrowserPool()
@@ -0,0 +1,191 @@
+"""Неблокирующий транспорт для Epic Games Store.
+
+cloudscraper синхронный, поэтому раньше каждый запрос занимал поток
+дефолтного executor'а, а HTML-фолбэк цены и вовсе блокировал event loop.
+Здесь:
+
+• сначала запрос идёт через общую aiohttp-сессию (семейство "epic") с
+  cookies и User-Agent, которые cloudscraper получил при последнем решении
+  челленджа Cloudflare;
+• если Cloudflare всё же отвечает 403/503, запрос повторяется через
+  cloudscraper на выделенном ограниченном пуле потоков (_MAX_WORKERS; у
+  каждого потока свой scraper – requests.Session не потокобезопасна), а
+  свежие cookies сохраняются для следующих aiohttp-запросов;
+• stats() – счётчики и задержки для логов/отладки.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Deque, Dict, Optional
+
+import aiohttp
+import cloudscraper
+from loguru import logger
+
+from telegram_videogame_bot import http_client, store_guard
+
+_MAX_WORKERS = int(os.getenv("EPIC_SCRAPER_WORKERS", "4"))
+_CF_STATUSES = {403, 503}   # так Cloudflare отвечает на запрос без решённого челленджа
+
+_executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="epic-scraper")
+# Ожидание свободного потока – в event loop, а не в бесконечной очереди executor'а
+_scraper_slots: asyncio.Semaphore | None = None
+
+_SCRAPER_BROWSER = {'browser': 'chrome', 'platform': 'windows', 'mobile': False}
+_local = threading.local()     # scraper потока пула, создаётся при первом запросе
+
+# Решённые cookies Cloudflare (cf_clearance и др.) и UA, с которым они получены.
+# Меняются только в потоке event loop'а (см. _via_scraper).
+_cf_cookies: Dict[str, str] = {}
+_cf_user_agent: str = cloudscraper.user_agent.User_Agent(browser=_SCRAPER_BROWSER).headers["User-Agent"]
+
+
+@dataclass(slots=True)
+class EpicResponse:
+    status: int
+    text: str
+    via: str    # "aiohttp" | "scraper"
+    # Только у ответов cloudscraper без челленджа: что передать aiohttp-запросам
+    cookies: Optional[Dict[str, str]] = None
+    user_agent: Optional[str] = None
+
+
+# --- Метрики ---
+_stats: Dict[str, Any] = {
+    "requests": 0,
+    "aiohttp_ok": 0,
+    "scraper_fallbacks": 0,
+    "errors": 0,
+    "inflight": 0,
+    "max_inflight": 0,
+    "scraper_inflight": 0,
+}
+_latencies: Deque[float] = deque(maxlen=500)
+
+
+def stats() -> Dict[str, Any]:
+    """Снимок метрик транспорта: счётчики, параллелизм, p50/p90 задержки (сек.)."""
+    lat = sorted(_latencies)
+    pct = lambda q: round(lat[min(len(lat) - 1, int(len(lat) * q))], 3) if lat else None
+    return {**_stats, "p50": pct(0.5), "p90": pct(0.9), "workers": _MAX_WORKERS}
+
+
+def _slots() -> asyncio.Semaphore:
+    global _scraper_slots
+    if _scraper_slots is None:
+        _scraper_slots = asyncio.Semaphore(_MAX_WORKERS)
+    return _scraper_slots
+
+
+def _scraper_call(method: str, url: str, kwargs: Dict[str, Any]) -> EpicResponse:
+    """Выполняется в потоке пула: запрос через scraper этого потока."""
+    scraper = getattr(_local, "scraper", None)
+    if scraper is None:
+        scraper = _local.scraper = cloudscraper.create_scraper(browser=_SCRAPER_BROWSER)
+    resp = scraper.request(method, url, **kwargs)
+    result = EpicResponse(resp.status_code, resp.text, "scraper")
+    if resp.status_code not in _CF_STATUSES:
+        result.cookies = scraper.cookies.get_dict()
+        result.user_agent = scraper.headers.get("User-Agent")
+    return result
+
+
+async def _via_aiohttp(method: str, url: str, *, json: Any, headers: Dict[str, str], timeout: float) -> EpicResponse:
+    session = http_client.get_session("epic")
+    req_headers = {"User-Agent": _cf_user_agent, **headers}
+    async with session.request(
+        method, url, json=json, headers=req_headers, cookies=_cf_cookies,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as resp:
+        return EpicResponse(resp.status, await resp.text(), "aiohttp")
+
+
+async def _via_scraper(method: str, url: str, *, json: Any, headers: Dict[str, str], timeout: float) -> EpicResponse:
+    global _cf_cookies, _cf_user_agent
+    kwargs = {"json": json, "headers": headers or None, "timeout": timeout}
+    loop = asyncio.get_running_loop()
+    # cloudscraper идёт мимо общей сессии, поэтому токен берём сами
+    await store_guard.get("epic").bucket.acquire()
+    async with _slots():
+        _stats["scraper_inflight"] += 1
+        try:
+            resp = await loop.run_in_executor(_executor, partial(_scraper_call, method, url, kwargs))
+        finally:
+            _stats["scraper_inflight"] -= 1
+    if resp.cookies is not None:
+        _cf_cookies = resp.cookies
+        _cf_user_agent = resp.user_agent or _cf_user_agent
+    return resp
+
+
+async def request(
+    method: str,
+    url: str,
+    *,
+    json: Any = None,
+    headers: Dict[str, str] | None = None,
+    timeout: float = 20,
+) -> EpicResponse | None:
+    """Запрос к Epic: aiohttp с сохранёнными cookies, при челлендже – cloudscraper.
+
+    Возвращает None при сетевой ошибке (как и прежний код, который логировал и шёл дальше).
+    """
+    headers = headers or {}
+    if store_guard.is_open("epic"):
+        # Предохранитель разомкнут – не ходим ни через aiohttp, ни через cloudscraper
+        return None
+    _stats["requests"] += 1
+    _stats["inflight"] += 1
+    _stats["max_inflight"] = max(_stats["max_inflight"], _stats["inflight"])
+    started = time.monotonic()
+    try:
+        resp = None
+        try:
+            resp = await _via_aiohttp(method, url, json=json, headers=headers, timeout=timeout)
+        except asyncio.TimeoutError:
+            # Повтор через cloudscraper удвоил бы ожидание пользователя
+            _stats["errors"] += 1
+            logger.warning(f"[Epic] {method} {url}: таймаут {timeout} сек.")
+            return None
+        except store_guard.StoreUnavailable:
+            # Предохранитель разомкнулся, пока запрос ждал токен, – cloudscraper тоже не зовём
+            return None
+        except Exception as e:
+            logger.debug(f"[Epic] aiohttp {method} {url} ошибка: {e}")
+
+        if resp is not None and resp.status not in _CF_STATUSES:
+            _stats["aiohttp_ok"] += 1
+            return resp
+
+        logger.debug(f"[Epic] {method} {url}: Cloudflare/ошибка, повтор через cloudscraper")
+        _stats["scraper_fallbacks"] += 1
+        guard = store_guard.get("epic")
+        try:
+            resp = await _via_scraper(method, url, json=json, headers=headers, timeout=timeout)
+        except Exception:
+            guard.record(False)
+            raise
+        # Если и cloudscraper получил 403/503 – магазин действительно нас не пускает
+        guard.record(resp.status not in _CF_STATUSES and resp.status != 429)
+        return resp
+    except Exception as e:
+        _stats["errors"] += 1
+        logger.warning(f"[Epic] {method} {url} не удался: {e}")
+        return None
+    finally:
+        _stats["inflight"] -= 1
+        _latencies.append(time.monotonic() - started)
+
+
+def shutdown() -> None:
+    """Останавливает пул потоков cloudscraper (не дожидаясь зависших запросов)."""
+    _executor.shutdown(wait=False, cancel_futures=True)
+    logger.info(f"[Epic] транспорт остановлен, метрики: {stats()}")
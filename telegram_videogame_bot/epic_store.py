@@ -2,13 +2,15 @@
 
 import asyncio
 import json
-from functools import partial
-from typing import Any, Dict, List, Tuple, Tuple as _Tuple
+import re
+from typing import Any, Dict, List, Tuple
 
-import cloudscraper
 from cachetools import TTLCache
 from loguru import logger
 
+from telegram_videogame_bot import epic_client, store_cache
+from telegram_videogame_bot.offers import Offer
+
 # --- Constants ---
 GRAPHQL_URL = "https://store.epicgames.com/graphql"
 PRODUCT_URL_TEMPLATE = "https://store.epicgames.com/ru/p/{slug}"
@@ -37,51 +39,44 @@ query searchStoreQuery($keywords: String!, $country: String!, $locale: String, $
 }
 """
 
-# --- Scraper Instance ---
-scraper = cloudscraper.create_scraper(
-    browser={'browser': 'chrome', 'platform': 'windows', 'mobile': False}
-)
-
 # --- Caches ---
 # Ключ кэша: (REGION, game_id) – чтобы цены не путались между странами
-PRODUCT_CACHE: TTLCache[_Tuple[str, str], Dict[str, Any]] = TTLCache(maxsize=2048, ttl=30 * 60)
+PRODUCT_CACHE = store_cache.TieredCache("epic:product", TTLCache(maxsize=2048, ttl=30 * 60))  # 30m
+# game_id → {"namespace", "id"} элемента каталога, без региона: поиск идёт в одном
+# регионе (в боте – US), а цены спрашивают для выбранных пользователем
+OFFER_ID_CACHE = store_cache.TieredCache("epic:offer_id", TTLCache(maxsize=4096, ttl=7 * 24 * 60 * 60))  # 7d
 
 # --- Functions ---
 
 async def _epic_graphql_request(query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Асинхронно выполняет GraphQL-запрос к Epic Games с использованием cloudscraper.
+    Асинхронно выполняет GraphQL-запрос к Epic Games (aiohttp, при челлендже Cloudflare – cloudscraper).
     """
     payload = {"query": query, "variables": variables}
-    logger.debug(f"Отправка GraphQL-запроса в Epic Games через Cloudscraper с переменными: {variables}")
+    logger.debug(f"Отправка GraphQL-запроса в Epic Games с переменными: {variables}")
 
-    loop = asyncio.get_running_loop()
-    try:
-        # scraper.post - синхронная функция, запускаем ее в отдельном потоке
-        request_func = partial(scraper.post, GRAPHQL_URL, json=payload, timeout=25)
-        resp = await loop.run_in_executor(None, request_func)
-        
-        logger.debug(f"Ответ от Epic GraphQL (Cloudscraper). Статус: {resp.status_code}")
-
-        if resp.status_code != 200:
-            logger.warning(
-                f"GraphQL-запрос к Epic (Cloudscraper) провалился со статусом {resp.status_code}. "
-                f"Ответ: {resp.text[:400]}"
-            )
-            return {}
-            
-        return resp.json()
+    resp = await epic_client.request("POST", GRAPHQL_URL, json=payload, timeout=25)
+    if resp is None:
+        return {}
 
-    except json.JSONDecodeError as e:
-        logger.error(f"Ошибка декодирования JSON от Epic GraphQL (Cloudscraper): {e}. Ответ: {resp.text[:200]}")
+    logger.debug(f"Ответ от Epic GraphQL ({resp.via}). Статус: {resp.status}")
+
+    if resp.status != 200:
+        logger.warning(
+            f"GraphQL-запрос к Epic ({resp.via}) провалился со статусом {resp.status}. "
+            f"Ответ: {resp.text[:400]}"
+        )
         return {}
-    except Exception as e:
-        logger.error(f"Неожиданная ошибка при запросе к Epic GraphQL (Cloudscraper): {e}", exc_info=True)
+
+    try:
+        return json.loads(resp.text)
+    except json.JSONDecodeError as e:
+        logger.error(f"Ошибка декодирования JSON от Epic GraphQL ({resp.via}): {e}. Ответ: {resp.text[:200]}")
         return {}
 
 
 async def search_games(query: str, region: str = "RU") -> List[Tuple[str, str]]:
-    """Ищет игры в Epic Games Store, используя GraphQL и Cloudscraper."""
+    """Ищет игры в Epic Games Store через GraphQL."""
     variables = {
         "keywords": query,
         "country": region.upper(),
@@ -99,6 +94,8 @@ async def search_games(query: str, region: str = "RU") -> List[Tuple[str, str]]:
         return []
 
     games = []
+    cache_items = []
+    id_items = []
     for item in elements:
         title = item.get("title")
         slug = item.get("productSlug") or item.get("urlSlug")
@@ -110,52 +107,144 @@ async def search_games(query: str, region: str = "RU") -> List[Tuple[str, str]]:
 
         game_id = f"epic:{namespace}/{slug.replace('/home', '')}"
         games.append((game_id, title))
-        PRODUCT_CACHE[(region.upper(), game_id)] = item
+        cache_items.append(((region.upper(), game_id), item))
+        if item.get("id") and item.get("namespace"):
+            id_items.append((game_id, {"namespace": item["namespace"], "id": item["id"]}))
 
+    await PRODUCT_CACHE.set_many(cache_items)
+    await OFFER_ID_CACHE.set_many(id_items)
     return games
 
 
-async def get_offers(game_id: str, region: str = "RU") -> List[Tuple[str, float, str, str]]:
-    """Возвращает цену (или информацию о бесплатности) для игры Epic Games по её game_id.
+# --- Цены сразу по нескольким регионам ---
 
-    Мы пытаемся сначала взять данные из кэша, сформированного при поиске. Если их нет
-    (например, bot только что перезапустился), пробуем выполнить одиночный поиск по slug.
-    """
+def _price_alias(region: str) -> str:
+    return f"price_{region}"
+
+
+def _multi_price_fields(regions: List[str]) -> str:
+    """Поле price(country: X) под своим алиасом для каждого региона."""
+    return "\n".join(
+        f'{_price_alias(r)}: price(country: "{r}") {{ totalPrice {{ discountPrice originalPrice currencyCode }} }}'
+        for r in regions
+    )
+
+
+def _multi_offer_query(regions: List[str]) -> str:
+    return f"""
+query catalogOfferPrices($namespace: String!, $id: String!, $locale: String) {{
+  Catalog {{
+    catalogOffer(namespace: $namespace, id: $id, locale: $locale) {{
+      title
+      id
+      namespace
+      productSlug
+      urlSlug
+      {_multi_price_fields(regions)}
+    }}
+  }}
+}}
+"""
+
+
+def _multi_search_query(regions: List[str]) -> str:
+    return f"""
+query searchStoreQuery($keywords: String!, $country: String!, $locale: String, $count: Int) {{
+  Catalog {{
+    searchStore(keywords: $keywords, country: $country, locale: $locale, count: $count) {{
+      elements {{
+        title
+        id
+        namespace
+        productSlug
+        urlSlug
+        {_multi_price_fields(regions)}
+      }}
+    }}
+  }}
+}}
+"""
+
+
+async def _fetch_multi_region(game_id: str, regions: List[str], known: Dict[str, Any] | None) -> Dict[str, Dict[str, Any]]:
+    """Один GraphQL-запрос с алиасами price_XX → {region: элемент каталога с полем price}."""
+    if known and known.get("id") and known.get("namespace"):
+        data = await _epic_graphql_request(
+            _multi_offer_query(regions),
+            {"namespace": known["namespace"], "id": known["id"], "locale": "ru-RU"},
+        )
+        element = (data.get("data") or {}).get("Catalog", {}).get("catalogOffer")
+    else:
+        # namespace/id неизвестны (например, L2 отключён и бот перезапустился) –
+        # ищем по slug из game_id формы epic:{namespace}/{slug}
+        _, composite = game_id.split(":", 1)
+        _, slug = composite.split("/", 1)
+        logger.debug(f"Epic: кэш пуст, выполняю одиночный поиск по slug '{slug}' для {regions}.")
+        data = await _epic_graphql_request(
+            _multi_search_query(regions),
+            {"keywords": slug, "country": regions[0], "locale": "ru-RU", "count": 1},
+        )
+        elements = (data.get("data") or {}).get("Catalog", {}).get("searchStore", {}).get("elements", [])
+        element = elements[0] if elements else None
+
+    if not element:
+        return {}
+
+    base = {k: v for k, v in element.items() if not k.startswith("price_")}
+    items = {}
+    for reg in regions:
+        price = element.get(_price_alias(reg))
+        if price:
+            items[reg] = {**base, "price": price}
+    return items
 
-    # Пытаемся достать из кэша
-    cache_key = (region.upper(), game_id)
-    game = PRODUCT_CACHE.get(cache_key)
 
-    # Если в кэше нет — пробуем найти по slug из game_id
-    if game is None:
+async def get_offers_multi(game_id: str, regions: List[str]) -> Dict[str, Offer]:
+    """Цены Epic для нескольких регионов: один GraphQL-запрос на все регионы без кэша.
+
+    Возвращает {region: Offer} только для регионов, где цена нашлась.
+    """
+    regions = [r.upper() for r in regions if re.fullmatch(r"[A-Za-z]{2}", r)]
+    games: Dict[str, Dict[str, Any]] = {}
+    for reg in regions:
+        cached = await PRODUCT_CACHE.get((reg, game_id))
+        if cached is not None:
+            games[reg] = cached
+
+    missing = [reg for reg in regions if reg not in games]
+    if missing:
+        # namespace/id для catalogOffer – из любого закэшированного региона или из поиска
+        # (он мог идти в регионе, которого нет среди выбранных)
+        known = next(iter(games.values()), None) or await OFFER_ID_CACHE.get(game_id)
         try:
-            # game_id имеет форму epic:{namespace}/{slug}
-            _, composite = game_id.split(":", 1)
-            _, slug = composite.split("/", 1)
-            logger.debug(f"Epic get_offers: кэш пуст, выполняю одиночный поиск по slug '{slug}'.")
-            data = await _epic_graphql_request(
-                SEARCH_QUERY,
-                {
-                    "keywords": slug,
-                    "country": region.upper(),
-                    "locale": "ru-RU" if region.upper() == "RU" else "en-US",
-                    "count": 1,
-                },
-            )
-            elements = (
-                data.get("data", {})
-                .get("Catalog", {})
-                .get("searchStore", {})
-                .get("elements", [])
-            )
-            if not elements:
-                return []
-            game = elements[0]
-            PRODUCT_CACHE[cache_key] = game
+            fetched = await _fetch_multi_region(game_id, missing, known)
         except Exception as e:
-            logger.error(f"Epic get_offers: ошибка одиночного поиска для {game_id}: {e}")
-            return []
+            logger.error(f"Epic get_offers_multi: ошибка запроса для {game_id} {missing}: {e}")
+            fetched = {}
+        if fetched:
+            await PRODUCT_CACHE.set_many(((reg, game_id), item) for reg, item in fetched.items())
+            if not known:
+                item = next(iter(fetched.values()))
+                if item.get("id") and item.get("namespace"):
+                    await OFFER_ID_CACHE.set(game_id, {"namespace": item["namespace"], "id": item["id"]})
+            games.update(fetched)
+
+    results = await asyncio.gather(*(_build_offer(game_id, reg, game) for reg, game in games.items()))
+    return {reg: offer for reg, offer in zip(games, results) if offer}
+
+
+async def get_offers(game_id: str, region: str = "RU") -> List[Offer]:
+    """Возвращает цену (или информацию о бесплатности) для игры Epic Games по её game_id.
+
+    Данные берутся из кэша, сформированного при поиске; если их нет, выполняется
+    запрос цены (см. get_offers_multi).
+    """
+    offer = (await get_offers_multi(game_id, [region])).get(region.upper())
+    return [offer] if offer else []
+
 
+async def _build_offer(game_id: str, region: str, game: Dict[str, Any]) -> Offer | None:
+    """Offer из элемента каталога (с HTML-фолбэком цены для валют вне GraphQL)."""
     title = game.get("title")
     
     # --- Цена и флаг «бесплатно» ---
@@ -172,12 +261,16 @@ async def get_offers(game_id: str, region: str = "RU") -> List[Tuple[str, float,
     url = PRODUCT_URL_TEMPLATE.format(slug=slug)
     
     # --- Цена ---
+    old_price = None
     if total_price.get("discountPrice", 0) == 0:
         price = 0.0
         currency = "FREE"
     else:
         price = total_price.get("discountPrice") / 100
         currency = total_price.get("currencyCode", "USD")
+        original = total_price.get("originalPrice")
+        if original and original > total_price["discountPrice"]:
+            old_price = original / 100
 
     # Если запрашиваем RU-цену, но GraphQL вернул валюту отличную от RUB (чаще всего USD)
     # пытаемся вытащить цену из HTML-страницы продукта. У Epic она обычно уже отрисована
@@ -202,17 +295,16 @@ async def get_offers(game_id: str, region: str = "RU") -> List[Tuple[str, float,
                 "User-Agent": "Mozilla/5.0 (compatible; GameBot/1.0)"
             }
             # Пробуем сначала региональный URL (с /ru/). Cloudflare иногда даёт 403.
-            html_resp = scraper.get(url, headers=html_headers, timeout=20)
-            if html_resp.status_code == 403:
+            html_resp = await epic_client.request("GET", url, headers=html_headers, timeout=20)
+            if html_resp is not None and html_resp.status == 403:
                 alt_url = url.replace("/ru/p/", "/p/")
                 logger.info(f"Epic HTML fallback got 403, retry with generic path {alt_url}")
-                html_resp = scraper.get(alt_url, headers=html_headers, timeout=20)
-                if html_resp.status_code == 200:
+                html_resp = await epic_client.request("GET", alt_url, headers=html_headers, timeout=20)
+                if html_resp is not None and html_resp.status == 200:
                     url = alt_url  # обновляем url для ссылке в ответе
                 else:
-                    logger.warning(f"Epic HTML fallback status {html_resp.status_code} for {alt_url}")
-            if html_resp.status_code == 200:
-                import re
+                    logger.warning(f"Epic HTML fallback status {html_resp and html_resp.status} for {alt_url}")
+            if html_resp is not None and html_resp.status == 200:
                 # Ищем число (может содержать пробелы или NBSP) перед знаком ₽, допускаем дробные цены
                 iso, sym = REG_FALLBACK[region.upper()]
                 pattern = rf"(?P<num>[\d\s\u00A0]+(?:[.,]\d{{1,2}})?)\s*{re.escape(sym)}"
@@ -222,16 +314,25 @@ async def get_offers(game_id: str, region: str = "RU") -> List[Tuple[str, float,
                     try:
                         price = float(num_str)
                         currency = iso
+                        old_price = None  # старая цена из GraphQL была в другой валюте
                         logger.info(f"Epic HTML fallback succeeded for {title}: {price} {iso}")
                     except ValueError:
                         logger.warning(f"Epic HTML fallback: cannot convert '{num_str}' to float for {url}")
                 else:
                     logger.info(f"Epic HTML fallback: symbol {sym} not found in page for {url}")
             else:
-                logger.warning(f"Epic HTML fallback status {html_resp.status_code} for {url}")
+                logger.warning(f"Epic HTML fallback status {html_resp and html_resp.status} for {url}")
         except Exception as e:
             logger.warning(f"Epic HTML fallback error for {url}: {e}")
 
     label = "Epic Games" if region.upper() == "RU" else f"Epic Games {region.upper()}"
     
-    return [(label, price, currency, url)] 
\ No newline at end of file
+    return Offer(
+        store="epic",
+        region=region.upper(),
+        label=label,
+        price=price,
+        currency=currency,
+        url=url,
+        old_price=old_price,
+    )
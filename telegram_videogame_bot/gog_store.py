@@ -1,14 +1,18 @@
 """Функции для взаимодействия с GOG.com API."""
 
-import aiohttp
+import asyncio
 from typing import List, Tuple, Dict, Any
 from cachetools import TTLCache
 from loguru import logger
-from fuzzywuzzy import fuzz
+
+from telegram_videogame_bot import http_client, singleflight, store_cache
+from telegram_videogame_bot.offers import Offer
 
 # --- Constants ---
 SEARCH_URL = "https://embed.gog.com/games/ajax/filtered"
 PRODUCT_API_URL_TEMPLATE = "https://api.gog.com/products/{id}"
+PRICES_API_URL_TEMPLATE = "https://api.gog.com/products/{id}/prices"
+REGION_CONCURRENCY = 4   # одновременных запросов цен по странам
 
 HEADERS = {
     "Accept": "application/json",
@@ -17,7 +21,14 @@ HEADERS = {
 
 # --- Caches ---
 # Кэшируем полные объекты продуктов, чтобы не делать повторных запросов
-PRODUCT_CACHE: TTLCache[str, Dict[str, Any]] = TTLCache(maxsize=1024, ttl=30 * 60)  # 30m
+PRODUCT_CACHE = store_cache.TieredCache("gog:product", TTLCache(maxsize=1024, ttl=30 * 60))  # 30m
+# Цены по (gog_id, страна): (price, currency, old_price); () – в стране не продаётся.
+# После 30 мин отдаём из кэша и обновляем в фоне, после 6 ч – ждём запрос
+PRICE_CACHE = store_cache.TieredCache(
+    "gog:price", TTLCache(maxsize=4096, ttl=6 * 60 * 60), soft_ttl=30 * 60
+)
+# Название и slug продукта почти не меняются – нужны только для ссылки
+META_CACHE = store_cache.TieredCache("gog:meta", TTLCache(maxsize=2048, ttl=7 * 24 * 60 * 60))  # 7d
 
 # --- Functions ---
 
@@ -40,13 +51,14 @@ async def search_games(query: str, region: str = "RU") -> List[Tuple[str, str]]:
     }
     
     games = []
+    cache_items = []
+    session = http_client.get_session("gog")
     try:
-        async with aiohttp.ClientSession(headers=HEADERS) as session:
-            async with session.get(SEARCH_URL, params=params, timeout=10) as resp:
-                if resp.status != 200:
-                    logger.warning(f"GOG search API failed with status {resp.status} for query: '{query}'")
-                    return []
-                data = await resp.json()
+        async with session.get(SEARCH_URL, params=params, headers=HEADERS) as resp:
+            if resp.status != 200:
+                logger.warning(f"GOG search API failed with status {resp.status} for query: '{query}'")
+                return []
+            data = await resp.json()
     except Exception as e:
         logger.error(f"Error during GOG search API request: {e}")
         return []
@@ -70,71 +82,131 @@ async def search_games(query: str, region: str = "RU") -> List[Tuple[str, str]]:
         games.append((game_id, title))
         
         # Кэшируем весь объект продукта для get_offers
-        PRODUCT_CACHE[game_id] = product
+        cache_items.append((game_id, product))
 
+    await PRODUCT_CACHE.set_many(cache_items)
     return games
 
 
-async def get_offers(game_id: str, region: str = "RU") -> List[Tuple[str, float, str, str]]:
-    """
-    Получает предложения (цену) для конкретной игры из GOG.com.
-    Данные в основном берутся из кэша, заполненного при поиске.
+async def get_offers(game_id: str, region: str = "RU") -> List[Offer]:
+    """Получает предложения (цену) для конкретной игры из GOG.com (см. get_offers_multi)."""
+    offer = (await get_offers_multi(game_id, [region])).get(region.upper())
+    return [offer] if offer else []
+
+
+async def get_offers_multi(game_id: str, regions: List[str]) -> Dict[str, Offer]:
+    """Цены игры по странам напрямую по id продукта: {region: Offer}.
+
+    Не зависит от кэша поиска: цены запрашиваются у api.gog.com/products/{id}/prices
+    параллельно по регионам (не больше REGION_CONCURRENCY сразу), ссылка строится по
+    slug из META_CACHE (или карточки продукта, если его там нет).
     """
-    if game_id not in PRODUCT_CACHE:
-        # Обычно данные должны быть в кэше после поиска.
-        logger.warning(f"Игра {game_id} не найдена в кэше GOG. Цена может отсутствовать.")
-        return []
+    if not game_id.startswith("gog:"):
+        return {}
+    gog_id = game_id.split(":", 1)[1]
+    regions = [r.upper() for r in regions]
+    sem = asyncio.Semaphore(REGION_CONCURRENCY)
+
+    async def price_for(region: str):
+        cached = await PRICE_CACHE.get((gog_id, region), refresh=lambda: _fetch_price(gog_id, region))
+        if cached is not None:
+            return cached
+        async with sem:
+            return await _fetch_price(gog_id, region)
+
+    url, *prices = await asyncio.gather(_product_url(game_id, gog_id), *(price_for(r) for r in regions))
+    if not url:
+        return {}
+
+    offers = {}
+    for region, entry in zip(regions, prices):
+        if not entry:
+            continue
+        price, currency, old_price = entry
+        label = "GOG.com" if region == "RU" else f"GOG.com {region}"
+        offers[region] = Offer(
+            store="gog",
+            region=region,
+            label=label,
+            price=price,
+            currency="FREE" if price == 0 else currency,
+            url=url,
+            old_price=old_price,
+        )
+    return offers
+
+
+async def _product_url(game_id: str, gog_id: str) -> str | None:
+    """Ссылка на страницу игры: slug из кэша поиска, META_CACHE или api.gog.com/products/{id}."""
+    meta = await META_CACHE.get(gog_id)
+    if meta is None:
+        product = await PRODUCT_CACHE.get(game_id)
+        if product is not None:
+            slug = product.get("slug") or product.get("url", "").split("/")[-1]
+            meta = {"title": product.get("title", ""), "slug": slug}
+        else:
+            meta = await singleflight.run(("gog", "meta", gog_id), lambda: _fetch_meta(gog_id))
+        if meta and meta.get("slug"):
+            await META_CACHE.set(gog_id, meta)
+
+    if not meta or not meta.get("slug"):
+        logger.warning(f"Не найден slug для GOG игры {game_id}, ссылку не построить.")
+        return None
+    return f"https://www.gog.com/game/{meta['slug']}"
+
+
+async def _fetch_meta(gog_id: str) -> Dict[str, Any] | None:
+    session = http_client.get_session("gog")
+    try:
+        async with session.get(PRODUCT_API_URL_TEMPLATE.format(id=gog_id), headers=HEADERS) as resp:
+            if resp.status != 200:
+                logger.warning(f"GOG product API HTTP {resp.status} for {gog_id}")
+                return None
+            data = await resp.json()
+    except Exception as e:
+        logger.error(f"Error during GOG product API request for {gog_id}: {e}")
+        return None
+    return {"title": data.get("title", ""), "slug": data.get("slug")}
 
-    product_data = PRODUCT_CACHE[game_id]
-    
-    # --- URL ---
-    slug = product_data.get("slug")
-    if not slug:
-        logger.warning(f"Не найден slug для GOG игры {game_id}, ссылка может быть неверной.")
-        # Фоллбэк на старое поле 'url'
-        url_path = product_data.get('url', '')
-        slug = url_path.split('/')[-1]
 
-    if not slug:
-        return [] # Не можем построить URL
+def _parse_amount(value: str) -> Tuple[float, str]:
+    """'1999 USD' → (19.99, 'USD'): API отдаёт сумму в минимальных единицах валюты."""
+    amount, currency = value.split()
+    return int(amount) / 100, currency.upper()
+
 
-    url = f"https://www.gog.com/game/{slug}"
+async def _fetch_price(gog_id: str, region: str) -> Tuple[Any, ...] | None:
+    """Цена в одной стране (с кэшированием); None – ошибка сети/ответа."""
+    entry = await singleflight.run(("gog", "price", gog_id, region), lambda: _request_price(gog_id, region))
+    if entry is not None:
+        await PRICE_CACHE.set((gog_id, region), entry)
+    return entry
 
-    # --- Price ---
+
+async def _request_price(gog_id: str, region: str) -> Tuple[Any, ...] | None:
+    session = http_client.get_session("gog")
     try:
-        price_info = product_data.get("price", {})
-
-        # Если нет цены и игра не бесплатная, пробуем fallback
-        if not price_info.get("isFree") and not price_info.get("finalAmount"):
-            # Здесь цена действительно отсутствует в данном регионе
-            if region.upper() == "RU":
-                logger.warning(
-                    f"GOG игра {game_id} недоступна в RU (нет цены), пробую US регион."
-                )
-                original_title = product_data.get("title", "")
-                us_games = await search_games(original_title, "US")
-                if us_games:
-                    # выбираем наиболее похожий ID
-                    best_match_id, _ = max(
-                        us_games,
-                        key=lambda t: fuzz.ratio(original_title, t[1])
-                    )
-                    return await get_offers(best_match_id, "US")
-            return []
-
-        if price_info.get("isFree"):
-            return [("GOG.com", 0.0, "FREE", url)]
-
-        price_str = price_info.get("finalAmount")
-        if not price_str:
-            return []
-
-        price = float(price_str)
-        currency = price_info.get("currency", "RUB").upper()
-        label = "GOG.com" if region.upper() == "RU" else f"GOG.com {region.upper()}"
-
-        return [(label, price, currency, url)]
+        async with session.get(
+            PRICES_API_URL_TEMPLATE.format(id=gog_id), params={"countryCode": region}, headers=HEADERS
+        ) as resp:
+            if resp.status == 404:
+                return ()   # в этой стране не продаётся
+            if resp.status != 200:
+                logger.warning(f"GOG prices API HTTP {resp.status} for {gog_id} region={region}")
+                return None
+            data = await resp.json()
+    except Exception as e:
+        logger.error(f"Error during GOG prices API request for {gog_id} region={region}: {e}")
+        return None
 
+    # Первой идёт основная валюта страны, остальные – альтернативные
+    prices = (data.get("_embedded") or {}).get("prices") or []
+    if not prices:
+        return ()
+    try:
+        price, currency = _parse_amount(prices[0]["finalPrice"])
+        base, _ = _parse_amount(prices[0].get("basePrice") or prices[0]["finalPrice"])
     except (ValueError, TypeError, KeyError) as e:
-        logger.error(f"Ошибка парсинга данных о цене GOG для {game_id}: {e}")
-        return [] 
\ No newline at end of file
+        logger.error(f"Ошибка парсинга данных о цене GOG для {gog_id} ({region}): {e}")
+        return None
+    return (price, currency, base if base > price else None)
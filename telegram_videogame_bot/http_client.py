@@ -0,0 +1,215 @@
+"""Общий пул HTTP-сессий для всех магазинов.
+
+Каждое «семейство» хостов (steam, ps, ms, gog, epic, nintendo, rates, ...) получает
+одну долгоживущую aiohttp.ClientSession со своим TCPConnector: keep-alive,
+кэш DNS, лимит соединений на хост и единые таймауты по умолчанию.
+Благодаря этому повторные запросы к тем же хостам не платят за новые
+TCP+TLS рукопожатия.
+
+startup() / shutdown() вызываются из main.py при старте и остановке
+диспетчера. get_session(family) можно вызывать и без startup() – сессия
+будет создана лениво (удобно для debug-скриптов).
+
+hedged(family, factory) – «страхующий» повтор для хвостовых задержек: если
+вызов не ответил за наблюдаемый p90 семейства, запускается второй такой же,
+побеждает первый удачный ответ, проигравший отменяется. Число повторов
+ограничено бюджетом (HEDGE_BUDGET от числа вызовов); повтор не отправляется,
+если у магазина нет свободного токена store_guard. HTTP_HEDGE=0 отключает.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, TypeVar
+
+import aiohttp
+from loguru import logger
+
+from telegram_videogame_bot import store_guard
+
+
+@dataclass(frozen=True)
+class FamilyConfig:
+    limit_per_host: int = 8     # одновременных соединений к одному хосту
+    total_timeout: float = 15   # сек. на весь запрос (по умолчанию)
+    connect_timeout: float = 5  # сек. на установку соединения
+
+
+# --- Настройки по семействам хостов ---
+FAMILIES: Dict[str, FamilyConfig] = {
+    "steam": FamilyConfig(limit_per_host=10, total_timeout=10),
+    "ps": FamilyConfig(limit_per_host=10, total_timeout=15),
+    "ms": FamilyConfig(limit_per_host=8, total_timeout=15),
+    "gog": FamilyConfig(limit_per_host=6, total_timeout=10),
+    "epic": FamilyConfig(limit_per_host=6, total_timeout=25),
+    "nintendo": FamilyConfig(limit_per_host=6, total_timeout=15),
+    "rates": FamilyConfig(limit_per_host=2, total_timeout=8),
+    "proxy": FamilyConfig(limit_per_host=4, total_timeout=6),   # фоновые пробы ps_proxies
+    "default": FamilyConfig(),
+}
+
+_TOTAL_LIMIT = 100          # общий лимит соединений одного коннектора
+_DNS_CACHE_TTL = 300        # сек.
+_KEEPALIVE_TIMEOUT = 30     # сек.
+
+_SESSIONS: Dict[str, aiohttp.ClientSession | store_guard.GuardedSession] = {}
+
+
+def _create_session(family: str) -> aiohttp.ClientSession | store_guard.GuardedSession:
+    cfg = FAMILIES.get(family, FAMILIES["default"])
+    connector = aiohttp.TCPConnector(
+        limit=_TOTAL_LIMIT,
+        limit_per_host=cfg.limit_per_host,
+        ttl_dns_cache=_DNS_CACHE_TTL,
+        keepalive_timeout=_KEEPALIVE_TIMEOUT,
+        enable_cleanup_closed=True,
+    )
+    timeout = aiohttp.ClientTimeout(total=cfg.total_timeout, sock_connect=cfg.connect_timeout)
+    # Лимит частоты и предохранитель магазина (store_guard) – обёртка над сессией
+    return store_guard.wrap(family, aiohttp.ClientSession(connector=connector, timeout=timeout))
+
+
+def get_session(family: str = "default") -> aiohttp.ClientSession | store_guard.GuardedSession:
+    """Возвращает общую сессию для семейства хостов (создаёт при первом обращении)."""
+    session = _SESSIONS.get(family)
+    if session is None or session.closed:
+        session = _create_session(family)
+        _SESSIONS[family] = session
+    return session
+
+
+async def startup() -> None:
+    """Создаёт сессии для всех известных семейств заранее."""
+    for family in FAMILIES:
+        get_session(family)
+    logger.info(f"[HTTP] Пул сессий создан: {', '.join(FAMILIES)}")
+
+
+async def shutdown() -> None:
+    """Закрывает все сессии и их соединения."""
+    sessions = list(_SESSIONS.values())
+    _SESSIONS.clear()
+    await asyncio.gather(*(s.close() for s in sessions if not s.closed), return_exceptions=True)
+    logger.info(f"[HTTP] Пул сессий закрыт, ограничители: {store_guard.stats()}, повторы: {hedge_stats()}")
+
+
+# --- Страхующие повторы (hedged requests) ---
+
+T = TypeVar("T")
+
+HEDGE_ENABLED = os.getenv("HTTP_HEDGE", "1") != "0"
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))   # доля вызовов, которую можно продублировать
+_HEDGE_BURST = 3            # запас повторов после затишья
+_HEDGE_MIN_SAMPLES = 20     # до этого числа замеров p90 не считаем – повторов нет
+_HEDGE_MIN_DELAY = 0.05     # сек.; не дублируем быстрее этого
+
+
+class _HedgeStats:
+    """Задержки завершённых вызовов семейства и бюджет повторов (token bucket на вызов)."""
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.tokens = float(_HEDGE_BURST)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def p90(self) -> float | None:
+        if len(self.latencies) < _HEDGE_MIN_SAMPLES:
+            return None
+        lat = sorted(self.latencies)
+        return max(_HEDGE_MIN_DELAY, lat[int(len(lat) * 0.9)])
+
+    def take(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+_HEDGE: Dict[str, _HedgeStats] = {}
+
+
+def hedge_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        family: {
+            "p90": st.p90(), "calls": st.calls, "hedges": st.hedges,
+            "hedge_wins": st.hedge_wins, "budget": round(st.tokens, 2),
+        }
+        for family, st in _HEDGE.items()
+    }
+
+
+async def hedged(
+    family: str, factory: Callable[[], Awaitable[T]], *, may_hedge: Callable[[], bool] | None = None
+) -> T:
+    """Выполняет factory(); если ответа нет дольше p90 семейства – запускает второй
+    такой же вызов. Возвращает первый удачный (не пустой и без исключения) результат.
+
+    factory должна быть идемпотентной (GET/чтение): второй вызов – полная копия первого.
+    В p90 попадает каждый завершённый вызов (в том числе пустой ответ и ошибка),
+    кроме отменённых. Повтор отправляется, только если магазин не ограничен:
+    у его store_guard есть свободный токен и предохранитель замкнут. may_hedge –
+    дополнительное условие вызывающего (например, есть свободный слот его семафора).
+    """
+    st = _HEDGE.setdefault(family, _HedgeStats())
+    st.calls += 1
+    st.tokens = min(_HEDGE_BURST, st.tokens + HEDGE_BUDGET)
+
+    async def timed() -> T:
+        started = time.monotonic()
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            st.latencies.append(time.monotonic() - started)
+            raise
+        st.latencies.append(time.monotonic() - started)
+        return result
+
+    first = asyncio.ensure_future(timed())
+    delay = st.p90() if HEDGE_ENABLED else None
+    if delay is None:
+        return await first
+
+    pending = set()
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        guard = store_guard.get(family)
+        if (
+            done
+            or (guard is not None and not guard.can_hedge())
+            or (may_hedge is not None and not may_hedge())
+            or not st.take()
+        ):
+            return await first
+
+        st.hedges += 1
+        second = asyncio.ensure_future(timed())
+        logger.debug(f"[HTTP] {family}: нет ответа за {delay:.2f} сек. (p90), отправлен страхующий запрос")
+        pending = {first, second}
+        result: Any = None
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                result = task.result()
+                if result:
+                    if task is second:
+                        st.hedge_wins += 1
+                    return result
+        if result is None and error is not None:
+            raise error
+        return result
+    finally:
+        for task in (first, *pending):
+            if not task.done():
+                task.cancel()
@@ -29,6 +29,7 @@ import utils
 import config
 
 from personalAccount_DB import init_db
+from telegram_videogame_bot import browser_pool, epic_client, http_client, prices_func, ps_proxies, steam_app_index, store_cache
 from personalAccount_keyboards import (
     gender_keyboard, edit_gender_keyboard, personal_account_keyboard,
     confirm_profile_keyboard, edit_profile_keyboard
@@ -79,6 +80,21 @@ class PersonalAccount(StatesGroup):
 async def on_startup():
     logger.info("Игровой Бот запущен и готов к работе!")
     await init_db()
+    await http_client.startup()
+    await store_cache.startup()
+    prices_func.rates.start()
+    steam_app_index.index.start()
+    ps_proxies.manager.start()
+
+@dp.shutdown()
+async def on_shutdown():
+    await prices_func.rates.stop()
+    await steam_app_index.index.stop()
+    await ps_proxies.manager.stop()
+    await store_cache.shutdown()
+    await http_client.shutdown()
+    await browser_pool.pool.shutdown()
+    epic_client.shutdown()
 
 # -------------------------------------
 # Обёртки-проверки подписки
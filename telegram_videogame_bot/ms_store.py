@@ -4,20 +4,34 @@
 Поддерживает флаг game_pass в ответах get_offers, который позже будет отображаться ботом.
 
 search_games(query) -> [("ms:{productId}", title), ...]
-get_offers(game_id, region) -> [(store_label, price, currency, url, game_pass)]
-На первых порах, чтобы не ломать существующий формат, game_pass просто
-добавляется в label («Microsoft Store (Game Pass)»).
+get_offers(game_id, region) -> [Offer]  (game_pass, platforms, subscription_price –
+цена со скидкой Game Pass). В кэше лежат «сырые» кортежи
+(label, price, currency, url, game_pass, hardware[, gp_price[, old_price]]).
+
+Цены берутся из JSON DisplayCatalog (один запрос на рынок сразу для многих
+bigId, рынки – параллельно, см. get_prices_bulk); HTML-страница xbox.com –
+запасной путь для рынков, где каталог ничего не вернул.
 """
 from __future__ import annotations
 
 import aiohttp
-import re, json
-from typing import List, Tuple, Any
+import asyncio
+import os
+import re
+from typing import Dict, Iterable, List, Tuple, Any
 from loguru import logger
 from cachetools import TTLCache
 
-_SEARCH_CACHE: TTLCache[str, List[Tuple[str, str]]] = TTLCache(maxsize=1024, ttl=12 * 60 * 60)  # 12h
-_PRICE_CACHE: TTLCache[str, Tuple[str, float, str, str]] = TTLCache(maxsize=4096, ttl=30 * 60)  # 30m
+from telegram_videogame_bot import http_client, page_json, ps_proxies, singleflight, store_cache
+from telegram_videogame_bot.offers import Offer
+
+_SEARCH_CACHE = store_cache.TieredCache("ms:search", TTLCache(maxsize=1024, ttl=12 * 60 * 60))  # 12h
+_PRICE_CACHE = store_cache.TieredCache("ms:price", TTLCache(maxsize=4096, ttl=30 * 60))  # 30m
+
+
+def _price_key(pid: str, region: str) -> str:
+    # v2: в кэше один кортеж цены, а не список кортежей
+    return f"{pid}:{region.upper()}:v2"
 
 HEADERS = {
     "Accept": "application/json, text/plain, */*",
@@ -33,6 +47,19 @@ HEADERS = {
 
 _XBOX_SEARCH_URL = "https://www.xbox.com/{locale}/search?q={query}&cat=games"
 
+# JSON-каталог Microsoft Store. Адрес можно подменить (например, на локальный стенд).
+_CATALOG_URL = os.getenv("MS_DISPLAYCATALOG_URL", "https://displaycatalog.mp.microsoft.com/v7.0/products")
+_CATALOG_BATCH = 20   # bigId в одном запросе к каталогу
+
+# bigId подписок Game Pass (Ultimate, PC, Console, Core) в LicensingData
+_GAME_PASS_IDS = ("CFQ7TTC0KHS0", "CFQ7TTC0K5DJ", "CFQ7TTC0KGQ8", "CFQ7TTC0K6L8")
+
+_PLATFORM_NAMES = {
+    "Windows.Xbox": "Xbox",
+    "Windows.Desktop": "PC",
+    "Windows.Universal": "PC",
+}
+
 # Сопоставление регионов Xbox локациям
 _REGION_TO_LOCALE = {
     "RU": "ru-ru",
@@ -52,40 +79,11 @@ def _extract_product_summaries(html: str) -> dict[str, dict]:
 
     Структура HTML одинакова как для результатов поиска, так и для страниц
     конкретных игр: внутри большого JSON-объекта присутствует ключ
-    "productSummaries". Мы ищем начало этого объекта и затем счётчиком фигурных
-    скобок находим его конец, чтобы безопасно вырезать корректную подстроку
-    и распарсить её через json.loads().
+    "productSummaries". Объект декодируется инкрементально с позиции его
+    открывающей скобки (см. page_json.extract_object).
     """
-
-    start_key = '"productSummaries":'
-    start = html.find(start_key)
-    if start == -1:
-        return {}
-
-    # позиция первой открывающей скобки
-    brace_open = html.find('{', start)
-    if brace_open == -1:
-        return {}
-
-    depth = 1
-    i = brace_open + 1
-    length = len(html)
-    while i < length and depth:
-        ch = html[i]
-        if ch == '{':
-            depth += 1
-        elif ch == '}':
-            depth -= 1
-        i += 1
-
-    if depth != 0:
-        return {}
-
-    json_str = html[brace_open:i]
-    try:
-        return json.loads(json_str)
-    except Exception:
-        return {}
+    summaries = page_json.extract_object(html, '"productSummaries":', source="MS")
+    return summaries if isinstance(summaries, dict) else {}
 
 
 async def search_games(query: str, limit: int = 20, *, region: str = "US") -> List[Tuple[str, str]]:
@@ -96,24 +94,25 @@ async def search_games(query: str, limit: int = 20, *, region: str = "US") -> Li
 
     locale = _REGION_TO_LOCALE.get(region.upper(), "en-us")
     cache_key = f"{locale}:{region}:{query.lower()}"
-    if cache_key in _SEARCH_CACHE:
-        return _SEARCH_CACHE[cache_key][:limit]
+    cached = await _SEARCH_CACHE.get(cache_key)
+    if cached is not None:
+        return cached[:limit]
 
     url = _XBOX_SEARCH_URL.format(locale=locale, query=aiohttp.helpers.quote(query))
     headers = {**HEADERS, "Accept-Language": locale, "x-market": region}
 
     results: List[Tuple[str, str]] = []
+    session = http_client.get_session("ms")
     try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.get(url, timeout=15) as resp:
-                if resp.status != 200:
-                    logger.warning(f"[MS] search HTTP {resp.status}")
-                    _SEARCH_CACHE[cache_key] = []
-                    return []
-                html = await resp.text()
+        async with session.get(url, headers=headers) as resp:
+            if resp.status != 200:
+                logger.warning(f"[MS] search HTTP {resp.status}")
+                await _SEARCH_CACHE.set(cache_key, [])
+                return []
+            html = await resp.text()
     except Exception as e:
         logger.warning(f"[MS] search error: {e}")
-        _SEARCH_CACHE[cache_key] = []
+        await _SEARCH_CACHE.set(cache_key, [])
         return []
 
     summaries = _extract_product_summaries(html)
@@ -126,28 +125,203 @@ async def search_games(query: str, limit: int = 20, *, region: str = "US") -> Li
         if len(results) >= limit:
             break
 
-    _SEARCH_CACHE[cache_key] = results
+    await _SEARCH_CACHE.set(cache_key, results)
     return results
 
 
-async def get_offers(game_id: str, region: str = "US") -> List[Tuple[Any, ...]]:
-    """Парсит ту же выдачу Xbox для получения цены и флага Game Pass."""
+async def get_offers(game_id: str, region: str = "US") -> List[Offer]:
+    """Цена и флаг Game Pass для одного рынка (см. get_offers_multi)."""
+    offer = (await get_offers_multi(game_id, [region])).get(region.upper())
+    return [offer] if offer else []
+
 
+async def get_offers_multi(game_id: str, regions: List[str]) -> Dict[str, Offer]:
+    """Цены игры по нескольким рынкам: каталог для всех рынков, HTML – только для промахов."""
     if not game_id.startswith("ms:"):
-        return []
+        return {}
 
     pid = game_id.split(":", 1)[1]
+    regions = [r.upper() for r in regions]
+    bulk = await get_prices_bulk([pid], regions)
+
+    raw: Dict[str, Any] = {reg: bulk[reg][pid] for reg in regions if pid in bulk.get(reg, {})}
+    missing = [reg for reg in regions if reg not in raw]
+    if missing:
+        logger.info(f"[MS] каталог без цены для {pid} в {missing}, пробую страницу xbox.com")
+
+        async def html_fallback(reg: str):
+            # Одинаковые одновременные запросы склеиваются в один
+            offers = await singleflight.run(("ms", "offers", pid, reg), lambda: _fetch_offers(pid, reg))
+            if offers:
+                await _PRICE_CACHE.set(_price_key(pid, reg), offers[0])
+            return reg, offers[0] if offers else None
+
+        for reg, tup in await asyncio.gather(*(html_fallback(r) for r in missing)):
+            if tup:
+                raw[reg] = tup
+
+    return {reg: _to_offer(tup, reg) for reg, tup in raw.items()}
+
+
+async def get_prices_bulk(pids: Iterable[str], regions: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Сырые цены многих товаров на многих рынках: {region: {pid: tuple}}.
+
+    DisplayCatalog принимает один market на запрос, зато много bigId сразу,
+    поэтому промахи кэша запрашиваются пачками по _CATALOG_BATCH, а рынки – параллельно.
+    """
+    pids = list(dict.fromkeys(pids))
+    regions = list(dict.fromkeys(r.upper() for r in regions))
+    # Весь кэш – одним пакетом (промахи L1 – одним запросом к L2)
+    cached = await _PRICE_CACHE.get_many(_price_key(pid, region) for region in regions for pid in pids)
+    result: Dict[str, Dict[str, Any]] = {}
+    jobs = []
+    for region in regions:
+        result[region] = {}
+        missing = []
+        for pid in pids:
+            tup = cached.get(_price_key(pid, region))
+            if tup is not None:
+                result[region][pid] = tup
+            else:
+                missing.append(pid)
+        for i in range(0, len(missing), _CATALOG_BATCH):
+            chunk = tuple(missing[i:i + _CATALOG_BATCH])
+            jobs.append((region, chunk))
+
+    async def run(region: str, chunk: Tuple[str, ...]):
+        # Одинаковые одновременные запросы склеиваются в один
+        prices = await singleflight.run(("ms", "catalog", chunk, region), lambda: _fetch_catalog(list(chunk), region))
+        return region, prices
+
+    for region, prices in await asyncio.gather(*(run(r, c) for r, c in jobs)):
+        result[region].update(prices)
+        await _PRICE_CACHE.set_many((_price_key(pid, region), tup) for pid, tup in prices.items())
+    return result
+
+
+async def _fetch_catalog(pids: List[str], region: str) -> Dict[str, Tuple[Any, ...]]:
+    """Один запрос к DisplayCatalog: цены пачки bigId на одном рынке."""
+    locale = _REGION_TO_LOCALE.get(region, "en-us")
+    params = {
+        "bigIds": ",".join(pids),
+        "market": region,
+        "languages": f"{locale},neutral",
+        "MS-CV": "DGU1mcuYo0WMMp+F.1",
+    }
+    session = http_client.get_session("ms")
+    try:
+        async with session.get(_CATALOG_URL, params=params, headers=HEADERS) as resp:
+            if resp.status != 200:
+                logger.info(f"[MS] catalog HTTP {resp.status} for {region} ({len(pids)} ids)")
+                return {}
+            data = await resp.json(content_type=None)
+    except Exception as e:
+        logger.warning(f"[MS] catalog error for {region}: {e}")
+        return {}
+
+    prices = {}
+    for product in data.get("Products") or []:
+        tup = _parse_catalog_product(product, region)
+        if tup:
+            prices[product.get("ProductId")] = tup
+    logger.info(f"[MS] catalog {region}: цены для {len(prices)} из {len(pids)} товаров")
+    return prices
+
+
+def _entitlement_ids(availability: Dict[str, Any]) -> List[str]:
+    """bigId из ключей вида "big:<id>:<sku>" в LicensingData доступности."""
+    return [
+        key.split(":")[1]
+        for ent in (availability.get("LicensingData") or {}).get("SatisfyingEntitlementKeys") or []
+        for key in ent.get("EntitlementKeys") or []
+        if ":" in key
+    ]
+
+
+def _parse_catalog_product(product: Dict[str, Any], region: str) -> Tuple[Any, ...] | None:
+    """Кортеж цены из товара DisplayCatalog (наименьшая цена покупки по SKU).
+
+    Доступность, требующая подписку Game Pass, – это цена для подписчиков (gp_price),
+    а не обычная цена.
+    """
+    pid = product.get("ProductId")
+    if not pid:
+        return None
+
+    best: Tuple[float, float, str] | None = None   # (list_price, msrp, currency)
+    gp_best: float | None = None
+    game_pass = False
+    hardware: list[str] = []
+    for dsa in product.get("DisplaySkuAvailabilities") or []:
+        sku_props = (dsa.get("Sku") or {}).get("Properties") or {}
+        for package in sku_props.get("Packages") or []:
+            for dep in package.get("PlatformDependencies") or []:
+                name = _PLATFORM_NAMES.get(dep.get("PlatformName"), dep.get("PlatformName"))
+                if name and name not in hardware:
+                    hardware.append(name)
+
+        for av in dsa.get("Availabilities") or []:
+            gp = any(big_id in _GAME_PASS_IDS for big_id in _entitlement_ids(av))
+            game_pass = game_pass or gp
+            if "Purchase" not in (av.get("Actions") or []):
+                continue
+            price = (av.get("OrderManagementData") or {}).get("Price") or {}
+            if price.get("ListPrice") is None or not price.get("CurrencyCode"):
+                continue
+            if gp:
+                if gp_best is None or float(price["ListPrice"]) < gp_best:
+                    gp_best = float(price["ListPrice"])
+                continue
+            candidate = (float(price["ListPrice"]), float(price.get("MSRP") or 0), price["CurrencyCode"])
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+
+    locale = _REGION_TO_LOCALE.get(region, "en-us")
+    label = "Xbox Store" if region == "RU" else f"Xbox Store {region}"
+    url = f"https://www.xbox.com/{locale}/games/store/x/{pid}"
+    if best is None:
+        # Как и на странице xbox.com: без цены покупки, но в Game Pass – «бесплатно по подписке»
+        return (label, 0.0, "FREE", url, True, hardware) if game_pass else None
+
+    list_price, msrp, currency = best
+    old_price = msrp if msrp > list_price else None
+    gp_price = gp_best if gp_best is not None and gp_best < list_price else None
+    return (label, list_price, currency, url, game_pass, hardware, gp_price, old_price)
+
+
+def _to_offer(raw: Tuple[Any, ...] | list, region: str) -> Offer:
+    """Offer из кортежа (label, price, currency, url, game_pass, hardware[, gp_price[, old_price]])."""
+    label, price, currency, url, game_pass, hardware = raw[:6]
+    gp_price = raw[6] if len(raw) > 6 else None
+    old_price = raw[7] if len(raw) > 7 else None
+    return Offer(
+        store="ms",
+        region=region.upper(),
+        label=label,
+        price=price,
+        currency=currency,
+        url=url,
+        old_price=old_price,
+        subscription_price=gp_price,
+        included=bool(game_pass) and price == 0.0,
+        game_pass=bool(game_pass),
+        platforms=tuple(hardware or ()),
+    )
+
+
+async def _fetch_offers(pid: str, region: str) -> List[Tuple[Any, ...]]:
+    """Загружает страницу товара xbox.com и вытаскивает из неё цену."""
     locale = _REGION_TO_LOCALE.get(region.upper(), "en-us")
     url = f"https://www.xbox.com/{locale}/games/store/x/{pid}"
     headers = {**HEADERS, "Accept-Language": locale, "x-market": region}
 
+    session = http_client.get_session("ms")
     try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.get(url, timeout=15) as resp:
-                if resp.status != 200:
-                    logger.info(f"[MS] price HTTP {resp.status} for {pid}")
-                    return []
-                html = await resp.text()
+        # Страница товара отдаёт цену по IP – идём через лучший прокси рынка, если он есть
+        status, html = await ps_proxies.fetch_text(session, url, region, headers=headers)
+        if status != 200:
+            logger.info(f"[MS] price HTTP {status} for {pid}")
+            return []
     except Exception as e:
         logger.warning(f"[MS] price error: {e}")
         return []
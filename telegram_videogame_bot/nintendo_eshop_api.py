@@ -1,21 +1,42 @@
-import aiohttp
 import asyncio
 import logging
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional, Tuple
 from dataclasses import dataclass
+from cachetools import TTLCache
 from fuzzywuzzy import fuzz
 
+from telegram_videogame_bot import http_client, store_cache
+from telegram_videogame_bot.offers import Offer
+
 logger = logging.getLogger(__name__)
 
 EU_SEARCH_URL = "https://search.nintendo-europe.com/en/select"
 PRICE_API_URL = "https://api.ec.nintendo.com/v1/price"
 
+PRICE_IDS_PER_CALL = 50       # price API принимает до 50 nsuid через запятую
+PRICE_REGION_CONCURRENCY = 4  # одновременных запросов по странам
+
+# Цена одного nsuid в одной стране: ключ (nsuid, country) → элемент "prices" из ответа API
+_PRICE_CACHE = store_cache.TieredCache("nintendo:price", TTLCache(maxsize=8192, ttl=6 * 60 * 60))
+
+# Индекс, заполняемый результатами поиска (nsuid не меняются, поэтому TTL длинный):
+#   nsuid → {"title", "platform", "image_url", "nsuids"}  (по каждому nsuid документа;
+#           "nsuids" – все nsuid документа, первый – основной)
+#   нормализованное название → основной nsuid
+_NSUID_INDEX = store_cache.TieredCache("nintendo:nsuid", TTLCache(maxsize=8192, ttl=30 * 24 * 60 * 60))
+_TITLE_INDEX = store_cache.TieredCache("nintendo:title", TTLCache(maxsize=8192, ttl=30 * 24 * 60 * 60))
+
+
+def _norm_title(title: str) -> str:
+    return " ".join(title.lower().replace("™", "").replace("®", "").split())
+
 @dataclass
 class NintendoGame:
     nsuid: str
     title: str
     platform: str
     image_url: Optional[str] = None
+    nsuids: Tuple[str, ...] = ()   # все nsuid документа: у региональных изданий цена бывает под другим
 
 class NintendoEshopAPI:
     def __init__(self):
@@ -31,71 +52,140 @@ class NintendoEshopAPI:
                 "wt": "json"
             }
             logger.info(f"Nintendo search_games: отправляем запрос к {EU_SEARCH_URL} с параметрами {params}")
-            async with aiohttp.ClientSession() as session:
-                async with session.get(EU_SEARCH_URL, params=params) as resp:
-                    logger.info(f"Nintendo search_games: HTTP статус {resp.status}")
-                    if resp.status != 200:
-                        logger.error(f"Nintendo search_games: HTTP ошибка {resp.status}")
-                        return []
-                    data = await resp.json()
-                    logger.info(f"Nintendo search_games: получен ответ, ключи: {list(data.keys())}")
-                    docs = data.get("response", {}).get("docs", [])
-                    logger.info(f"Nintendo search_games: найдено {len(docs)} документов")
-                    games = []
-                    for doc in docs:
-                        nsuid_list = doc.get("nsuid_txt", [])
-                        title = doc.get("title", "")
-                        logger.info(f"Nintendo search_games: документ - title: '{title}', nsuid: {nsuid_list}")
-                        if nsuid_list and nsuid_list[0]:
-                            games.append(NintendoGame(
-                                nsuid=nsuid_list[0],
-                                title=title,
-                                platform=doc.get("system_names_txt", [""])[0],
-                                image_url=doc.get("image_url", None)
-                            ))
-                    logger.info(f"Nintendo search_games: возвращаем {len(games)} игр")
-                    return games
+            session = http_client.get_session("nintendo")
+            async with session.get(EU_SEARCH_URL, params=params) as resp:
+                logger.info(f"Nintendo search_games: HTTP статус {resp.status}")
+                if resp.status != 200:
+                    logger.error(f"Nintendo search_games: HTTP ошибка {resp.status}")
+                    return []
+                data = await resp.json()
+                logger.info(f"Nintendo search_games: получен ответ, ключи: {list(data.keys())}")
+                docs = data.get("response", {}).get("docs", [])
+                logger.info(f"Nintendo search_games: найдено {len(docs)} документов")
+                games = []
+                index_items = []
+                for doc in docs:
+                    nsuid_list = doc.get("nsuid_txt", [])
+                    title = doc.get("title", "")
+                    logger.info(f"Nintendo search_games: документ - title: '{title}', nsuid: {nsuid_list}")
+                    if nsuid_list and nsuid_list[0]:
+                        nsuid_list = [str(n) for n in nsuid_list if n]
+                        games.append(NintendoGame(
+                            nsuid=nsuid_list[0],
+                            title=title,
+                            platform=doc.get("system_names_txt", [""])[0],
+                            image_url=doc.get("image_url", None),
+                            nsuids=tuple(nsuid_list),
+                        ))
+                        info = {
+                            "title": title,
+                            "platform": games[-1].platform,
+                            "image_url": games[-1].image_url,
+                            "nsuids": nsuid_list,
+                        }
+                        # Игру можно найти по любому её nsuid
+                        index_items.extend((n, info) for n in nsuid_list)
+                logger.info(f"Nintendo search_games: возвращаем {len(games)} игр")
+                await _NSUID_INDEX.set_many(index_items)
+                # Первое (самое релевантное по Solr) совпадение названия выигрывает
+                titles = {}
+                for game in games:
+                    titles.setdefault(_norm_title(game.title), game.nsuid)
+                await _TITLE_INDEX.set_many(titles.items())
+                return games
         except Exception as e:
             logger.error(f"Nintendo search_games exception: {e}")
             import traceback; traceback.print_exc()
             return []
 
-    async def get_prices(self, nsuid: str, regions: List[str]) -> Dict[str, dict]:
+    async def _fetch_price_chunk(self, country: str, nsuids: List[str]) -> Dict[str, dict]:
+        """Один запрос к price API: цены пачки nsuid в одной стране."""
+        session = http_client.get_session("nintendo")
+        params = {"country": country, "ids": ",".join(nsuids), "lang": "en"}
+        try:
+            async with session.get(PRICE_API_URL, params=params) as resp:
+                if resp.content_type != "application/json":
+                    logger.error(f"Ошибка получения цены для {country}: mimetype={resp.content_type}, ids={len(nsuids)}")
+                    return {}
+                data = await resp.json()
+        except Exception as e:
+            logger.error(f"Ошибка получения цены для {country}: {e}")
+            return {}
+        return {str(p.get("title_id")): p for p in data.get("prices", []) if p.get("title_id") is not None}
+
+    async def get_prices_bulk(self, nsuids: Iterable[str], regions: Iterable[str]) -> Dict[str, Dict[str, dict]]:
+        """Цены многих nsuid во многих странах: {country: {nsuid: price_entry}}.
+
+        Промахи кэша добираются пачками по PRICE_IDS_PER_CALL, страны – параллельно
+        (не больше PRICE_REGION_CONCURRENCY запросов одновременно).
+        """
+        nsuids = list(dict.fromkeys(str(n) for n in nsuids if n))
+        countries = list(dict.fromkeys(r.upper() for r in regions))
+        # Весь кэш – одним пакетом (промахи L1 – одним запросом к L2)
+        cached_all = await _PRICE_CACHE.get_many((nsuid, country) for country in countries for nsuid in nsuids)
+        result: Dict[str, Dict[str, dict]] = {}
+        jobs = []
+        for country in countries:
+            result[country] = {}
+            missing = []
+            for nsuid in nsuids:
+                cached = cached_all.get((nsuid, country))
+                if cached is not None:
+                    result[country][nsuid] = cached
+                else:
+                    missing.append(nsuid)
+            for i in range(0, len(missing), PRICE_IDS_PER_CALL):
+                jobs.append((country, missing[i:i + PRICE_IDS_PER_CALL]))
+
+        if jobs:
+            sem = asyncio.Semaphore(PRICE_REGION_CONCURRENCY)
+
+            async def run(country: str, chunk: List[str]):
+                async with sem:
+                    first = True
+
+                    async def attempt() -> Dict[str, dict]:
+                        nonlocal first
+                        if first:
+                            first = False
+                            return await self._fetch_price_chunk(country, chunk)
+                        # Страхующий повтор занимает свой слот, а не делит слот первой попытки
+                        async with sem:
+                            return await self._fetch_price_chunk(country, chunk)
+
+                    # Медленный ответ страхуется повтором после p90 (http_client.hedged),
+                    # но только при свободном слоте: в очереди за другими странами
+                    # повтор ответил бы позже первой попытки
+                    prices = await http_client.hedged("nintendo", attempt, may_hedge=lambda: not sem.locked())
+                    return country, prices
+
+            for country, prices in await asyncio.gather(*(run(c, chunk) for c, chunk in jobs)):
+                result[country].update(prices)
+                await _PRICE_CACHE.set_many(((nsuid, country), p) for nsuid, p in prices.items())
+            logger.info(f"Nintendo get_prices_bulk: {len(nsuids)} nsuid × {len(result)} стран, запросов: {len(jobs)}")
+        return result
+
+    async def get_prices(
+        self, nsuid: str, regions: List[str], nsuids: Iterable[str] = ()
+    ) -> Dict[str, dict]:
+        """Цены игры по регионам в формате ответа API: {region: {"prices": [...]}}.
+
+        nsuids – остальные nsuid той же игры (из индекса поиска): они идут в тот же
+        запрос, и в каждом регионе берётся первый nsuid, который там продаётся.
+        """
+        ids = list(dict.fromkeys(str(n) for n in (nsuid, *nsuids) if n))
+        bulk = await self.get_prices_bulk(ids, regions)
         results = {}
-        async with aiohttp.ClientSession() as session:
-            # Сначала пробуем все выбранные регионы
-            for region in regions:
-                url = f"{PRICE_API_URL}?country={region}&ids={nsuid}&lang=en"
-                try:
-                    async with session.get(url) as resp:
-                        if resp.content_type != "application/json":
-                            logger.error(f"Ошибка получения цены для {region}: mimetype={resp.content_type}, url={url}")
-                            results[region] = None
-                            continue
-                        data = await resp.json()
-                        logger.info(f"Nintendo get_prices: регион={region}, nsuid={nsuid}, ответ: {data}")
-                        results[region] = data
-                except Exception as e:
-                    logger.error(f"Ошибка получения цены для {region}: {e}")
-                    results[region] = None
-            # Если ни для одного региона не получили цену — fallback на DE
-            if all(v is None or not (isinstance(v, dict) and v.get("prices")) for v in results.values()):
-                url = f"{PRICE_API_URL}?country=DE&ids={nsuid}&lang=en"
-                try:
-                    async with session.get(url) as resp:
-                        if resp.content_type != "application/json":
-                            logger.error(f"Fallback: mimetype={resp.content_type}, url={url}")
-                            results["DE"] = None
-                        else:
-                            data = await resp.json()
-                            logger.info(f"Nintendo get_prices: fallback DE, nsuid={nsuid}, ответ: {data}")
-                            results["DE"] = data
-                except Exception as e:
-                    logger.error(f"Ошибка fallback DE: {e}")
-                    results["DE"] = None
-            return results
-
-    def parse_price(self, price_data: dict, fallback_data: dict = None) -> Optional[dict]:
+        for region in (r.upper() for r in regions):
+            entries = [bulk.get(region, {}).get(n) for n in ids]
+            entries = [e for e in entries if e]
+            entry = next((e for e in entries if e.get("sales_status") == "onsale"), entries[0] if entries else None)
+            results[region] = {"prices": [entry]} if entry else None
+        return results
+
+    def parse_price(
+        self, price_data: dict, fallback_data: dict = None, *, region: str, game: NintendoGame
+    ) -> Optional[Offer]:
         if not price_data or not isinstance(price_data, dict):
             logger.warning("Nintendo parse_price: price_data is None или не dict")
             return None
@@ -112,18 +202,58 @@ class NintendoEshopAPI:
                 logger.warning("Nintendo parse_price: нет актуальных цен")
                 return None
         price_info = prices[0]
-        result = {
-            "regular": price_info["regular_price"]["amount"],
-            "currency": price_info["regular_price"]["currency"],
-            "raw_value": price_info["regular_price"]["raw_value"],
-            "discount": None,
-            "discount_end": None,
-            "nso": False
-        }
+        regular = float(price_info["regular_price"]["raw_value"])
+        offer = Offer(
+            store="nintendo",
+            region=region.upper(),
+            label="Nintendo eShop" if region.upper() == "RU" else f"Nintendo eShop {region.upper()}",
+            price=regular,
+            currency=price_info["regular_price"]["currency"],
+            url=f"https://www.nintendo.com/store/products/{game.nsuid}",
+            platforms=(game.platform,) if game.platform else (),
+        )
         if price_info.get("discount_price"):
-            result["discount"] = price_info["discount_price"]["amount"]
-            result["discount_end"] = price_info["discount_price"].get("end_datetime")
-        logger.info(f"Nintendo parse_price: возвращаем результат {result}")
-        return result
+            offer.old_price = regular
+            offer.price = float(price_info["discount_price"]["raw_value"])
+            offer.discount_end = price_info["discount_price"].get("end_datetime")
+        logger.info(f"Nintendo parse_price: возвращаем результат {offer}")
+        return offer
+
+    async def resolve(self, nsuid: Optional[str] = None, title: Optional[str] = None) -> Optional[NintendoGame]:
+        """Игра по nsuid (или названию) из индекса; поиск – только если индекс пуст."""
+        if not nsuid and title:
+            nsuid = await _TITLE_INDEX.get(_norm_title(title))
+        if nsuid:
+            info = await _NSUID_INDEX.get(str(nsuid))
+            if info:
+                return NintendoGame(
+                    nsuid=str(nsuid), title=info["title"], platform=info["platform"],
+                    image_url=info.get("image_url"), nsuids=tuple(info.get("nsuids") or ()),
+                )
+            # Для цен достаточно самого nsuid, название/платформа – только для подписи
+            return NintendoGame(nsuid=str(nsuid), title=title or "", platform="")
+        if not title:
+            return None
+
+        games = await self.search_games(title)
+        if not games:
+            return None
+        return max(games, key=lambda g: fuzz.token_sort_ratio(_norm_title(title), _norm_title(g.title)))
+
+    async def get_offers(self, nsuid: Optional[str], regions: List[str], title: Optional[str] = None) -> Dict[str, Offer]:
+        """Цены игры по регионам: {region: Offer}. nsuid берётся из результатов поиска."""
+        game = await self.resolve(nsuid, title)
+        if game is None:
+            logger.warning(f"Nintendo get_offers: не найдено игр для: {nsuid or title}")
+            return {}
+        prices = await self.get_prices(game.nsuid, list(regions), game.nsuids)
+        # Fallback на US
+        us_price = prices.get("US")
+        offers = {}
+        for reg in regions:
+            offer = self.parse_price(prices.get(reg, {}), us_price, region=reg, game=game)
+            if offer:
+                offers[reg] = offer
+        return offers
 
 nintendo_api = NintendoEshopAPI() 
\ No newline at end of file
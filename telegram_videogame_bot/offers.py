@@ -0,0 +1,64 @@
+"""Единая модель предложения (цены) для всех магазинов.
+
+Все адаптеры (steam_store, epic_store, gog_store, ms_store, ps_store,
+nintendo_eshop_api, origin_store) возвращают Offer вместо кортежей и
+словарей разной формы. Цена в рублях (price_rub) считается один раз
+шагом normalize_prices() по общей таблице курсов, а сортировка и рендер экрана цен
+только читают готовые поля.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Tuple
+
+from telegram_videogame_bot import prices_func
+
+FREE = "FREE"
+
+
+@dataclass(slots=True)
+class Offer:
+    store: str                  # "steam", "epic", "gog", "ms", "ps", "nintendo", "origin"
+    region: str                 # двухбуквенный код региона (RU, US, ...)
+    label: str                  # подпись магазина, например «Steam US»
+    price: float                # итоговая цена (с учётом скидки) в валюте региона
+    currency: str               # ISO-код валюты или FREE
+    url: str
+    old_price: float | None = None           # цена до скидки
+    discount_end: str | None = None
+    subscription_price: float | None = None  # цена для подписчиков (PS Plus, Game Pass)
+    included: bool = False                   # входит в подписку (PS Plus, Game Pass, NSO)
+    game_pass: bool = False
+    platforms: Tuple[str, ...] = ()
+    price_rub: float | None = None           # заполняется normalize_prices()
+
+    @property
+    def is_free(self) -> bool:
+        return self.currency == FREE or (self.price == 0.0 and not self.included)
+
+    @property
+    def discount(self) -> int:
+        """Скидка в процентах (0 – нет скидки)."""
+        if self.old_price and self.old_price > self.price > 0:
+            return round(100 - self.price * 100 / self.old_price)
+        return 0
+
+    @property
+    def sort_price(self) -> float:
+        """Цена для сортировки в рублях; inf – если посчитать нельзя."""
+        if self.is_free or (self.included and self.price == 0.0):
+            return 0.0
+        return self.price_rub if self.price_rub is not None else float("inf")
+
+
+async def normalize_prices(offers: Iterable[Offer]) -> None:
+    """Считает price_rub по таблице курсов (без запросов к API на каждую валюту)."""
+    await prices_func.rates.ensure_loaded()
+    for o in offers:
+        if o.price_rub is not None:
+            continue
+        if o.is_free:
+            o.price_rub = 0.0
+        else:
+            o.price_rub = prices_func.rates.convert(o.price, o.currency, "RUB")
@@ -8,7 +8,9 @@ from urllib.parse import urljoin
 import aiohttp
 from bs4 import BeautifulSoup
 from loguru import logger
-from playwright.async_api import async_playwright
+
+from telegram_videogame_bot import browser_pool
+from telegram_videogame_bot.offers import Offer
 
 # --- EA Store Constants ---
 BASE_URL = "https://www.ea.com"
@@ -25,12 +27,12 @@ async def search_games(query: str, region: str = "US") -> List[Tuple[str, str, s
     """
     results = []
     search_url = SEARCH_URL_TPL.format(query=query)
+    if not browser_pool.pool.available():
+        logger.debug("EA Playwright: браузер недоступен, поиск пропущен")
+        return []
 
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-
+        async with browser_pool.pool.page() as page:
             logger.info(f"EA Playwright: Navigating to search URL {search_url}")
             await page.goto(search_url, wait_until="load", timeout=30000)
 
@@ -45,7 +47,6 @@ async def search_games(query: str, region: str = "US") -> List[Tuple[str, str, s
                 game_grid = soup.find("div", attrs={"data-testid": "search-results-grid"})
                 if not game_grid:
                     logger.warning(f"EA Playwright search could not find results grid for '{query}'.")
-                    await browser.close()
                     return []
                 
                 game_cards = game_grid.find_all("div", attrs={"data-testid": "game-card"})
@@ -73,8 +74,6 @@ async def search_games(query: str, region: str = "US") -> List[Tuple[str, str, s
             except Exception as e:
                 logger.error(f"EA Playwright: Error parsing search results on {search_url}: {e}")
 
-            await browser.close()
-
     except Exception as e:
         logger.error(f"An error occurred during Playwright search execution for '{query}': {e}")
 
@@ -84,10 +83,10 @@ async def search_games(query: str, region: str = "US") -> List[Tuple[str, str, s
     return results
 
 
-async def get_offers(game_id: str, region: str = "US") -> List[Tuple[str, float, str, str]]:
+async def get_offers(game_id: str, region: str = "US") -> List[Offer]:
     """
     Получает цену для конкретной игры, парся ее страницу с помощью Playwright.
-    Возвращает список кортежей (store_name, price, currency, url).
+    Возвращает список Offer.
     """
     locale = REGION_MAP.get(region, "en-us")
     lang = LANGUAGE_MAP.get(region, "en-US")
@@ -96,12 +95,11 @@ async def get_offers(game_id: str, region: str = "US") -> List[Tuple[str, float,
     game_url = f"{BASE_URL}/{locale}/games/{game_id}"
     
     results = []
+    if not browser_pool.pool.available():
+        return []
 
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page(locale=lang)
-            
+        async with browser_pool.pool.page(locale=lang) as page:
             logger.info(f"EA Playwright: Navigating to {game_url}")
             await page.goto(game_url, wait_until="load", timeout=30000)
 
@@ -133,7 +131,16 @@ async def get_offers(game_id: str, region: str = "US") -> List[Tuple[str, float,
                         currency = "USD"
                     # Добавить другие валюты по необходимости
 
-                    results.append(("origin", price, currency, game_url))
+                    results.append(
+                        Offer(
+                            store="origin",
+                            region=region.upper(),
+                            label="EA App" if region.upper() == "RU" else f"EA App {region.upper()}",
+                            price=price,
+                            currency=currency,
+                            url=game_url,
+                        )
+                    )
                 else:
                     logger.warning(f"Could not parse price from '{price_text}' for {game_id} in {region}")
 
@@ -142,8 +149,6 @@ async def get_offers(game_id: str, region: str = "US") -> List[Tuple[str, float,
             except Exception as e:
                 logger.error(f"EA Playwright: Error parsing price on {game_url}: {e}")
 
-            await browser.close()
-
     except Exception as e:
         logger.error(f"An error occurred during Playwright execution for {game_id} in {region}: {e}")
 
@@ -0,0 +1,86 @@
+"""Извлечение JSON, встроенного в HTML-страницы магазинов.
+
+Страницы PS Store (__NEXT_DATA__) весят 250–600 КБ. Раньше тег искался
+нежадным DOTALL-регексом по всей странице и разбирался стандартным
+json.loads. Здесь:
+
+• тег находится через str.find (без регекса);
+• JSON декодируется orjson, если он установлен, иначе стандартным json.
+
+Разбор выполняется прямо в event loop: json/orjson держат GIL, поэтому
+вынос в поток не освобождает loop, а только добавляет пересылку между
+потоками. Разбор страницы PS Store через orjson укладывается в единицы мс.
+
+extract_object() – для JSON-объекта, встроенного в скрипт по ключу
+(например, "productSummaries" на xbox.com): объект декодируется
+JSONDecoder.raw_decode прямо с позиции «{», без поиска конца вручную,
+поэтому скобки внутри строк не сбивают разбор.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict
+
+from loguru import logger
+
+try:  # orjson заметно быстрее на больших документах, но не обязателен
+    import orjson
+
+    _loads: Callable[[str], Any] = orjson.loads
+    BACKEND = "orjson"
+except ImportError:  # pragma: no cover - зависит от окружения
+    _loads = json.loads
+    BACKEND = "json"
+
+_NEXT_DATA_TAG = '<script id="__NEXT_DATA__"'
+_decoder = json.JSONDecoder()
+
+
+def find_next_data(html: str) -> str | None:
+    """Текст JSON внутри <script id="__NEXT_DATA__" ...>...</script> или None."""
+    tag = html.find(_NEXT_DATA_TAG)
+    if tag == -1:
+        return None
+    start = html.find(">", tag + len(_NEXT_DATA_TAG))
+    if start == -1:
+        return None
+    end = html.find("</script>", start)
+    if end == -1:
+        return None
+    return html[start + 1:end]
+
+
+def loads(raw: str, *, source: str = "page") -> Any:
+    """Декодирует JSON выбранным бэкендом; при ошибке – None с предупреждением."""
+    try:
+        return _loads(raw)
+    except (ValueError, TypeError) as e:  # orjson.JSONDecodeError – подкласс ValueError
+        logger.warning(f"[{source}] JSON decode error: {e}")
+        return None
+
+
+def extract_next_data(html: str, *, source: str = "PS") -> Dict[str, Any] | None:
+    """JSON из <script id="__NEXT_DATA__"> страницы или None."""
+    raw = find_next_data(html)
+    if raw is None:
+        return None
+    return loads(raw, source=source)
+
+
+def extract_object(html: str, key: str, *, source: str = "page") -> Any:
+    """JSON-объект, идущий сразу после key (например '"productSummaries":'), или None."""
+    pos = html.find(key)
+    if pos == -1:
+        return None
+    pos += len(key)
+    while pos < len(html) and html[pos].isspace():
+        pos += 1
+    if pos >= len(html) or html[pos] != "{":
+        return None
+    try:
+        obj, _ = _decoder.raw_decode(html, pos)
+    except ValueError as e:
+        logger.warning(f"[{source}] JSON decode error: {e}")
+        return None
+    return obj
@@ -1,14 +1,28 @@
-"""Утилиты конвертации валют (ITAD удалён)."""
+"""Утилиты конвертации валют (ITAD удалён).
 
-from typing import List, Tuple, Dict, Any
+Курсы хранятся в одной таблице RateTable: один запрос к API с базой RUB
+возвращает курсы всех валют сразу, кросс-курсы считаются локально.
+Таблица обновляется в фоне (start()/stop() из main.py), а convert()
+синхронный и никогда не ходит в сеть – его можно звать прямо при рендере.
+Если API недоступен, используются _STATIC_RATES_TO_RUB с флагом stale.
+"""
+
+import asyncio
+import time
+from typing import Dict
 
-import aiohttp
 from cachetools import TTLCache
+from loguru import logger
+
+from telegram_videogame_bot import http_client, store_cache
 
-# ⚡️ Кэш курсов валют (12 ч)
-_RATE_CACHE: TTLCache[Tuple[str, str], float] = TTLCache(maxsize=128, ttl=12 * 60 * 60)
+# ⚡️ Кэш таблицы курсов (12 ч) – переживает рестарт через L2
+_RATE_CACHE = store_cache.TieredCache("rates", TTLCache(maxsize=4, ttl=12 * 60 * 60))
 
 _EXCHANGE_API = "https://api.exchangerate.host/latest"
+_BASE = "RUB"
+_REFRESH_INTERVAL = 3 * 60 * 60    # сек. между фоновыми обновлениями
+_RETRY_INTERVAL = 10 * 60          # сек. до повтора, если API не ответил
 
 # Фиксированные курсы на случай, если API недоступен
 # Курсы обновлены 05.07.2025. При первой удачной загрузке из API они будут перебиты.
@@ -26,47 +40,122 @@ _STATIC_RATES_TO_RUB = {
 }
 
 # ------------------------------------------------
-# Конвертация валют
+# Таблица курсов
 # ------------------------------------------------
 
 
-async def _fetch_rate(from_cur: str, to_cur: str) -> float | None:
-    """Получить курс from_cur→to_cur. Кэшируется."""
-    if from_cur.upper() == to_cur.upper():
-        return 1.0
-    
-    cache_key = (from_cur.upper(), to_cur.upper())
-    if cache_key in _RATE_CACHE:
-        return _RATE_CACHE[cache_key]
+class RateTable:
+    """Курсы всех валют к рублю; кросс-курс A→B = to_rub[A] / to_rub[B]."""
+
+    def __init__(self):
+        self.to_rub: Dict[str, float] = {"RUB": 1.0, **_STATIC_RATES_TO_RUB}
+        self.updated_at: float | None = None   # время последней удачной загрузки из API
+        self.stale = True                      # True – курсы статические или устарели
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    # --- Горячий путь (без сети) ---
+
+    def rate(self, from_cur: str, to_cur: str) -> float | None:
+        src = self.to_rub.get(from_cur.upper())
+        dst = self.to_rub.get(to_cur.upper())
+        if not src or not dst:
+            return None
+        return src / dst
 
-    params = {"base": from_cur, "symbols": to_cur}
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=8)) as session:
+    def convert(self, amount: float, from_cur: str, to_cur: str) -> float | None:
+        """Переводит сумму по текущей таблице. Никогда не ходит в сеть."""
+        if from_cur.upper() == to_cur.upper():
+            return amount
+        rate = self.rate(from_cur, to_cur)
+        return round(amount * rate, 2) if rate else None
+
+    # --- Загрузка ---
+
+    def _apply(self, to_rub: Dict[str, float], updated_at: float) -> None:
+        self.to_rub = {**_STATIC_RATES_TO_RUB, **to_rub, "RUB": 1.0}
+        self.updated_at = updated_at
+        self.stale = time.time() - updated_at > _RATE_CACHE.ttl
+
+    async def _fetch(self) -> Dict[str, float] | None:
+        """Один запрос: курсы всех валют относительно RUB."""
+        session = http_client.get_session("rates")
         try:
-            async with session.get(_EXCHANGE_API, params=params) as resp:
+            async with session.get(_EXCHANGE_API, params={"base": _BASE}) as resp:
                 if resp.status != 200:
+                    logger.warning(f"[rates] HTTP {resp.status}")
                     return None
                 data = await resp.json()
-                rate = data.get("rates", {}).get(to_cur.upper())
-                if rate:
-                    _RATE_CACHE[cache_key] = rate
-                    return rate
-        except Exception:
+        except Exception as e:
+            logger.warning(f"[rates] Ошибка загрузки курсов: {e}")
             return None
 
+        # API отдаёт «сколько X за 1 RUB» – переворачиваем в «сколько RUB за 1 X»
+        rates = data.get("rates") or {}
+        to_rub = {cur.upper(): 1 / val for cur, val in rates.items() if isinstance(val, (int, float)) and val > 0}
+        return to_rub or None
 
-async def convert_currency(amount: float, from_cur: str, to_cur: str) -> float | None:
-    """Переводит сумму из from_cur в to_cur."""
-    if from_cur.upper() == to_cur.upper():
-        return amount
+    async def refresh(self) -> bool:
+        """Загружает таблицу из API; при неудаче оставляет текущие курсы."""
+        async with self._lock:
+            to_rub = await self._fetch()
+            if not to_rub:
+                if not self.updated_at or time.time() - self.updated_at > _RATE_CACHE.ttl:
+                    self.stale = True
+                return False
+            now = time.time()
+            self._apply(to_rub, now)
+            await _RATE_CACHE.set("table", {"to_rub": to_rub, "updated_at": now})
+            logger.info(f"[rates] Таблица курсов обновлена: {len(to_rub)} валют")
+            return True
+
+    async def ensure_loaded(self) -> None:
+        """Гарантирует, что таблица хоть раз загружена (L1/L2 кэш или API)."""
+        if self.updated_at is not None:
+            return
+        cached = await _RATE_CACHE.get("table")
+        if cached:
+            self._apply(cached["to_rub"], cached["updated_at"])
+            return
+        await self.refresh()
+        if self.updated_at is None:
+            # Чтобы не дёргать API на каждом экране цен, следующую попытку сделает фон
+            self.updated_at = 0.0
 
-    rate = await _fetch_rate(from_cur, to_cur)
-    if rate:
-        return round(amount * rate, 2)
+    async def _refresh_loop(self) -> None:
+        while True:
+            ok = await self.refresh()
+            await asyncio.sleep(_REFRESH_INTERVAL if ok else _RETRY_INTERVAL)
 
-    # Фолбэк на статический курс (только для RUB)
-    if to_cur.upper() == "RUB":
-        static_rate = _STATIC_RATES_TO_RUB.get(from_cur.upper())
-        if static_rate:
-            return round(amount * static_rate, 2)
+    def start(self) -> None:
+        """Запускает фоновое обновление таблицы."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
 
-    return None 
\ No newline at end of file
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rates = RateTable()
+
+# ------------------------------------------------
+# Конвертация валют
+# ------------------------------------------------
+
+
+async def get_rate(from_cur: str, to_cur: str) -> float | None:
+    """Курс from_cur→to_cur из таблицы (API или статический фолбэк)."""
+    await rates.ensure_loaded()
+    return rates.rate(from_cur, to_cur)
+
+
+async def convert_currency(amount: float, from_cur: str, to_cur: str) -> float | None:
+    """Переводит сумму из from_cur в to_cur."""
+    await rates.ensure_loaded()
+    return rates.convert(amount, from_cur, to_cur)
@@ -1,19 +1,34 @@
-"""Простейший пул бесплатных HTTP(S)-прокси.
+"""Пул HTTP(S)-прокси для региональных запросов (страницы xbox.com) с оценкой здоровья.
 
-• _PROXY_POOL – вручную подобранные IP:port, желательно живые.
-• get_proxy(region) -> str | None – возвращает URL прокси для указанного региона.
-• ban_proxy(url, timeout=600) – помечает прокси как «нерабочий» на *timeout* секунд.
-
-Реализация максимально лёгкая, без сторонних зависимостей; при желании
-список можно редактировать вручную или обновлять скриптом.
+• Список берётся из файла PROXY_LIST_PATH (JSON {REGION: ["http://ip:port", ...]}),
+  а если файла нет – из встроенного _PROXY_POOL. Файл перечитывается при
+  изменении (проверка mtime на каждом цикле проб), рестарт не нужен.
+• Фоновая задача (start()/stop() из main.py) параллельно проверяет все прокси
+  (не больше PROBE_CONCURRENCY сразу) и ведёт по каждому EWMA задержки и доли
+  успешных ответов; реальные запросы через прокси тоже учитываются (report()).
+• get_proxy(region) -> str | None – самый быстрый здоровый прокси региона;
+  ещё не проверенный прокси здоровым не считается.
+• ban_proxy(url, timeout=600) – засчитывает неудачу и снимает прокси с выдачи
+  на *timeout* секунд.
+• fetch_text(session, url, region, ...) – GET через лучший прокси региона;
+  при ошибке прокси или если здоровых нет – напрямую.
 """
 from __future__ import annotations
 
-import random
+import asyncio
+import json
+import os
+import pathlib
 import time
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import aiohttp
+from loguru import logger
+
+from telegram_videogame_bot import http_client, store_guard
 
-# --- Сырой список. Можно дополнять в runtime.
+# --- Встроенный список (если нет файла PROXY_LIST_PATH) ---
 # Формат: {REGION: ["http://ip:port", ...]}
 _PROXY_POOL: Dict[str, List[str]] = {
     "TR": [
@@ -36,31 +51,222 @@ _PROXY_POOL: Dict[str, List[str]] = {
     ],
 }
 
-# --- Временные блокировки плохих узлов ---
-# proxy_url -> unblock_timestamp
-_BAD_MAP: Dict[str, float] = {}
-_BLOCK_SECS = 600  # 10 минут
+_base_dir = pathlib.Path(__file__).resolve().parent.parent
+_default_db = _base_dir / "seed" / "personalAk_database.db"
+PROXY_LIST_PATH = os.getenv(
+    "PROXY_LIST_PATH",
+    str(pathlib.Path(os.getenv("DB_PATH", str(_default_db))).parent / "proxies.json"),
+)
 
+PROBE_URL = os.getenv("PROXY_PROBE_URL", "https://store.playstation.com/favicon.ico")
+PROBE_INTERVAL = 5 * 60         # сек. между циклами проверки
+PROBE_TIMEOUT = 6               # сек. на одну проверку
+PROBE_CONCURRENCY = 10
+REQUEST_TIMEOUT = 4             # сек. на реальный запрос через прокси – много меньше дедлайна магазина
 
-def _now() -> float:
-    return time.time()
+_ALPHA = 0.3                    # вес нового измерения в EWMA
+_HEALTHY_SUCCESS = 0.5          # ниже – прокси не выдаётся
+_UNKNOWN_LATENCY = 3.0          # сек.; оценка для ещё не проверенного прокси
+_BLOCK_SECS = 600               # 10 минут
+_BAD_STATUSES = {403, 407, 429}  # бан/авторизация прокси/лимит – прокси не помог
 
 
-def get_proxy(region: str) -> str | None:
-    """Возвращает случайный прокси для региона или None, если нет/все забанены."""
-    region = region.upper()
-    pool = _PROXY_POOL.get(region)
-    if not pool:
+@dataclass(slots=True)
+class ProxyState:
+    url: str
+    region: str
+    latency: float = _UNKNOWN_LATENCY   # EWMA задержки успешных ответов, сек.
+    success: float = 0.0                # EWMA доли успешных ответов (0..1); до первой пробы – нездоров
+    checks: int = 0
+    timed: int = 0                      # сколько успешных ответов учтено в latency
+    banned_until: float = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return self.banned_until <= now and self.success >= _HEALTHY_SUCCESS
+
+    @property
+    def score(self) -> float:
+        """Чем меньше, тем лучше: задержка с поправкой на надёжность."""
+        return self.latency / max(self.success, 0.05)
+
+
+class ProxyManager:
+    """Прокси по регионам с фоновыми пробами и выбором лучшего."""
+
+    def __init__(self, path: str = PROXY_LIST_PATH):
+        self.path = path
+        self._proxies: Dict[str, Dict[str, ProxyState]] = {}
+        self._mtime: float | None = None
+        self._task: asyncio.Task | None = None
+        self._apply(_PROXY_POOL)
+
+    # --- Список ---
+
+    def _apply(self, pool: Dict[str, List[str]]) -> None:
+        """Подменяет список, сохраняя накопленную статистику уже известных прокси."""
+        fresh: Dict[str, Dict[str, ProxyState]] = {}
+        for region, urls in pool.items():
+            region = region.upper()
+            known = self._proxies.get(region, {})
+            fresh[region] = {url: known.get(url) or ProxyState(url, region) for url in urls}
+        self._proxies = fresh
+
+    def reload(self) -> bool:
+        """Перечитывает файл, если он изменился. True – список обновлён."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                pool = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[proxy] Не удалось прочитать {self.path}: {e}")
+            return False
+        self._mtime = mtime
+        self._apply(pool)
+        logger.info(f"[proxy] список обновлён: {sum(len(p) for p in self._proxies.values())} прокси")
+        return True
+
+    def regions(self) -> List[str]:
+        return list(self._proxies)
+
+    # --- Выбор и учёт ---
+
+    def best(self, region: str) -> str | None:
+        now = time.time()
+        healthy = [p for p in self._proxies.get(region.upper(), {}).values() if p.healthy(now)]
+        if not healthy:
+            return None
+        return min(healthy, key=lambda p: p.score).url
+
+    def _find(self, url: str) -> ProxyState | None:
+        for proxies in self._proxies.values():
+            if url in proxies:
+                return proxies[url]
         return None
 
-    random.shuffle(pool)
-    now = _now()
-    for url in pool:
-        if _BAD_MAP.get(url, 0) < now:
-            return url
-    return None
+    def report(self, url: str, ok: bool, latency: float | None = None) -> None:
+        """Учитывает результат запроса/пробы через прокси."""
+        state = self._find(url)
+        if state is None:
+            return
+        outcome = 1.0 if ok else 0.0
+        # Первая проверка сразу задаёт долю успеха, дальше – EWMA
+        state.success = outcome if not state.checks else _ALPHA * outcome + (1 - _ALPHA) * state.success
+        state.checks += 1
+        if ok and latency is not None:
+            # Первое измерение заменяет оценку для непроверенного прокси
+            state.latency = latency if not state.timed else _ALPHA * latency + (1 - _ALPHA) * state.latency
+            state.timed += 1
+
+    def ban(self, url: str, timeout: float = _BLOCK_SECS) -> None:
+        self.report(url, False)
+        state = self._find(url)
+        if state is not None:
+            state.banned_until = time.time() + timeout
+
+    def stats(self) -> Dict[str, List[Dict[str, float | str]]]:
+        return {
+            region: [
+                {"url": p.url, "latency": round(p.latency, 3), "success": round(p.success, 2), "checks": p.checks}
+                for p in sorted(proxies.values(), key=lambda p: p.score)
+            ]
+            for region, proxies in self._proxies.items()
+        }
+
+    # --- Фоновые пробы ---
+
+    async def _probe(self, state: ProxyState, sem: asyncio.Semaphore) -> None:
+        session = http_client.get_session("proxy")
+        async with sem:
+            started = time.monotonic()
+            try:
+                async with session.head(
+                    PROBE_URL, proxy=state.url, allow_redirects=True,
+                    timeout=aiohttp.ClientTimeout(total=PROBE_TIMEOUT),
+                ) as resp:
+                    ok = resp.status < 500 and resp.status not in _BAD_STATUSES
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                ok = False
+            self.report(state.url, ok, time.monotonic() - started)
+
+    async def probe_all(self) -> None:
+        sem = asyncio.Semaphore(PROBE_CONCURRENCY)
+        states = [p for proxies in self._proxies.values() for p in proxies.values()]
+        await asyncio.gather(*(self._probe(p, sem) for p in states))
+        alive = sum(p.healthy(time.time()) for p in states)
+        logger.info(f"[proxy] проверено {len(states)} прокси, здоровых: {alive}")
+
+    async def _probe_loop(self) -> None:
+        while True:
+            self.reload()
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.warning(f"[proxy] ошибка цикла проверки: {e}")
+            await asyncio.sleep(PROBE_INTERVAL)
+
+    def start(self) -> None:
+        """Запускает фоновые пробы (и подхватывает файл со списком)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+manager = ProxyManager()
+
+
+def get_proxy(region: str) -> str | None:
+    """Возвращает самый быстрый здоровый прокси для региона или None."""
+    return manager.best(region)
 
 
 def ban_proxy(url: str, timeout: int = _BLOCK_SECS) -> None:
     """Помечает прокси как нерабочий на *timeout* секунд."""
-    _BAD_MAP[url] = _now() + timeout 
\ No newline at end of file
+    manager.ban(url, timeout)
+
+
+async def fetch_text(
+    session: aiohttp.ClientSession | store_guard.GuardedSession,
+    url: str,
+    region: str,
+    *,
+    headers: Dict[str, str] | None = None,
+    params: Dict[str, str] | None = None,
+) -> Tuple[int, str]:
+    """GET через лучший прокси региона; если его нет или он подвёл – напрямую через *session*.
+
+    Возвращает (status, text). Ошибки прямого запроса пробрасываются вызывающему.
+    Запрос через прокси идёт сессией "proxy" мимо store_guard: сбой прокси –
+    не сбой магазина, и токены магазина на него не тратятся.
+    """
+    proxy = manager.best(region)
+    if proxy:
+        started = time.monotonic()
+        try:
+            async with http_client.get_session("proxy").get(
+                url, headers=headers, params=params, proxy=proxy,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            ) as resp:
+                text = await resp.text()
+                ok = resp.status < 500 and resp.status not in _BAD_STATUSES
+                manager.report(proxy, ok, time.monotonic() - started)
+                if ok:
+                    return resp.status, text
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"[proxy] {proxy} ({region}) не ответил: {e}")
+            manager.report(proxy, False)
+
+    async with session.get(url, headers=headers, params=params) as resp:
+        return resp.status, await resp.text()
@@ -1,10 +1,10 @@
 """PlayStation Store integration: поиск игр и получение цен через HTML JSON (__NEXT_DATA__).
 
 search_games(query, region="US") -> [("ps:{productId}", title), ...]
-get_offers(game_id, region="US") -> [(label, price, currency, url, ps_plus, platforms)]
+get_offers(game_id, region="US") -> [Offer]
 
-ps_plus – True, если предложение связано с PS Plus (serviceBranding или upsellServiceBranding содержит PS_PLUS).
-platforms – список строк, например ["PS4", "PS5"].
+Offer.included – игра входит в каталог PS Plus, Offer.subscription_price –
+отдельная цена для подписчиков PS Plus.
 """
 
 from __future__ import annotations
@@ -19,6 +19,9 @@ from loguru import logger
 from urllib.parse import urlencode as _urlencode
 import asyncio
 
+from telegram_videogame_bot import http_client, page_json, singleflight, store_cache
+from telegram_videogame_bot.offers import Offer
+
 # Валюты, в которых PlayStation Store возвращает цены уже в целых единицах,
 # поэтому делить на 100 не нужно (иначе получим ×0.01).
 _NO_DECIMAL_CURRENCIES = {
@@ -32,8 +35,24 @@ _NO_DECIMAL_CURRENCIES = {
 
 
 # --- Caches ---
-_SEARCH_CACHE: TTLCache[str, List[Tuple[str, str]]] = TTLCache(maxsize=1024, ttl=12 * 60 * 60)  # 12h
-_PRODUCT_CACHE: TTLCache[Tuple[str, str], List[Tuple]] = TTLCache(maxsize=4096, ttl=30 * 60)  # 30m
+_SEARCH_CACHE = store_cache.TieredCache("ps:search", TTLCache(maxsize=1024, ttl=12 * 60 * 60))  # 12h
+# Цены: после 30 мин отдаём из кэша и обновляем в фоне, после 6 ч – ждём запрос
+_PRODUCT_CACHE = store_cache.TieredCache(
+    "ps:product", TTLCache(maxsize=4096, ttl=6 * 60 * 60), soft_ttl=30 * 60
+)
+
+# conceptId + регион → региональный productId. Сопоставление меняется редко,
+# а страница концепта весит сотни КБ, поэтому TTL длинный.
+_CONCEPT_CACHE = store_cache.TieredCache("ps:concept", TTLCache(maxsize=8192, ttl=7 * 24 * 60 * 60))
+_CONCEPT_FANOUT = 4   # одновременных загрузок страниц концептов
+# (invariant_name или базовый productId, регион) → региональный productId
+_REGIONAL_ID_CACHE = store_cache.TieredCache("ps:regional", TTLCache(maxsize=8192, ttl=7 * 24 * 60 * 60))
+
+# Префикс SKU productId по регионам: UP – SIE America, EP – SIE Europe (включая TR, PL, UA, IN, RU, KZ).
+# Внутри одного префикса productId обычно совпадает, между UP/EP часто отличается только префикс.
+_REGION_SKU_PREFIX = {"US": "UP", "BR": "UP", "AR": "UP"}
+_DEFAULT_SKU_PREFIX = "EP"
+_concept_slots: asyncio.Semaphore | None = None
 
 # --- Region → locale mapping ---
 _REGION_TO_LOCALE = {
@@ -78,17 +97,6 @@ _SEARCH_URL_TEMPLATE = "https://store.playstation.com/{locale}/search/{query}"
 _PRODUCT_URL_TEMPLATE = "https://store.playstation.com/{locale}/product/{product_id}"
 
 
-def _extract_next_data(html: str) -> Dict[str, Any] | None:
-    """Извлекает JSON из тега <script id="__NEXT_DATA__">...</script>."""
-    m = re.search(r"<script id=\"__NEXT_DATA__\"[^>]*>(\{.*?\})</script>", html, re.DOTALL)
-    if not m:
-        return None
-    try:
-        return json.loads(m.group(1))
-    except (json.JSONDecodeError, TypeError) as e:
-        logger.warning(f"[PS] JSON decode error: {e}")
-        return None
-
 # --------------------------------------------------------------------------------------
 # Поиск
 # --------------------------------------------------------------------------------------
@@ -104,24 +112,24 @@ async def search_games(query: str, *, region: str = "US", limit: int = 40) -> Li
     locale = _REGION_TO_LOCALE.get(region, "en-us")
     # v3 кэша с invariantName
     cache_key = f"{locale}:{query.lower()}:v3"
-    if cache_key in _SEARCH_CACHE:
-        cached_item = _SEARCH_CACHE[cache_key]
+    cached_item = await _SEARCH_CACHE.get(cache_key)
+    if cached_item is not None:
         if len(cached_item) > 0 and len(cached_item[0]) == 4:
              return cached_item[:limit]
 
     url = _SEARCH_URL_TEMPLATE.format(locale=locale, query=aiohttp.helpers.quote(query))
+    session = http_client.get_session("ps")
     try:
-        async with aiohttp.ClientSession(headers={**HEADERS, "Accept-Language": locale}) as session:
-            async with session.get(url, timeout=15) as resp:
-                if resp.status != 200:
-                    logger.info(f"[PS] search HTTP {resp.status}")
-                    return []
-                html = await resp.text()
+        async with session.get(url, headers={**HEADERS, "Accept-Language": locale}) as resp:
+            if resp.status != 200:
+                logger.info(f"[PS] search HTTP {resp.status}")
+                return []
+            html = await resp.text()
     except Exception as e:
         logger.warning(f"[PS] search HTTP error: {e}")
         return []
 
-    data = _extract_next_data(html)
+    data = page_json.extract_next_data(html)
     if not data:
         logger.warning("[PS] could not find __NEXT_DATA__ on search page")
         return []
@@ -131,6 +139,7 @@ async def search_games(query: str, *, region: str = "US", limit: int = 40) -> Li
         return []
 
     results: List[Tuple[str, str, str | None, str | None]] = []
+    concept_products: Dict[str, set] = {}
     for key, item in apollo.items():
         if not key.startswith("Product:"):
             continue
@@ -153,6 +162,9 @@ async def search_games(query: str, *, region: str = "US", limit: int = 40) -> Li
 
         if not title or not pid:
             continue
+
+        if concept_id:
+            concept_products.setdefault(concept_id, set()).add(pid)
         
         game_id = f"ps:{pid}"
         results.append((game_id, title, concept_id, invariant_name))
@@ -161,6 +173,13 @@ async def search_games(query: str, *, region: str = "US", limit: int = 40) -> Li
         logger.info(f"[PS] No products found in apolloState for '{query}'")
         return []
 
+    # Прогреваем concept→productId: только однозначные концепты (один продукт в выдаче)
+    region_code = region.upper()
+    warm = [((cid, region_code), next(iter(pids))) for cid, pids in concept_products.items() if len(pids) == 1]
+    warm = [(k, pid) for k, pid in warm if _CONCEPT_CACHE.peek(k) is None]
+    if warm:
+        await _CONCEPT_CACHE.set_many(warm)
+
     def relevance_key(game_title: str) -> tuple:
         title_norm = game_title.lower()
         query_norm = query.lower().strip()
@@ -189,7 +208,7 @@ async def search_games(query: str, *, region: str = "US", limit: int = 40) -> Li
     
     results = results[:limit]
     
-    _SEARCH_CACHE[cache_key] = results
+    await _SEARCH_CACHE.set(cache_key, results)
     return results
 
 async def search_ps_store_games_for_country(session, query: str, lang: str, country_code: str, invariant_name: str, limit: int = 40) -> List[Dict[str, str]]:
@@ -233,10 +252,33 @@ async def _fetch_price_product(product_id: str | None, region: str) -> dict | No
     if not product_id:
         return None
 
+    region = region.upper()
+
+    # Одинаковые одновременные запросы склеиваются в один; медленный ответ страхуется повтором
+    def fetch():
+        return singleflight.run(
+            ("ps", "product", product_id, region),
+            lambda: http_client.hedged("ps", lambda: _fetch_price_product_uncached(product_id, region)),
+        )
+
     cache_key = (product_id, region)
-    if cache_key in _PRODUCT_CACHE:
-        return _PRODUCT_CACHE[cache_key]
+    cached = await _PRODUCT_CACHE.get(cache_key, refresh=fetch)
+    if cached is not None:
+        return cached
+
+    return await fetch()
 
+
+def price_age(product_id: str, region: str) -> float | None:
+    """Возраст закэшированных данных о цене в секундах (None – в кэше нет)."""
+    if product_id.startswith("ps:"):
+        product_id = product_id[3:]
+    return _PRODUCT_CACHE.age((product_id, region.upper()))
+
+
+async def _fetch_price_product_uncached(product_id: str, region: str) -> dict | None:
+    """GraphQL-запрос productRetrieveForCtasWithPrice без проверки кэша."""
+    cache_key = (product_id, region)
     locale = _REGION_TO_LOCALE.get(region.upper(), "en-us")
     variables = {"productId": product_id}
     params = {
@@ -256,29 +298,56 @@ async def _fetch_price_product(product_id: str | None, region: str) -> dict | No
         "x-ps-country-code": region.upper(),
     }
 
+    session = http_client.get_session("ps")
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, timeout=15) as resp:
-                if resp.status != 200:
-                    logger.info(f"[PS_API] CTA HTTP {resp.status} for {product_id} in {region}")
-                    return None
-                data = await resp.json()
-                product_data = data.get("data", {}).get("productRetrieve")
-                if product_data:
-                    _PRODUCT_CACHE[cache_key] = product_data
-                return product_data
+        # Регион задаёт заголовок x-ps-country-code, а не IP – прокси здесь не нужен
+        async with session.get(url, headers=headers) as resp:
+            if resp.status != 200:
+                logger.info(f"[PS_API] CTA HTTP {resp.status} for {product_id} in {region}")
+                return None
+            data = await resp.json()
+            product_data = data.get("data", {}).get("productRetrieve")
+            if product_data:
+                await _PRODUCT_CACHE.set(cache_key, product_data)
+            return product_data
     except Exception as e:
         logger.info(f"[PS_API] CTA HTTP error for {product_id} in {region}: {e}")
         return None
 
 
+def _concept_fanout() -> asyncio.Semaphore:
+    global _concept_slots
+    if _concept_slots is None:
+        _concept_slots = asyncio.Semaphore(_CONCEPT_FANOUT)
+    return _concept_slots
+
+
 async def get_product_id_from_concept(concept_id: str, region: str) -> str | None:
+    """Региональный product_id для концепта (кэш, иначе страница концепта)."""
+    region = region.upper()
+    cache_key = (concept_id, region)
+    cached = await _CONCEPT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Одинаковые одновременные запросы склеиваются в один
+    product_id = await singleflight.run(
+        ("ps", "concept", concept_id, region),
+        lambda: _fetch_product_id_from_concept(concept_id, region),
+    )
+    if product_id:
+        await _CONCEPT_CACHE.set(cache_key, product_id)
+    return product_id
+
+
+async def _fetch_product_id_from_concept(concept_id: str, region: str) -> str | None:
     """Получает региональный product_id со страницы концепта."""
     locale = _REGION_TO_LOCALE.get(region, "en-us")
     url = f"https://store.playstation.com/{locale}/concept/{concept_id}"
+    session = http_client.get_session("ps")
     try:
-        async with aiohttp.ClientSession(headers=HEADERS) as session:
-            async with session.get(url, timeout=15) as resp:
+        async with _concept_fanout():
+            async with session.get(url, headers=HEADERS) as resp:
                 if resp.status != 200:
                     logger.warning(f"Failed to fetch concept page {url}, status: {resp.status}")
                     return None
@@ -287,7 +356,7 @@ async def get_product_id_from_concept(concept_id: str, region: str) -> str | Non
         logger.warning(f"Error fetching concept page {url}: {e}")
         return None
     
-    data = _extract_next_data(html)
+    data = page_json.extract_next_data(html)
     if not data:
         logger.warning(f"Could not find __NEXT_DATA__ on concept page {url}")
         return None
@@ -307,12 +376,18 @@ async def get_product_id_from_concept(concept_id: str, region: str) -> str | Non
     return None
 
 
-async def get_product_price(product_id: str, country_code: str) -> dict | None:
+def _product_url(product_id: str, region: str) -> str:
+    lang, country = PS_REGION_CONFIG.get(region.lower(), ("en", region.upper()))
+    return f"https://store.playstation.com/{lang}-{country.lower()}/product/{product_id}"
+
+
+async def get_product_price(product_id: str, country_code: str) -> Offer | None:
     """
     Извлекает и обрабатывает информацию о цене для заданного продукта.
     """
     if product_id.startswith("ps:"):
         product_id = product_id[3:]
+    region = country_code.upper()
 
     product_data = await _fetch_price_product(product_id, country_code)
 
@@ -368,35 +443,29 @@ async def get_product_price(product_id: str, country_code: str) -> dict | None:
             final_price = discounted_value / divisor
             old_price = base_price_value / divisor
         
-        discount = 0
-        if old_price > 0 and final_price < old_price:
-            discount = round(100 - (final_price * 100 / old_price))
-        
         # Определяем, включена ли игра в PS Plus
         is_included_in_plus = catalog_cta is not None and (final_price == 0.0 or "Included" in (price_info.get("discountText") or ""))
 
         # Ищем отдельную скидку для подписчиков PS Plus
         ps_plus_price = None
-        is_ps_plus_special = False
         plus_discount_cta = next((c for c in product_data["webctas"] if c.get("type") == "UPSELL_PS_PLUS_DISCOUNT" and c.get("price")), None)
         if plus_discount_cta:
             plus_price_info = plus_discount_cta["price"]
             plus_discounted_value = plus_price_info.get("discountedValue")
             if plus_discounted_value is not None:
-                ps_plus_price = plus_discounted_value / 100
-                is_ps_plus_special = True
-
-
-        return {
-            "price": final_price,
-            "currency": price_info.get("currencyCode"),
-            "discount": discount,
-            "old_price": old_price if discount > 0 and old_price > final_price else None,
-            "ps_plus_price": ps_plus_price,
-            "is_ps_plus_special": is_ps_plus_special,
-            "is_free": final_price == 0.0 and not is_included_in_plus,
-            "included_in_ps_plus": is_included_in_plus,
-        }
+                ps_plus_price = plus_discounted_value / divisor
+
+        return Offer(
+            store="ps",
+            region=region,
+            label="PlayStation Store" if region == "RU" else f"PlayStation Store {region}",
+            price=final_price,
+            currency=currency_code or ("FREE" if final_price == 0.0 else "USD"),
+            url=_product_url(product_id, region),
+            old_price=old_price if old_price > final_price else None,
+            subscription_price=ps_plus_price,
+            included=is_included_in_plus,
+        )
     except (ValueError, TypeError, KeyError) as e:
         logger.error(
             f"Ошибка при обработке цены для {product_id}: {e}. Price data: {price_info}"
@@ -404,7 +473,7 @@ async def get_product_price(product_id: str, country_code: str) -> dict | None:
         return None
 
 
-async def get_offers(game_id: str, *, region: str = "US") -> List[Tuple]:
+async def get_offers(game_id: str, *, region: str = "US") -> List[Offer]:
     """Получение офферов для игры через GraphQL.
 
     Args:
@@ -412,25 +481,75 @@ async def get_offers(game_id: str, *, region: str = "US") -> List[Tuple]:
         region: Двухбуквенный код региона (RU, US, TR, etc.)
 
     Returns:
-        Список кортежей с офферами.
+        Список Offer (пустой, если цены нет).
     """
     if not game_id or not game_id.startswith("ps:"):
         return []
     
     product_id = game_id.split(":", 1)[1]
-    cache_key = (product_id, region.upper())
+    # _fetch_price_product сам работает с кэшем (в т.ч. stale-while-revalidate)
+    offer = await get_product_price(product_id, region)
+    return [offer] if offer else []
 
-    if cache_key in _PRODUCT_CACHE:
-        cached = _PRODUCT_CACHE.get(cache_key)
-        if cached is not None:
-            return cached
+def _regional_candidate(base_product_id: str, region: str) -> str | None:
+    """productId для региона по шаблону SKU базового id (UP1004-… ↔ EP1004-…)."""
+    m = re.match(r"^(UP|EP|HP|JP)(\d{4}-.+)$", base_product_id)
+    if not m:
+        return None
+    return _REGION_SKU_PREFIX.get(region.upper(), _DEFAULT_SKU_PREFIX) + m.group(2)
 
-    offers = await _fetch_price_product(product_id, region.upper())
 
-    if offers:
-        _PRODUCT_CACHE[cache_key] = offers
-    
-    return offers
+async def _has_price(product_id: str | None, region: str) -> bool:
+    """Лёгкая проверка через GraphQL (ответ кэшируется и потом идёт на саму цену)."""
+    if not product_id:
+        return False
+    product_data = await _fetch_price_product(product_id, region)
+    return bool(product_data and product_data.get("webctas"))
+
+
+async def resolve_regional_product_id(
+    base_product_id: str,
+    region: str,
+    *,
+    name: str,
+    invariant_name: str | None = None,
+    concept_id: str | None = None,
+) -> str | None:
+    """Региональный productId: шаблон SKU → граф концепта → поиск (только при промахе).
+
+    Результат кэшируется по (invariant_name, регион).
+    """
+    region = region.upper()
+    cache_key = (invariant_name or base_product_id, region)
+    cached = await _REGIONAL_ID_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    product_id = None
+    # 1. Тот же id или id с префиксом SKU региона
+    for candidate in dict.fromkeys(filter(None, (_regional_candidate(base_product_id, region), base_product_id))):
+        if await _has_price(candidate, region):
+            product_id = candidate
+            break
+
+    # 2. Граф концепта
+    if product_id is None and concept_id:
+        candidate = await get_product_id_from_concept(concept_id, region)
+        if await _has_price(candidate, region):
+            product_id = candidate
+
+    # 3. Полный поиск по региону
+    if product_id is None:
+        lang, country = PS_REGION_CONFIG[region.lower()]
+        found = await search_ps_store_games_for_country(None, name, lang, country, invariant_name or "")
+        if found and found[0].get("id"):
+            product_id = found[0]["id"]
+            logger.info(f"[PS] {region}: productId для '{name}' найден только поиском: {product_id}")
+
+    if product_id:
+        await _REGIONAL_ID_CACHE.set(cache_key, product_id)
+    return product_id
+
 
 async def get_ps_store_prices(session, game_details, country_codes):
     logger.info(f"Начало получения цен из PS Store для '{game_details.get('name', 'Unknown Game')}'.")
@@ -445,149 +564,34 @@ async def get_ps_store_prices(session, game_details, country_codes):
         logger.warning(f"Отсутствует ps_store_id для '{game_details.get('name', 'Unknown Game')}', пропускаем PS Store.")
         return ps_prices
 
-    async def fetch_price(country_code, product_id):
-        lang, country = PS_REGION_CONFIG[country_code]
+    async def fetch_price(country_code):
         try:
-            price_info = await get_ps_price(session, product_id, country_code)
-            if price_info:
-                price_info['url'] = f"https://store.playstation.com/{lang}-{country.lower()}/product/{product_id}"
-                return price_info
+            product_id = await resolve_regional_product_id(
+                base_product_id,
+                country_code,
+                name=game_details['name'],
+                invariant_name=invariant_name,
+                concept_id=game_details.get('concept_id'),
+            )
+            if not product_id:
+                logger.warning(f"Не удалось найти игру '{game_details['name']}' в регионе {country_code}.")
+                return None
+            return await get_ps_price(session, product_id, country_code)
         except Exception as e:
-            logger.error(f"Ошибка при получении цены для {country_code} (ID: {product_id}): {e}")
+            logger.error(f"Ошибка при получении цены для {country_code} (ID: {base_product_id}): {e}")
         return None
 
-    tasks = {}
-    
-    # Создаем задачи для всех стран, включая США
-    # Для США и других стран логика теперь едина: найти ID и получить цену
-    # Но для США у нас уже есть ID, а для других его нужно найти
-    
-    # Сначала для США
-    if 'us' in country_codes:
-        tasks['us'] = asyncio.create_task(fetch_price('us', base_product_id))
-        country_codes.remove('us')
-
-    # Затем для остальных стран
-    search_tasks = {}
-    for code in country_codes:
-        lang, country = PS_REGION_CONFIG[code]
-        search_tasks[code] = asyncio.create_task(
-            search_ps_store_games_for_country(session, game_details['name'], lang, country, invariant_name or "")
-        )
-
-    # Запускаем поиск региональных ID
-    search_results = await asyncio.gather(*search_tasks.values())
-    
-    # Создаем задачи на получение цен по найденным региональным ID
-    for (code, _), country_results in zip(search_tasks.items(), search_results):
-        if country_results and country_results[0].get('id'):
-            regional_product_id = country_results[0]['id']
-            tasks[code] = asyncio.create_task(fetch_price(code, regional_product_id))
-        else:
-            logger.warning(f"Не удалось найти игру '{game_details['name']}' в регионе {code}.")
- 
-    # Ожидаем выполнения всех задач по получению цен
-    # asyncio.gather сохраняет порядок, поэтому мы можем сопоставить результаты
-    # с кодами стран.
-    if tasks:
-        task_codes = list(tasks.keys())
-        results = await asyncio.gather(*tasks.values())
-
-        for code, result in zip(task_codes, results):
-            if result:
-                ps_prices[code] = result
+    # Все страны параллельно: найти региональный ID (обычно без поиска) и получить цену
+    results = await asyncio.gather(*(fetch_price(code) for code in country_codes))
+    for code, result in zip(country_codes, results):
+        if result:
+            ps_prices[code] = result
  
     logger.info(f"Завершено получение цен из PS Store. Найдено цен для {len(ps_prices)} регионов.")
     return ps_prices
 
 
-async def get_ps_price(session, product_id, country_code):
-    lang, country = PS_REGION_CONFIG[country_code]
-    product_data = await _fetch_price_product(product_id, country_code)
-
-    if not product_data or not product_data.get("webctas"):
-        logger.warning(
-            f"Не найдены CTA для product_id: {product_id} в регионе {country_code}"
-        )
-        return None
-
-    purchase_cta = None
-    catalog_cta = None
-    download_cta = None
-    
-    # 1. Ищем основные типы предложений
-    for cta in product_data["webctas"]:
-        cta_type = cta.get("type")
-        if cta_type in ["ADD_TO_CART", "PRE_ORDER"]:
-            purchase_cta = cta
-        elif cta_type == "UPSELL_PS_PLUS_GAME_CATALOG":
-            catalog_cta = cta
-        elif cta_type == "DOWNLOAD":
-            download_cta = cta
-    
-    # 2. Выбираем основной оффер для определения цены
-    main_cta = purchase_cta or catalog_cta or download_cta
-    
-    if not main_cta or not main_cta.get("price"):
-        logger.warning(
-            f"Не удалось найти основной оффер с ценой для {product_id} в {country_code}. CTAs: {product_data['webctas']}"
-        )
-        return None
-        
-    price_info = main_cta.get("price")
-    
-    # Если есть и покупка, и каталог, цена покупки приоритетнее
-    if purchase_cta and purchase_cta.get("price"):
-        price_info = purchase_cta.get("price")
-
-    # 3. Парсим информацию о цене
-    try:
-        currency_code = price_info.get("currencyCode") or ""
-        divisor = 1 if currency_code in _NO_DECIMAL_CURRENCIES else 100
-
-        base_price_value = price_info.get("basePriceValue", 0)
-        discounted_value = price_info.get("discountedValue", 0)
-        
-        # Для игр из каталога цена покупки может быть в basePrice, а discounted - 0 ("Included")
-        if catalog_cta and not purchase_cta:
-             # Если игра только в каталоге, ее цена покупки - это basePrice, а цена по подписке - 0
-             final_price = 0.0
-             old_price = base_price_value / divisor if base_price_value else 0.0
-        else:
-            final_price = discounted_value / divisor
-            old_price = base_price_value / divisor
-        
-        discount = 0
-        if old_price > 0 and final_price < old_price:
-            discount = round(100 - (final_price * 100 / old_price))
-        
-        # Определяем, включена ли игра в PS Plus
-        is_included_in_plus = catalog_cta is not None and (final_price == 0.0 or "Included" in (price_info.get("discountText") or ""))
-
-        # Ищем отдельную скидку для подписчиков PS Plus
-        ps_plus_price = None
-        is_ps_plus_special = False
-        plus_discount_cta = next((c for c in product_data["webctas"] if c.get("type") == "UPSELL_PS_PLUS_DISCOUNT" and c.get("price")), None)
-        if plus_discount_cta:
-            plus_price_info = plus_discount_cta["price"]
-            plus_discounted_value = plus_price_info.get("discountedValue")
-            if plus_discounted_value is not None:
-                ps_plus_price = plus_discounted_value / 100
-                is_ps_plus_special = True
-
-
-        return {
-            "price": final_price,
-            "currency": price_info.get("currencyCode"),
-            "discount": discount,
-            "old_price": old_price if discount > 0 and old_price > final_price else None,
-            "ps_plus_price": ps_plus_price,
-            "is_ps_plus_special": is_ps_plus_special,
-            "is_free": final_price == 0.0 and not is_included_in_plus,
-            "included_in_ps_plus": is_included_in_plus,
-        }
-    except (ValueError, TypeError, KeyError) as e:
-        logger.error(
-            f"Ошибка при обработке цены для {product_id}: {e}. Price data: {price_info}"
-        )
-        return None 
\ No newline at end of file
+async def get_ps_price(session, product_id, country_code) -> Offer | None:
+    """Цена продукта в регионе country_code (us, tr, ...); session оставлен для совместимости."""
+    _, country = PS_REGION_CONFIG[country_code]
+    return await get_product_price(product_id, country)
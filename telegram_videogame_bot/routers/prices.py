@@ -1,8 +1,8 @@
 from collections import defaultdict
 from typing import List, Tuple, Dict, Any
 import asyncio
+import os
 import re  # для безопасного удаления HTML-тегов
-import aiohttp  # для PS Store fallback
 
 from aiogram import F, Router, types
 from aiogram.exceptions import TelegramBadRequest
@@ -13,8 +13,9 @@ from loguru import logger
 from fuzzywuzzy import fuzz, process
 
 # Добавляем PlayStation Store и Nintendo eShop
-from telegram_videogame_bot import epic_store, gog_store, steam_store, ms_store, ps_store, nintendo_eshop_api, utils
-# from telegram_videogame_bot import origin_store
+from telegram_videogame_bot import epic_store, gog_store, steam_store, ms_store, ps_store, nintendo_eshop_api, utils, http_client, prices_func
+from telegram_videogame_bot.nintendo_eshop_api import nintendo_api
+from telegram_videogame_bot import browser_pool, origin_store, store_guard
 from telegram_videogame_bot.base_keyboards import inline_menu_keyboard
 from telegram_videogame_bot.prices_keyboards import (
     build_games_keyboard,
@@ -24,12 +25,37 @@ from telegram_videogame_bot.prices_keyboards import (
     cancel_keyboard,
     offers_keyboard
 )
-from telegram_videogame_bot.prices_func import convert_currency
+from telegram_videogame_bot.offers import Offer, normalize_prices
 
 router = Router()
 
 GAMES_PER_PAGE = 15
 
+# Минимальный интервал между промежуточными перерисовками экрана цен (сек.)
+PROGRESS_EDIT_INTERVAL = 1.5
+
+# Общий бюджет времени на сбор цен (сек.). По истечении незавершённые задачи
+# отменяются, а экран рисуется с тем, что успели получить.
+PRICE_DEADLINE = float(os.getenv("PRICE_DEADLINE", "20"))
+
+# Мягкие дедлайны отдельных магазинов (сек.), ключ – метка задачи из task_meta
+STORE_DEADLINES = {
+    "steam": 8,
+    "gog": 8,
+    "ms": 12,
+    "epic": 15,
+    "ps": 15,
+    "ps_fallback": 18,
+    "nintendo_nintendo": 12,
+    "origin": 15,
+}
+
+# Семейство хостов (store_guard / http_client) для ключа магазина из game_ids
+GUARD_FAMILY = {"switch": "nintendo", "switch2": "nintendo", "nintendo_switch": "nintendo"}
+
+# Поиск EA идёт через браузер – не даём ему задерживать выдачу остальных магазинов
+ORIGIN_SEARCH_TIMEOUT = float(os.getenv("ORIGIN_SEARCH_TIMEOUT", "12"))
+
 # Создаём словарь с флагами для регионов для красивого отображения
 REGION_FLAGS = {code: name.split(" ")[0] for code, name in REGIONS}
 
@@ -63,6 +89,7 @@ STORE_DISPLAY = {
     "ps": "PlayStation Store",
     "nintendo": "Nintendo eShop",
     "nintendo_switch2": "Nintendo eShop (Switch 2)",
+    "origin": "EA App",
 }
 
 
@@ -169,7 +196,7 @@ async def confirm_regions(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-async def get_ps_regional_price(concept_id: str, region: str) -> tuple[str, dict | None]:
+async def get_ps_regional_price(concept_id: str, region: str) -> tuple[str, Offer | None]:
     """
     Получает цену для PS Store в определенном регионе, используя conceptId.
     Возвращает кортеж (использованный_id, данные_о_цене).
@@ -184,6 +211,25 @@ async def get_ps_regional_price(concept_id: str, region: str) -> tuple[str, dict
     return regional_product_id, price_data
 
 
+def _result_store_key(store: str) -> str:
+    """Ключ магазина в store_region для метки задачи из task_meta."""
+    if store == "ps_fallback":
+        return "ps"
+    if store.startswith("nintendo_"):
+        return "nintendo_switch2" if "switch2" in store else "nintendo"
+    return store
+
+
+def _format_data_age(seconds: float) -> str:
+    """Подпись о возрасте цен, взятых из кэша (stale-while-revalidate)."""
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        age = f"{minutes} мин"
+    else:
+        age = f"{minutes // 60} ч {minutes % 60} мин"
+    return f"<i>🕒 Часть цен из кэша, обновлены {age} назад</i>"
+
+
 async def show_prices_for_game(
     editable_message: types.Message, state: FSMContext, game_group: Dict[str, Any], game_index: int
 ):
@@ -206,8 +252,6 @@ async def show_prices_for_game(
 
     logger.info(f"game_ids для выбранной игры: {game_ids}")
 
-    ps_fallback_prices: Dict[str, dict] | None = None  # Цены из новой логики (без conceptId)
-
     # Определяем, какие регионы реально запрашивать для PS
     ps_regions_to_fetch = set(regions_sel)
     remap_ru_kz = "RU" in ps_regions_to_fetch or "KZ" in ps_regions_to_fetch
@@ -216,7 +260,14 @@ async def show_prices_for_game(
         ps_regions_to_fetch.discard("KZ")
         ps_regions_to_fetch.add("US")  # Убедимся, что US будет запрошен
 
+    unavailable_stores: set[str] = set()  # отключены предохранителем (store_guard)
+
     for store_name, game_id in game_ids.items():
+        # Магазин недавно сыпал ошибками – не ждём его таймаутов, сразу пишем «недоступен»
+        if store_guard.is_open(GUARD_FAMILY.get(store_name, store_name)):
+            logger.info(f"{store_name}: предохранитель разомкнут, запрос цен пропущен")
+            unavailable_stores.add(store_name)
+            continue
         if store_name == "ps":
             if not ps_concept_id:
                 # --- Новый fallback: используем product_id и invariant_name ---
@@ -233,10 +284,10 @@ async def show_prices_for_game(
 
                 ps_region_codes = [c.lower() for c in ps_regions_to_fetch]
 
-                # Запускаем в отдельной задаче с собственным ClientSession, чтобы не блокировать другие
+                # Запускаем в отдельной задаче на общей PS-сессии, чтобы не блокировать другие
                 async def _get_fallback_prices():
-                    async with aiohttp.ClientSession() as session:
-                        return await ps_store.get_ps_store_prices(session, game_details, ps_region_codes)
+                    session = http_client.get_session("ps")
+                    return await ps_store.get_ps_store_prices(session, game_details, ps_region_codes)
 
                 offer_tasks.append(_get_fallback_prices())
                 task_meta.append(("ps_fallback", "ALL"))
@@ -244,143 +295,77 @@ async def show_prices_for_game(
             # --- Старый путь через conceptId ---
             for reg in ps_regions_to_fetch:
                 offer_tasks.append(get_ps_regional_price(ps_concept_id, reg))
-            task_meta.append((store_name, reg))
-        else:
-            # Для остальных магазинов логика прежняя
+                task_meta.append((store_name, reg))
+        elif store_name == "epic":
+            # Epic — цены всех регионов одним GraphQL-запросом (алиасы price(country: X))
+            offer_tasks.append(epic_store.get_offers_multi(game_id, list(regions_sel)))
+            task_meta.append(("epic", "ALL"))
+        elif store_name == "ms":
+            # Xbox — каталог DisplayCatalog по всем рынкам сразу, HTML только для промахов
+            offer_tasks.append(ms_store.get_offers_multi(game_id, list(regions_sel)))
+            task_meta.append(("ms", "ALL"))
+        elif store_name == "steam":
+            # Steam — цены всех регионов пачками appdetails (filters=price_overview)
+            offer_tasks.append(steam_store.get_offers_multi(game_id, list(regions_sel)))
+            task_meta.append(("steam", "ALL"))
+        elif store_name in ["switch", "switch2", "nintendo", "nintendo_switch"]:
+            # Nintendo eShop — nsuid уже есть из поиска, цены по всем регионам одной задачей
+            offer_tasks.append(nintendo_api.get_offers(game_id, list(regions_sel), title=selected_title))
+            task_meta.append((f"nintendo_{store_name}", "ALL"))
+        elif store_name == "gog":
+            # GOG — цены по странам напрямую по id продукта, регионы параллельно
+            offer_tasks.append(gog_store.get_offers_multi(game_id, list(regions_sel)))
+            task_meta.append(("gog", "ALL"))
+        elif store_name == "origin":
+            # EA App — страницы через общий пул браузера (browser_pool), только известные локали
             for reg in regions_sel:
-                if store_name == "gog" and reg != "RU":
-                    continue
-                
-                module_map = {
-                    "steam": steam_store, "epic": epic_store, 
-                    "gog": gog_store, "ms": ms_store
-                }
-                if store_name in module_map:
-                    offer_tasks.append(module_map[store_name].get_offers(game_id, reg))
-                    task_meta.append((store_name, reg))
-                elif store_name in ["switch", "switch2", "nintendo", "nintendo_switch"]:
-                    # Nintendo eShop — поиск и цены через новый API
-                    from telegram_videogame_bot.nintendo_eshop_api import nintendo_api
-                    async def nintendo_offers():
-                        try:
-                            logger.info(f"[Nintendo] Получение цен для: {selected_title}, game_id: {game_id}, регионы: {list(regions_sel)}")
-                            # Поиск игры по названию
-                            games = await nintendo_api.search_games(selected_title)
-                            logger.info(f"[Nintendo] search_games вернул: {games}")
-                            if not games:
-                                logger.warning(f"[Nintendo] Не найдено игр для: {selected_title}")
-                                return None
-                            # Берём первую подходящую игру
-                            game = games[0]
-                            # Получаем цены по регионам
-                            prices = await nintendo_api.get_prices(game.nsuid, list(regions_sel))
-                            logger.info(f"[Nintendo] get_prices вернул: {prices}")
-                            # Fallback на US
-                            us_price = prices.get("US")
-                            offers = {}
-                            for reg in regions_sel:
-                                offer = nintendo_api.parse_price(prices.get(reg, {}), us_price)
-                                logger.info(f"[Nintendo] parse_price для региона {reg}: {offer}")
-                                if offer:
-                                    offers[reg] = offer | {
-                                        "url": f"https://www.nintendo.com/store/products/{game.nsuid}",
-                                        "title": game.title,
-                                        "platform": game.platform,
-                                        "price": float(offer["raw_value"]) if "raw_value" in offer and offer["raw_value"] else None,
-                                        "regular": offer["regular"] if "regular" in offer else str(offer["raw_value"]) if "raw_value" in offer else None,
-                                        "discount": offer.get("discount"),
-                                        "discount_end": offer.get("discount_end")
-                                    }
-                            logger.info(f"[Nintendo] Итоговые offers: {offers}")
-                            return offers
-                        except Exception as e:
-                            logger.error(f"[Nintendo] Ошибка в nintendo_offers: {e}")
-                            import traceback; traceback.print_exc()
-                            return None
-                    offer_tasks.append(nintendo_offers())
-                    task_meta.append((f"nintendo_{store_name}", "ALL"))
+                if reg in origin_store.REGION_MAP:
+                    offer_tasks.append(origin_store.get_offers(game_id, reg))
+                    task_meta.append(("origin", reg))
 
     # --- Обработка и отображение результатов ---
-    price_results = await asyncio.gather(*offer_tasks, return_exceptions=True)
-
-    # --- Группируем по магазину/региону ---
-    store_region: dict[str, dict[str, list | dict]] = defaultdict(dict)
+    # Результаты приходят по мере готовности: первый показывается сразу, дальше
+    # сообщение перерисовывается не чаще раза в PROGRESS_EDIT_INTERVAL (по таймеру,
+    # даже если новых ответов после интервала нет), а финальная отсортированная
+    # версия – в конце.
+    store_region: dict[str, dict[str, Offer]] = defaultdict(dict)
     ps_regional_ids = {}  # Для хранения региональных ID PS игр
-    for (store, reg), result in zip(task_meta, price_results):
+    timed_out_stores: set[str] = set()  # магазины, не уложившиеся в дедлайн
+
+    async def _collect(store: str, reg: str, result) -> None:
+        """Раскладывает результат одной задачи по магазину/региону."""
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning(f"Таймаут получения цены {store} {reg}")
+            timed_out_stores.add(_result_store_key(store))
+            return
         if isinstance(result, Exception):
             logger.error(f"Ошибка получения цены {store} {reg}: {result}")
-            continue
-        if result:
+            return
+        if not result:
+            return
+
+        # Приводим результат задачи к виду region→Offer
+        if store == "ps":
+            regional_id, offer = result
+            if not offer:
+                return
+            by_region = {reg: offer}
+            ps_regional_ids[reg] = regional_id
+        elif isinstance(result, dict):
+            # ps_fallback, Epic, Xbox, Steam, GOG и Nintendo: уже region→Offer
+            by_region = {code.upper(): offer for code, offer in result.items() if offer}
             if store == "ps_fallback":
-                # result – это dict region→price_info
-                ps_fallback_prices = result  # сохраним для дальнейшей обработки
-                for reg_code, price_info in result.items():
-                    up_reg = reg_code.upper()
-                    store_region["ps"][up_reg] = price_info
-                    # Извлекаем product_id из URL
-                    prod_id = price_info.get("url", "").split("/")[-1]
-                    if prod_id:
-                        ps_regional_ids[up_reg] = f"ps:{prod_id}"
-            elif store == "ps":
-                regional_id, price_data = result
-                if price_data:
-                    store_region[store][reg] = price_data
-                    ps_regional_ids[reg] = regional_id
-            elif store.startswith("nintendo_"):
-                # Обработка результатов Nintendo eShop
-                if result and isinstance(result, list):
-                    # result - список NintendoGame объектов
-                    for game in result:
-                        if game.price is not None:
-                            # Создаем формат, совместимый с другими магазинами
-                            nintendo_offer = {
-                                "price": game.price,
-                                "currency": game.currency,
-                                "discount_price": game.discount_price,
-                                "platform": game.platform,
-                                "is_nintendo_online": game.is_nintendo_online,
-                                "title": game.title,
-                                "url": f"https://www.nintendo.com/{reg.lower()}/store/products/{game.title_id}"
-                            }
-                            
-                            # Определяем ключ магазина на основе выбранной платформы
-                            store_key = "nintendo"
-                            if "switch2" in store:
-                                store_key = "nintendo_switch2"
-                            
-                            if store_key not in store_region:
-                                store_region[store_key] = {}
-                            store_region[store_key][reg] = nintendo_offer
-                            break  # Берем первую найденную игру
-            else:
-                store_region[store][reg] = result
-
-    # Для PS Store копируем данные из US в RU/KZ, если требуется
-    if remap_ru_kz and "ps" in store_region and "US" in store_region["ps"]:
-        us_offers = store_region["ps"].get("US")
-        us_id = ps_regional_ids.get("US")
-        if us_offers:
-            if "RU" in regions_sel:
-                store_region["ps"]["RU"] = us_offers
-                if us_id: ps_regional_ids["RU"] = us_id
-            if "KZ" in regions_sel:
-                store_region["ps"]["KZ"] = us_offers
-                if us_id: ps_regional_ids["KZ"] = us_id
-
-    if not any(store_region.values()):
-        await editable_message.edit_text(
-            f"Не удалось найти актуальные цены для <b>{selected_title}</b>.",
-            parse_mode="HTML",
-            reply_markup=offers_keyboard(game_index),
-        )
-        return
+                for up_reg, offer in by_region.items():
+                    ps_regional_ids[up_reg] = f"ps:{offer.url.rsplit('/', 1)[-1]}"
+        else:
+            by_region = {reg: result[0]}
 
-    # Дополняем магазины, чтобы отображались только релевантные
-    for _sn in game_ids.keys():
-        store_region.setdefault(_sn, {})
+        # Рубли считаются один раз здесь, рендер и сортировка их только читают
+        await normalize_prices(by_region.values())
+        store_region[_result_store_key(store)].update(by_region)
 
-    async def fmt_price(p: float, cur: str) -> str:
-        """Универсальный форматер цен с конвертацией в рубли."""
+    def fmt_price(p: float, cur: str, rub: float | None = None) -> str:
+        """Форматирует цену; rub – заранее посчитанная цена в рублях."""
         if cur is None or p is None: return ""
         if cur == "FREE" or p == 0.0: return "<b>Бесплатно</b>"
         if cur in ["RUB", "Р", "₽", "INR", "JPY", "KRW", "HUF", "CLP", "VND"]:
@@ -389,100 +374,177 @@ async def show_prices_for_game(
             price_str = f"{p:.2f}"
         main_price_formatted = f"<b>{price_str} {CURRENCY_SYMBOLS.get(cur, cur)}</b>"
         conv_price_str = ""
-        if cur.upper() != 'RUB':
-            converted = await convert_currency(p, cur, 'RUB')
-            if converted:
-                conv_price_str = f" (<i>~{int(converted)} ₽</i>)"
+        if cur.upper() != 'RUB' and rub:
+            conv_price_str = f" (<i>~{int(rub)} ₽</i>)"
         return main_price_formatted + conv_price_str
 
-    async def get_sort_price(store_name: str, offer_data: dict | list) -> float:
-        """Рассчитывает цену для сортировки (в рублях)."""
-        if not offer_data: return float('inf')
-        
-        final_price, currency, is_catalog = float('inf'), None, False
-
-        if store_name == 'ps' and isinstance(offer_data, dict):
-            final_price = offer_data.get("price", float('inf'))
-            currency = offer_data.get("currency")
-            is_catalog = offer_data.get("included_in_ps_plus", False)
-        elif store_name.startswith('nintendo') and isinstance(offer_data, dict):
-            final_price = offer_data.get("price", float('inf'))
-            currency = offer_data.get("currency")
-            is_catalog = offer_data.get("is_nintendo_online", False)
-        elif isinstance(offer_data, list):
-            try:
-                offer = offer_data[0]
-                price = offer[1]
-                currency = offer[2]
-                
-                # Безопасно получаем доп. поля
-                is_catalog = offer[7] if len(offer) > 7 else False
-                discount_val = offer[8] if len(offer) > 8 else None
-                
-                final_price = discount_val if discount_val is not None and discount_val < price else price
-            except (ValueError, IndexError):
-                return float('inf')
-
-        if is_catalog and final_price == 0.0: return 0.0
-        if currency is None or final_price is None or final_price == float('inf'): return float('inf')
-        if currency.upper() in ["RUB", "Р", "₽", "FREE"]: return final_price if currency != "FREE" else 0.0
-        rub_price = await convert_currency(final_price, currency, "RUB")
-        return rub_price if rub_price is not None else float('inf')
-    
+    def _offer_line(reg: str, offer: Offer) -> str:
+        flag = REGION_FLAGS.get(reg, "❔")
+        if offer.included and offer.price == 0.0:
+            price_fmt = "<b>В подписке</b>"
+        else:
+            price_fmt = fmt_price(offer.price, offer.currency, offer.price_rub)
+        if offer.old_price and offer.discount:
+            old_fmt = fmt_price(offer.old_price, offer.currency)
+            price_fmt = f"<s>{old_fmt}</s> {price_fmt} −{offer.discount}%"
+        platform_info = f" ({', '.join(offer.platforms)})" if offer.platforms else ""
+        extras = []
+        if offer.subscription_price is not None:
+            sub_name = "Game Pass" if offer.store == "ms" else "PS Plus"
+            extras.append(f"{sub_name}: {fmt_price(offer.subscription_price, offer.currency)}")
+        elif offer.included and offer.price > 0:
+            extras.append("есть в подписке")
+        if offer.discount_end:
+            extras.append(f"до {offer.discount_end[:10]}")
+        extras_fmt = f" <i>({'; '.join(extras)})</i>" if extras else ""
+        return f'  {flag} <b>{reg}:</b> <a href="{offer.url}">{price_fmt}{platform_info}</a>{extras_fmt}'
+
     # --- Рендер сообщения ---
-    async def _render_store_prices(store_name: str, offers_by_region: dict) -> str:
+    def _render_store_prices(store_name: str, offers_by_region: dict[str, Offer]) -> str:
         lines = [f"<b>{STORE_DISPLAY.get(store_name, store_name.title())}:</b>"]
         if not offers_by_region:
             lines.append("  <i>Нет предложений</i>")
             return "\n".join(lines)
-        sorting_prices = {reg: await get_sort_price(store_name, o) for reg, o in offers_by_region.items()}
-        sorted_regions = sorted(offers_by_region.items(), key=lambda item: sorting_prices.get(item[0], float('inf')))
-        for reg, offer in sorted_regions:
-            if not offer: continue
-            flag = REGION_FLAGS.get(reg, "❔")
-            price_line_parts = [f"  {flag} <b>{reg}:</b>"]
-            url = offer.get("url", "")
-            price = offer.get("regular")
-            currency = offer.get("currency")
-            discount = offer.get("discount")
-            discount_end = offer.get("discount_end")
-            platform = offer.get("platform", "Switch")
-            title = offer.get("title", "")
-            # Форматируем цену
-            price_fmt = await fmt_price(float(price.replace(',', '.')), currency) if price else "-"
-            # Информация о платформе
-            platform_info = f" ({platform})" if platform else ""
-            if discount:
-                discount_fmt = await fmt_price(float(discount.replace(',', '.')), currency)
-                price_line_parts.append(f'<a href="{url}"><s>{price_fmt}</s> {discount_fmt}{platform_info}</a>')
-            else:
-                price_line_parts.append(f'<a href="{url}">{price_fmt}{platform_info}</a>')
-            lines.append(" ".join(price_line_parts))
+        for reg, offer in sorted(offers_by_region.items(), key=lambda item: item[1].sort_price):
+            lines.append(_offer_line(reg, offer))
         return "\n".join(lines)
 
-    # --- Сортировка магазинов по средней цене ---
-    store_avg_prices = {}
-    for store_name, offers_by_region in store_region.items():
-        region_prices = [await get_sort_price(store_name, o) for o in offers_by_region.values() if o]
-        valid_prices = [p for p in region_prices if p != float('inf')]
-        store_avg_prices[store_name] = sum(valid_prices) / len(valid_prices) if valid_prices else float('inf')
-    
-    # --- Финальное сообщение ---
-    price_details = []
-    sorted_stores = sorted(store_region.items(), key=lambda item: store_avg_prices.get(item[0], float('inf')))
+    async def _build_message(pending_stores: set[str]) -> str:
+        """Собирает текст из уже полученных цен; pending_stores – кто ещё не ответил."""
+        view: dict[str, dict] = {store: dict(offers) for store, offers in store_region.items()}
+
+        # Для PS Store копируем данные из US в RU/KZ, если требуется
+        if remap_ru_kz and "US" in view.get("ps", {}):
+            us_offers = view["ps"].get("US")
+            us_id = ps_regional_ids.get("US")
+            if us_offers:
+                if "RU" in regions_sel:
+                    view["ps"]["RU"] = us_offers
+                    if us_id: ps_regional_ids["RU"] = us_id
+                if "KZ" in regions_sel:
+                    view["ps"]["KZ"] = us_offers
+                    if us_id: ps_regional_ids["KZ"] = us_id
+
+        # Дополняем магазины, чтобы отображались только релевантные
+        for _sn in [*game_ids.keys(), *timed_out_stores]:
+            view.setdefault(_sn, {})
+
+        # --- Сортировка магазинов по средней цене ---
+        store_avg_prices = {}
+        for store_name, offers_by_region in view.items():
+            region_prices = [o.sort_price for o in offers_by_region.values()]
+            valid_prices = [p for p in region_prices if p != float('inf')]
+            store_avg_prices[store_name] = sum(valid_prices) / len(valid_prices) if valid_prices else float('inf')
+
+        price_details = []
+        sorted_stores = sorted(view.items(), key=lambda item: store_avg_prices.get(item[0], float('inf')))
+
+        for store, offers_by_reg in sorted_stores:
+            store_title = f"<b>{STORE_DISPLAY.get(store, store.title())}:</b>"
+            if store in pending_stores and not offers_by_reg:
+                price_details.append(f"{store_title}\n  <i>⏳ загружается…</i>")
+                continue
+            if not offers_by_reg and (
+                store in unavailable_stores or store_guard.is_open(GUARD_FAMILY.get(store, store))
+            ):
+                price_details.append(f"{store_title}\n  <i>🚫 временно недоступен, попробуйте позже</i>")
+                continue
+            if store in timed_out_stores and not offers_by_reg:
+                price_details.append(f"{store_title}\n  <i>⏱ не ответил вовремя</i>")
+                continue
+            block = _render_store_prices(store, offers_by_reg)
+            if store in timed_out_stores:
+                block += "\n  <i>⏱ часть регионов не ответила вовремя</i>"
+            price_details.append(block)
+
+        # --- Возраст данных: Steam и PS могут отдавать цену из кэша, пока она обновляется в фоне ---
+        ages = []
+        if "steam" in game_ids:
+            ages += [steam_store.price_age(game_ids["steam"], reg) for reg in view.get("steam", {})]
+        ages += [ps_store.price_age(pid, reg) for reg, pid in ps_regional_ids.items()]
+        oldest = max((a for a in ages if a is not None), default=0)
+        if oldest >= 60:
+            price_details.append(_format_data_age(oldest))
+        if prices_func.rates.stale:
+            price_details.append("<i>⚠️ Курсы валют приблизительные (нет свежих данных)</i>")
+
+        header = f"✅ <b>{selected_title}</b>" if not pending_stores else f"⏳ <b>{selected_title}</b>"
+        msg_text = header + "\n\n" + "\n\n".join(price_details)
+        return re.sub(r'\n{3,}', '\n\n', msg_text).strip()
+
+    async def _safe_edit(text: str, **kwargs) -> None:
+        try:
+            await editable_message.edit_text(
+                text, parse_mode="HTML", disable_web_page_preview=True, **kwargs
+            )
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e).lower():
+                logger.warning(f"Ошибка обновления экрана цен: {e}")
+
+    async def _tagged(idx: int, coro):
+        # Мягкий дедлайн магазина; TimeoutError возвращается как результат
+        try:
+            return idx, await asyncio.wait_for(coro, STORE_DEADLINES.get(task_meta[idx][0]))
+        except Exception as e:
+            return idx, e
+
+    loop = asyncio.get_running_loop()
+    tasks = [asyncio.create_task(_tagged(i, coro)) for i, coro in enumerate(offer_tasks)]
+    pending_idx = set(range(len(tasks)))
+    pending = set(tasks)
+    deadline = loop.time() + PRICE_DEADLINE
+    last_edit = float("-inf")   # первый результат – без ожидания
+    dirty = False               # есть результаты, ещё не показанные пользователю
+
+    while pending and loop.time() < deadline:
+        timeout = deadline - loop.time()
+        if dirty:
+            # Проснуться к концу интервала, даже если новых ответов не будет
+            timeout = min(timeout, max(0.0, last_edit + PROGRESS_EDIT_INTERVAL - loop.time()))
+        done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            idx, result = task.result()
+            pending_idx.discard(idx)
+            store, reg = task_meta[idx]
+            await _collect(store, reg, result)
+            dirty = True
+        dirty = dirty and any(store_region.values())   # пустые ответы показывать нечего
+
+        # Промежуточная перерисовка (debounce, чтобы не упереться в лимиты edit_text)
+        if dirty and pending_idx and loop.time() - last_edit >= PROGRESS_EDIT_INTERVAL:
+            pending_stores = {_result_store_key(task_meta[i][0]) for i in pending_idx}
+            await _safe_edit(await _build_message(pending_stores))
+            last_edit = loop.time()
+            dirty = False
+
+    if pending:
+        # Общий дедлайн: отменяем оставшиеся задачи, рисуем частичный результат
+        logger.warning(f"Дедлайн {PRICE_DEADLINE} сек. для '{selected_title}', не ответили: "
+                       f"{[task_meta[i] for i in pending_idx]}")
+        for i in pending_idx:
+            tasks[i].cancel()
+            timed_out_stores.add(_result_store_key(task_meta[i][0]))
+        # Дожидаемся отмены: задачи успевают закрыть соединения, а их исключения
+        # не всплывают как "Task exception was never retrieved"
+        await asyncio.gather(*pending, return_exceptions=True)
 
-    for store, offers_by_reg in sorted_stores:
-        price_details.append(await _render_store_prices(store, offers_by_reg))
+    if not any(store_region.values()):
+        not_found = f"Не удалось найти актуальные цены для <b>{selected_title}</b>."
+        if timed_out_stores:
+            not_found += "\n<i>⏱ Часть магазинов не ответила вовремя, попробуйте позже.</i>"
+        if unavailable_stores:
+            names = ", ".join(STORE_DISPLAY.get(s, s) for s in sorted(unavailable_stores))
+            not_found += f"\n<i>🚫 Временно недоступны: {names}.</i>"
+        await editable_message.edit_text(
+            not_found,
+            parse_mode="HTML",
+            reply_markup=offers_keyboard(game_index),
+        )
+        return
 
-    logger.info(f"[DEBUG] Итоговый store_region: {store_region}")
-    logger.info(f"[DEBUG] Итоговый price_details: {price_details}")
+    logger.info(f"[DEBUG] Итоговый store_region: {dict(store_region)}")
 
-    msg_text = f"✅ <b>{selected_title}</b>\n\n" + "\n\n".join(price_details)
-    msg_text = re.sub(r'\n{3,}', '\n\n', msg_text).strip()
-    
-    await editable_message.edit_text(
-        msg_text, parse_mode="HTML", disable_web_page_preview=True, reply_markup=offers_keyboard(game_index),
-    )
+    await _safe_edit(await _build_message(set()), reply_markup=offers_keyboard(game_index))
     await state.set_state(PriceStates.showing_prices)
     return
 
@@ -533,6 +595,10 @@ async def process_search_name(message: types.Message, state: FSMContext):
         tasks.append(gog_store.search_games(message.text, primary_region_for_search))
         store_names.append("gog")
 
+        if browser_pool.pool.available():
+            tasks.append(asyncio.wait_for(origin_store.search_games(message.text), ORIGIN_SEARCH_TIMEOUT))
+            store_names.append("origin")
+
     # Xbox Store поддерживает PC и консоли
     if pc_selected or xbox_selected:
         tasks.append(ms_store.search_games(message.text, region=primary_region_for_search))
@@ -566,8 +632,7 @@ async def process_search_name(message: types.Message, state: FSMContext):
             display_name = STORE_DISPLAY.get(store_name, store_name.capitalize())
             logger.info(f"Найдено {len(result) if result is not None else 'None'} игр в {display_name} по запросу '{message.text}'.")
             if store_name == "nintendo":
-                print(f"Nintendo result: {result}")
-                logger.info(f"Nintendo result: {result}")
+                logger.debug(f"Nintendo result: {result}")
                 if not result:
                     logger.warning(f"Nintendo search_games вернул пустой результат для '{message.text}'!")
                 for game in result or []:
@@ -577,6 +642,9 @@ async def process_search_name(message: types.Message, state: FSMContext):
                     if len(item) == 4: # PS Store
                         game_id, title, concept_id, invariant_name = item
                         all_games.append((store_name, game_id, title, concept_id, invariant_name))
+                    elif len(item) == 3: # EA App: (game_id, title, url)
+                        game_id, title, _ = item
+                        all_games.append((store_name, game_id, title, None, None))
                     else: # Другие магазины
                         game_id, title = item
                         all_games.append((store_name, game_id, title, None, None))
@@ -743,7 +811,7 @@ def group_games_by_title(games: List[Tuple[str, str, str, str | None, str | None
         if store.startswith("nintendo"):
             key = (base_tokens, marker_tokens, game_id)
         else:
-        key = (base_tokens, marker_tokens)
+            key = (base_tokens, marker_tokens)
         if key not in groups:
             groups[key] = {"title": title, "ids": {store: game_id}}
             if store == "ps":
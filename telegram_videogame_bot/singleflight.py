@@ -0,0 +1,45 @@
+"""Склейка одинаковых одновременных запросов к магазинам (single-flight).
+
+Ключ – кортеж (store, operation, id, region). Если запрос с таким ключом уже
+выполняется, новые вызывающие не делают свой HTTP-запрос, а ждут результат
+первого. Кэш (TTLCache) заполняется только после ответа, поэтому без этого
+слоя всплеск пользователей на популярной игре превращается в пачку
+одинаковых запросов и 429 от магазина.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from loguru import logger
+
+_INFLIGHT: Dict[Hashable, asyncio.Future] = {}
+
+
+async def run(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """Выполняет factory() один раз на ключ; остальные вызывающие ждут тот же результат.
+
+    Отмена одного из ожидающих не отменяет общий запрос – он нужен остальным.
+    """
+    fut = _INFLIGHT.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(factory())
+        _INFLIGHT[key] = fut
+        fut.add_done_callback(lambda f: _done(key, f))
+    else:
+        logger.debug(f"[singleflight] join {key}")
+    return await asyncio.shield(fut)
+
+
+def _done(key: Hashable, fut: asyncio.Future) -> None:
+    if _INFLIGHT.get(key) is fut:
+        del _INFLIGHT[key]
+    # Забираем исключение, даже если все ожидающие уже отменены
+    if not fut.cancelled():
+        fut.exception()
+
+
+def inflight() -> int:
+    """Количество выполняющихся сейчас уникальных запросов."""
+    return len(_INFLIGHT)
@@ -0,0 +1,315 @@
+"""Локальный индекс названий приложений Steam.
+
+Раньше store_func.search_games и stores.get_steam_games_on_sale на каждый
+поиск скачивали весь ISteamApps/GetAppList (сотни тысяч приложений) и
+искали подстроку линейным проходом. Здесь:
+
+• список приложений лежит на диске (INDEX_PATH, gzip JSON с двумя
+  параллельными массивами appid/name) и читается при старте;
+• фоновая задача догружает только изменения через IStoreService/GetAppList
+  (if_modified_since + постраничный last_appid). Удалённые из магазина
+  приложения в изменения не попадают, поэтому раз в _FULL_REBUILD_INTERVAL
+  (и если файла ещё нет) список качается целиком и заменяет индекс;
+• search() – подстрока по триграммному индексу (для запросов короче 3
+  символов – префикс по отсортированным названиям), fuzzy() – кандидаты
+  с наибольшим числом общих триграмм, переранжированные fuzzywuzzy;
+• на пути запроса пользователя сеть не используется: пока индекс не
+  загружен, search() возвращает пустой список, а lookup() (его зовут
+  обработчики) ищет через storesearch API, как до появления индекса –
+  иначе после каждого холодного старта пользователь видел бы «ничего не найдено».
+
+start() / stop() вызываются из main.py.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import gzip
+import heapq
+import json
+import os
+import pathlib
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List
+
+import aiohttp
+from fuzzywuzzy import fuzz
+from loguru import logger
+
+from config import STEAM_API_KEY
+from telegram_videogame_bot import http_client, steam_store
+
+_base_dir = pathlib.Path(__file__).resolve().parent.parent
+_default_db = _base_dir / "seed" / "personalAk_database.db"
+INDEX_PATH = os.getenv(
+    "STEAM_INDEX_PATH",
+    str(pathlib.Path(os.getenv("DB_PATH", str(_default_db))).parent / "steam_apps.json.gz"),
+)
+
+_APP_LIST_URL = "https://api.steampowered.com/IStoreService/GetAppList/v1/"
+_PAGE_SIZE = 50000                  # максимум, который отдаёт IStoreService за запрос
+_REFRESH_INTERVAL = 6 * 60 * 60     # сек. между фоновыми догрузками
+_RETRY_INTERVAL = 15 * 60           # сек. до повтора, если API не ответил
+_FULL_REBUILD_INTERVAL = 7 * 24 * 60 * 60   # сек. между полными перезагрузками списка
+_FUZZY_CANDIDATES = 200             # сколько кандидатов по триграммам переранжировать
+_FUZZY_MIN_SCORE = 60
+
+
+def _norm(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass(slots=True)
+class _Snapshot:
+    """Неизменяемый снимок индекса; при обновлении подменяется целиком."""
+    appids: array                   # appid по позиции
+    names: List[str]                # исходные названия по позиции
+    lower: List[str]                # нормализованные названия по позиции
+    grams: Dict[str, array]         # триграмма → позиции (по возрастанию)
+    prefix_keys: List[str]          # отсортированные нормализованные названия
+    prefix_pos: array               # позиции для prefix_keys
+
+
+def _build(apps: Dict[int, str]) -> _Snapshot:
+    """Строит снимок (CPU-тяжело – выполняется в потоке)."""
+    items = sorted((appid, name) for appid, name in apps.items() if name)
+    appids = array("I", (appid for appid, _ in items))
+    names = [name for _, name in items]
+    lower = [_norm(name) for name in names]
+
+    postings: Dict[str, list] = {}
+    for pos, text in enumerate(lower):
+        for gram in _trigrams(text):
+            postings.setdefault(gram, []).append(pos)
+    grams = {gram: array("I", pos_list) for gram, pos_list in postings.items()}
+
+    order = sorted(range(len(lower)), key=lower.__getitem__)
+    return _Snapshot(
+        appids=appids,
+        names=names,
+        lower=lower,
+        grams=grams,
+        prefix_keys=[lower[i] for i in order],
+        prefix_pos=array("I", order),
+    )
+
+
+def _load_file(path: str) -> tuple[Dict[int, str], float, float] | None:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"[steam-index] Не удалось прочитать {path}: {e}")
+        return None
+    return (
+        dict(zip(data["appids"], data["names"])),
+        float(data.get("updated_at") or 0),
+        float(data.get("full_at") or 0),     # в старых файлах поля нет – полная перезагрузка
+    )
+
+
+def _save_file(path: str, snap: _Snapshot, updated_at: float, full_at: float) -> None:
+    tmp = f"{path}.tmp"
+    pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(
+            {
+                "updated_at": updated_at, "full_at": full_at,
+                "appids": snap.appids.tolist(), "names": snap.names,
+            },
+            f, ensure_ascii=False, separators=(",", ":"),
+        )
+    os.replace(tmp, path)
+
+
+class SteamAppIndex:
+    """Индекс appid ↔ название с фоновой инкрементальной догрузкой."""
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self.updated_at: float | None = None    # время, до которого учтены изменения Steam
+        self.full_at: float = 0.0               # время последней полной загрузки списка
+        self._snap: _Snapshot | None = None
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._snap is not None
+
+    def __len__(self) -> int:
+        return len(self._snap.names) if self._snap else 0
+
+    # --- Поиск (без сети) ---
+
+    def _app(self, snap: _Snapshot, pos: int) -> dict:
+        return {"appid": snap.appids[pos], "name": snap.names[pos]}
+
+    def search(self, query: str) -> List[dict]:
+        """Все приложения, в названии которых есть query: [{"appid", "name"}].
+
+        Сначала точные совпадения, потом начинающиеся с query, потом остальные
+        (внутри групп – по appid).
+        """
+        snap = self._snap
+        q = _norm(query)
+        if snap is None or not q:
+            return []
+
+        if len(q) < 3:
+            start = bisect.bisect_left(snap.prefix_keys, q)
+            end = bisect.bisect_left(snap.prefix_keys, q + "\uffff", start)
+            positions = sorted(snap.prefix_pos[start:end])
+        else:
+            lists = sorted((snap.grams.get(g) for g in _trigrams(q)), key=lambda p: len(p) if p else 0)
+            if not lists[0]:
+                return []
+            candidates = set(lists[0])
+            for other in lists[1:]:
+                candidates.intersection_update(other)
+                if not candidates:
+                    return []
+            positions = sorted(pos for pos in candidates if q in snap.lower[pos])
+
+        rank = lambda pos: 0 if snap.lower[pos] == q else 1 if snap.lower[pos].startswith(q) else 2
+        return [self._app(snap, pos) for pos in sorted(positions, key=rank)]
+
+    def fuzzy(self, query: str, limit: int = 10) -> List[dict]:
+        """Похожие названия (опечатки, другой порядок слов): [{"appid", "name"}]."""
+        snap = self._snap
+        q = _norm(query)
+        if snap is None or len(q) < 3:
+            return []
+
+        overlap: Counter = Counter()
+        for gram in _trigrams(q):
+            overlap.update(snap.grams.get(gram, ()))
+        candidates = heapq.nlargest(_FUZZY_CANDIDATES, overlap, key=overlap.__getitem__)
+        scored = [(fuzz.token_sort_ratio(q, snap.lower[pos]), pos) for pos in candidates]
+        best = heapq.nlargest(limit, (item for item in scored if item[0] >= _FUZZY_MIN_SCORE))
+        return [self._app(snap, pos) for _, pos in best]
+
+    # --- Загрузка ---
+
+    async def _fetch_changes(self, since: float | None) -> Dict[int, str] | None:
+        """Приложения, изменённые после since (все – если since пуст); None при ошибке."""
+        session = http_client.get_session("steam")
+        params = {
+            "key": STEAM_API_KEY,
+            "include_games": "true",
+            "include_dlc": "true",
+            "include_software": "true",
+            "max_results": str(_PAGE_SIZE),
+        }
+        if since:
+            params["if_modified_since"] = str(int(since))
+
+        changes: Dict[int, str] = {}
+        while True:
+            try:
+                async with session.get(
+                    _APP_LIST_URL, params=params, timeout=aiohttp.ClientTimeout(total=60)
+                ) as resp:
+                    if resp.status != 200:
+                        logger.warning(f"[steam-index] GetAppList HTTP {resp.status}")
+                        return None
+                    data = await resp.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"[steam-index] Ошибка загрузки списка приложений: {e}")
+                return None
+
+            body = data.get("response") or {}
+            for app in body.get("apps", []):
+                changes[app["appid"]] = app.get("name", "")
+            if not body.get("have_more_results") or not body.get("last_appid"):
+                return changes
+            params["last_appid"] = str(body["last_appid"])
+
+    async def refresh(self) -> bool:
+        """Догружает изменения из Steam (раз в неделю – весь список) и сохраняет индекс на диск."""
+        async with self._lock:
+            started = time.time()
+            full = self._snap is None or started - self.full_at >= _FULL_REBUILD_INTERVAL
+            changes = await self._fetch_changes(None if full else self.updated_at)
+            if changes is None:
+                return False
+
+            loop = asyncio.get_running_loop()
+            if full:
+                # Полный список заменяет индекс: снятые с продажи приложения уходят из поиска
+                removed = len(self) - len(set(self._snap.appids) & changes.keys()) if self._snap else 0
+                self._snap = await loop.run_in_executor(None, _build, changes)
+                self.full_at = started
+                logger.info(f"[steam-index] полная перезагрузка, удалено приложений: {removed}")
+            elif changes:
+                apps = dict(zip(self._snap.appids, self._snap.names))
+                apps.update(changes)
+                self._snap = await loop.run_in_executor(None, _build, apps)
+            self.updated_at = started
+            try:
+                await loop.run_in_executor(None, _save_file, self.path, self._snap, started, self.full_at)
+            except OSError as e:
+                logger.warning(f"[steam-index] Не удалось сохранить {self.path}: {e}")
+            logger.info(f"[steam-index] изменений: {len(changes)}, всего приложений: {len(self)}")
+            return True
+
+    async def load(self) -> bool:
+        """Читает индекс с диска (без сети)."""
+        loop = asyncio.get_running_loop()
+        loaded = await loop.run_in_executor(None, _load_file, self.path)
+        if not loaded:
+            return False
+        apps, updated_at, full_at = loaded
+        self._snap = await loop.run_in_executor(None, _build, apps)
+        self.updated_at = updated_at
+        self.full_at = full_at
+        logger.info(f"[steam-index] загружено с диска: {len(self)} приложений")
+        return True
+
+    async def _run(self) -> None:
+        if await self.load():
+            # Свежий файл (например, после быстрого рестарта) не догружаем сразу
+            await asyncio.sleep(max(0.0, self.updated_at + _REFRESH_INTERVAL - time.time()))
+        while True:
+            ok = await self.refresh()
+            await asyncio.sleep(_REFRESH_INTERVAL if ok else _RETRY_INTERVAL)
+
+    def start(self) -> None:
+        """Загружает индекс с диска и запускает фоновую догрузку."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+index = SteamAppIndex()
+
+
+async def lookup(query: str, *, fuzzy: bool = True) -> List[dict]:
+    """Поиск для обработчиков: [{"appid", "name"}].
+
+    Индекс готов – подстрока, а если её нет и fuzzy – похожие названия.
+    Индекс ещё строится – storesearch API (steam_store.search_games).
+    """
+    if index.ready:
+        return index.search(query) or (index.fuzzy(query) if fuzzy else [])
+    logger.warning("[steam-index] индекс ещё не загружен, ищу через storesearch")
+    found = await steam_store.search_games(query, limit=50)
+    return [{"appid": int(game_id.split(":", 1)[1]), "name": name} for game_id, name in found]
@@ -1,13 +1,23 @@
-import aiohttp
-from typing import List, Tuple
+import asyncio
+from typing import Dict, Iterable, List, Tuple
+
 from loguru import logger
 from cachetools import TTLCache
 
-_SEARCH_CACHE: TTLCache[str, List[Tuple[str, str]]] = TTLCache(maxsize=1024, ttl=12 * 60 * 60)  # 12h
-_PRICE_CACHE: TTLCache[str, Tuple[float, str, str]] = TTLCache(maxsize=4096, ttl=30 * 60)  # 30m
+from telegram_videogame_bot import http_client, singleflight, store_cache
+from telegram_videogame_bot.offers import Offer
+
+_SEARCH_CACHE = store_cache.TieredCache("steam:search", TTLCache(maxsize=1024, ttl=12 * 60 * 60))  # 12h
+# Цены: после 30 мин отдаём из кэша и обновляем в фоне, после 6 ч – ждём запрос
+_PRICE_CACHE = store_cache.TieredCache(
+    "steam:price", TTLCache(maxsize=4096, ttl=6 * 60 * 60), soft_ttl=30 * 60
+)
+# Бесплатна ли игра (appid -> bool): price_overview этого не сообщает
+_FREE_CACHE = store_cache.TieredCache("steam:is_free", TTLCache(maxsize=2048, ttl=7 * 24 * 60 * 60))  # 7d
 
 STEAM_SEARCH_URL = "https://store.steampowered.com/api/storesearch"
 STEAM_APPDETAILS_URL = "https://store.steampowered.com/api/appdetails"
+PRICE_APPIDS_PER_CALL = 50   # appid в одном запросе appdetails (filters=price_overview)
 
 HEADERS = {
     "Accept": "application/json",
@@ -19,22 +29,23 @@ HEADERS = {
 async def search_games(query: str, limit: int = 20) -> List[Tuple[str, str]]:
     """Поиск игр в Steam. Возвращает [("steam:{appid}", name)]"""
 
-    if query in _SEARCH_CACHE:
-        return _SEARCH_CACHE[query][:limit]
+    cached = await _SEARCH_CACHE.get(query)
+    if cached is not None:
+        return cached[:limit]
 
     params = {
         "term": query,
         "cc": "ru",
         "l": "russian",
     }
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        try:
-            async with session.get(STEAM_SEARCH_URL, params=params, timeout=10) as resp:
-                if resp.status != 200:
-                    return []
-                data = await resp.json()
-        except Exception:
-            return []
+    session = http_client.get_session("steam")
+    try:
+        async with session.get(STEAM_SEARCH_URL, params=params, headers=HEADERS) as resp:
+            if resp.status != 200:
+                return []
+            data = await resp.json()
+    except Exception:
+        return []
 
     results: List[Tuple[str, str]] = []
     for item in data.get("items", [])[:limit]:
@@ -44,77 +55,193 @@ async def search_games(query: str, limit: int = 20) -> List[Tuple[str, str]]:
             results.append((f"steam:{appid}", name))
 
     if results:
-        _SEARCH_CACHE[query] = results
+        await _SEARCH_CACHE.set(query, results)
     return results
 
 
-async def get_offers(game_id: str, region: str = "RU") -> List[Tuple[str, float, str, str]]:
-    """Получить цену для игры из Steam. Возвращает [(store, price, currency, url)]."""
+async def get_offers(game_id: str, region: str = "RU") -> List[Offer]:
+    """Получить цену для игры из Steam. Возвращает [Offer]."""
+    offer = (await get_offers_multi(game_id, [region])).get(region.upper())
+    return [offer] if offer else []
+
+
+async def get_offers_multi(game_id: str, regions: List[str]) -> Dict[str, Offer]:
+    """Цены игры по нескольким регионам: {region: Offer}.
+
+    Регионы без цены (нет в продаже, не вышла) получают цену US, как и раньше.
+    """
     if not game_id.startswith("steam:"):
-        return []
+        return {}
 
     appid = game_id.split(":")[1]
-    url = f"https://store.steampowered.com/app/{appid}"
-    
-    # --- Check Cache ---
-    cache_key = f"{game_id}:{region}"
-    if cache_key in _PRICE_CACHE:
-        store, price, cur = _PRICE_CACHE[cache_key]
-        if cur == "FREE":
-             return [(store, price, cur, url)]
-        return [(store, price, cur, url)]
-
+    regions = [r.upper() for r in regions]
+    bulk = await get_prices_bulk([appid], regions)
+    offers = {reg: _make_offer(appid, reg, bulk[reg][appid]) for reg in regions if appid in bulk[reg]}
+
+    missing = [reg for reg in regions if reg not in offers]
+    if missing:
+        us = bulk.get("US", {}).get(appid) or (await get_prices_bulk([appid], ["US"]))["US"].get(appid)
+        if us is None:
+            return offers
+        logger.warning(f"No price_overview for {appid} in {missing}. Fallback to US.")
+        for reg in missing:
+            offers[reg] = _make_offer(appid, "US", us)
+    return offers
+
+
+async def get_prices_bulk(appids: Iterable, regions: Iterable[str]) -> Dict[str, Dict[str, tuple]]:
+    """Цены многих appid во многих регионах: {region: {appid: (label, price, currency, old_price)}}.
+
+    appdetails с filters=price_overview принимает список appid через запятую,
+    поэтому промахи кэша запрашиваются пачками по PRICE_APPIDS_PER_CALL, регионы –
+    параллельно. Записи старше soft_ttl отдаются сразу и обновляются в фоне.
+    """
+    appids = list(dict.fromkeys(str(a) for a in appids if a))
+    result: Dict[str, Dict[str, tuple]] = {}
+    jobs = []
+    for region in dict.fromkeys(r.upper() for r in regions):
+        keys = {_price_key(appid, region): appid for appid in appids}
+        # Один запрос к L2 на регион; устаревшие цены обновляются пачками, а не по одной
+        cached = await _PRICE_CACHE.get_many(
+            keys, refresh=lambda stale, r=region, k=keys: _refresh_prices([k[key] for key in stale], r)
+        )
+        result[region] = {keys[key]: tup for key, tup in cached.items()}
+        missing = [appid for appid in appids if appid not in result[region]]
+        for i in range(0, len(missing), PRICE_APPIDS_PER_CALL):
+            jobs.append((region, tuple(missing[i:i + PRICE_APPIDS_PER_CALL])))
+
+    fetched = await asyncio.gather(*(_fetch_chunk(chunk, region) for region, chunk in jobs))
+    for (region, _), prices in zip(jobs, fetched):
+        result[region].update(prices)
+    if jobs:
+        logger.debug(f"Steam get_prices_bulk: {len(appids)} appid × {len(result)} регионов, запросов: {len(jobs)}")
+    return result
+
+
+def price_age(game_id: str, region: str) -> float | None:
+    """Возраст закэшированной цены в секундах (None – цены в кэше нет)."""
+    return _PRICE_CACHE.age(_price_key(game_id.split(":")[-1], region))
+
+
+def _price_key(appid: str, region: str) -> str:
+    return f"steam:{appid}:{region.upper()}"
+
+
+def _make_offer(appid: str, region: str, cached) -> Offer:
+    """Offer из записи кэша (label, price, currency[, old_price])."""
+    label, price, cur = cached[0], cached[1], cached[2]
+    old_price = cached[3] if len(cached) > 3 else None
+    return Offer(
+        store="steam",
+        region=region.upper(),
+        label=label,
+        price=price,
+        currency=cur,
+        url=f"https://store.steampowered.com/app/{appid}",
+        old_price=old_price,
+    )
+
+
+async def _refresh_prices(appids: List[str], region: str) -> None:
+    """Фоновое обновление устаревших цен региона пачками по PRICE_APPIDS_PER_CALL."""
+    await asyncio.gather(*(
+        _fetch_chunk(tuple(appids[i:i + PRICE_APPIDS_PER_CALL]), region)
+        for i in range(0, len(appids), PRICE_APPIDS_PER_CALL)
+    ))
+
+
+async def _fetch_chunk(appids: Tuple[str, ...], region: str) -> Dict[str, tuple]:
+    """Одна пачка appid в одном регионе; одинаковые одновременные пачки склеиваются,
+    медленный ответ страхуется повтором (http_client.hedged)."""
+    prices = await singleflight.run(
+        ("steam", "prices", appids, region),
+        lambda: http_client.hedged("steam", lambda: _fetch_prices(list(appids), region)),
+    )
+    if prices:
+        await _PRICE_CACHE.set_many((_price_key(appid, region), tup) for appid, tup in prices.items())
+    return prices
+
+
+async def _fetch_prices(appids: List[str], region: str) -> Dict[str, tuple]:
+    """Запрос цен пачки appid в Steam API без проверки кэша."""
     # --- API Request ---
     lang = "russian" if region.upper() == "RU" else "english"
     params = {
-        "appids": appid,
+        "appids": ",".join(appids),
         "cc": region.upper(),
         "l": lang,
         "filters": "price_overview"
     }
-    
-    label = "Steam" if region.upper() == "RU" else f"Steam {region.upper()}"
 
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        try:
-            async with session.get(STEAM_APPDETAILS_URL, params=params, timeout=10) as resp:
-                if resp.status != 200:
-                    logger.warning(f"Steam appdetails HTTP {resp.status} for {appid} region={region}")
-                    return []
-                data = await resp.json()
-        except Exception as e:
-            logger.error(f"Steam appdetails request error for {appid}: {e}")
-            return []
+    label = "Steam" if region.upper() == "RU" else f"Steam {region.upper()}"
 
-    details = data.get(appid, {}).get("data")
+    session = http_client.get_session("steam")
+    try:
+        async with session.get(STEAM_APPDETAILS_URL, params=params, headers=HEADERS) as resp:
+            if resp.status != 200:
+                logger.warning(f"Steam appdetails HTTP {resp.status} for {len(appids)} appids region={region}")
+                return {}
+            data = await resp.json()
+    except Exception as e:
+        logger.error(f"Steam appdetails request error for {appids[:3]}...: {e}")
+        return {}
 
     # --- Process Response ---
-    if not details:
-        if region.upper() != "US":
-            logger.warning(f"No details data for {appid} in {region}. Trying fallback to US.")
-            return await get_offers(game_id, "US")
-        return []
-
-    # Handle free games
-    if details.get("is_free", False):
-        offer = (label, 0.0, "FREE")
-        _PRICE_CACHE[cache_key] = offer
-        return [(offer[0], offer[1], offer[2], url)]
-
-    # Handle paid games
-    price_info = details.get("price_overview")
-    if not price_info:
-        if region.upper() != "US":
-            logger.warning(f"No price_overview for {appid} in {region}. Trying fallback to US.")
-            return await get_offers(game_id, "US")
+    prices: Dict[str, tuple] = {}
+    no_price = []
+    for appid in appids:
+        entry = data.get(appid) or {}
+        details = entry.get("data")
+        if not isinstance(details, dict):
+            # Для бесплатных и не продающихся игр Steam отдаёт "data": [] – различаем отдельно
+            if entry.get("success"):
+                no_price.append(appid)
+            continue
+
+        price_info = details.get("price_overview")
+        if not price_info or price_info.get("final") is None:
+            continue
+
+        final_int = price_info["final"]
+        currency = price_info.get("currency", "USD")
+        price = round(final_int / 100, 2)
+        initial_int = price_info.get("initial")
+        old_price = round(initial_int / 100, 2) if initial_int and initial_int > final_int else None
+        prices[appid] = (label, price, currency, old_price)
+
+    for appid in await _free_appids(no_price):
+        prices[appid] = (label, 0.0, "FREE")
+    return prices
+
+
+async def _free_appids(appids: List[str]) -> List[str]:
+    """Какие из appid бесплатны. is_free берётся из appdetails с filters=basic
+    (он принимает только один appid) и кэшируется на неделю."""
+    if not appids:
         return []
-
-    final_int = price_info.get("final")
-    currency = price_info.get("currency", "USD")
-    if final_int is None:
-        return []
-
-    price = round(final_int / 100, 2)
-    offer_tuple = (label, price, currency)
-    _PRICE_CACHE[cache_key] = offer_tuple
-    return [(offer_tuple[0], offer_tuple[1], offer_tuple[2], url)] 
\ No newline at end of file
+    cached = await _FREE_CACHE.get_many(appids)
+    missing = [appid for appid in appids if appid not in cached]
+    fetched = await asyncio.gather(*(
+        singleflight.run(("steam", "is_free", appid), lambda a=appid: _fetch_is_free(a)) for appid in missing
+    ))
+    for appid, is_free in zip(missing, fetched):
+        if is_free is not None:
+            cached[appid] = is_free
+            await _FREE_CACHE.set(appid, is_free)
+    return [appid for appid in appids if cached.get(appid)]
+
+
+async def _fetch_is_free(appid: str) -> bool | None:
+    """is_free из appdetails (filters=basic); None – ответ не получен."""
+    params = {"appids": appid, "filters": "basic"}
+    session = http_client.get_session("steam")
+    try:
+        async with session.get(STEAM_APPDETAILS_URL, params=params, headers=HEADERS) as resp:
+            if resp.status != 200:
+                return None
+            data = await resp.json()
+    except Exception as e:
+        logger.warning(f"Steam appdetails (basic) error for {appid}: {e}")
+        return None
+    details = (data.get(appid) or {}).get("data")
+    return bool(details.get("is_free")) if isinstance(details, dict) else False
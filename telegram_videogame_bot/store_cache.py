@@ -0,0 +1,298 @@
+"""Двухуровневый кэш для поиска и цен магазинов.
+
+L1 – привычный in-process cachetools.TTLCache (микросекунды, теряется при
+редеплое). L2 – SQLite-файл рядом с DB_PATH на примонтированном томе
+Railway, поэтому после деплоя кэш «тёплый».
+
+• TieredCache(namespace, l1) – обёртка над TTLCache; TTL записи берётся из l1.ttl.
+• await cache.get(key) / await cache.set(key, value) – единое API для всех магазинов.
+• startup() / shutdown() – открыть/закрыть L2 (вызываются из main.py).
+• soft_ttl + get(key, refresh=...) – stale-while-revalidate: после soft_ttl
+  запись ещё отдаётся сразу, а обновляется фоновой задачей; после ttl
+  (жёсткий TTL) – промах, как обычно.
+• get_many(keys, refresh=...) – то же для пачки ключей: промахи L1 читаются
+  из L2 одним запросом, а устаревшие ключи обновляются одним вызовом
+  refresh(stale_keys), а не задачей на каждый ключ.
+
+Без startup() (например, в debug-скриптах) работает только L1.
+Значения в L2 хранятся в JSON, поэтому кортежи после чтения с диска
+возвращаются списками – код магазинов к этому готов.
+L2 ограничен по размеру: при превышении _MAX_BYTES удаляются самые старые записи.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import pathlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Set, Tuple
+
+import aiosqlite
+from cachetools import TTLCache
+from loguru import logger
+
+_base_dir = pathlib.Path(__file__).resolve().parent.parent
+_default_db = _base_dir / "seed" / "personalAk_database.db"
+CACHE_PATH = os.getenv(
+    "STORE_CACHE_PATH",
+    str(pathlib.Path(os.getenv("DB_PATH", str(_default_db))).parent / "store_cache.db"),
+)
+
+_MAX_BYTES = 64 * 1024 * 1024   # потолок размера значений в L2
+_EVICT_EVERY = 500              # проверять размер раз в N записей
+_L2_BATCH = 500                 # ключей в одном SELECT ... IN (...)
+
+_db: aiosqlite.Connection | None = None
+_writes = 0
+_BACKGROUND: Set[asyncio.Task] = set()  # ссылки на фоновые обновления, чтобы их не собрал GC
+
+
+def _key_str(key: Hashable) -> str:
+    if isinstance(key, tuple):
+        return json.dumps(key, ensure_ascii=False)
+    return str(key)
+
+
+class TieredCache:
+    """L1 (TTLCache) + L2 (SQLite) с одинаковым TTL для записей одного типа."""
+
+    def __init__(self, namespace: str, l1: TTLCache, *, soft_ttl: float | None = None):
+        self.namespace = namespace
+        self.ttl: float = l1.ttl
+        self.soft_ttl = soft_ttl
+        # В L1 лежат пары (value, stored_at), чтобы после подъёма из L2
+        # запись не жила дольше своего TTL.
+        self._l1 = l1
+        self._refreshing: Set[Hashable] = set()
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Только L1, без обращения к диску."""
+        item = self._l1.get(key)
+        if item is None or time.time() - item[1] > self.ttl:
+            return default
+        return item[0]
+
+    def age(self, key: Hashable) -> float | None:
+        """Возраст записи в секундах (по L1) или None, если её нет."""
+        item = self._l1.get(key)
+        return None if item is None else time.time() - item[1]
+
+    async def get(
+        self,
+        key: Hashable,
+        default: Any = None,
+        *,
+        refresh: Callable[[], Awaitable[Any]] | None = None,
+    ) -> Any:
+        """L1 → L2. Если задан refresh и запись старше soft_ttl – отдаём её
+        и запускаем refresh() в фоне (он сам должен положить свежее значение)."""
+        item = self._l1.get(key)
+        if item is None or time.time() - item[1] > self.ttl:
+            self._l1.pop(key, None)
+            row = await _l2_get(self.namespace, key)
+            if row is None or time.time() - row[1] > self.ttl:
+                return default
+            item = row
+            self._l1[key] = item
+
+        value, stored_at = item
+        if refresh is not None and self.soft_ttl is not None and time.time() - stored_at > self.soft_ttl:
+            self._revalidate(key, refresh)
+        return value
+
+    async def get_many(
+        self,
+        keys: Iterable[Hashable],
+        *,
+        refresh: Callable[[List[Hashable]], Awaitable[Any]] | None = None,
+    ) -> Dict[Hashable, Any]:
+        """Пакетный get: {key: value} для найденных ключей, промахи L1 – одним запросом к L2.
+
+        Если задан refresh, ключи старше soft_ttl отдаются и обновляются одним
+        фоновым вызовом refresh(stale_keys) (он сам кладёт свежие значения).
+        """
+        now = time.time()
+        found: Dict[Hashable, Tuple[Any, float]] = {}
+        misses = []
+        for key in keys:
+            item = self._l1.get(key)
+            if item is None or now - item[1] > self.ttl:
+                self._l1.pop(key, None)
+                misses.append(key)
+            else:
+                found[key] = item
+        if misses:
+            for key, row in (await _l2_get_many(self.namespace, misses)).items():
+                if now - row[1] <= self.ttl:
+                    found[key] = self._l1[key] = row
+
+        if refresh is not None and self.soft_ttl is not None:
+            stale = [key for key, (_, stored_at) in found.items() if now - stored_at > self.soft_ttl]
+            if stale:
+                self._revalidate_many(stale, refresh)
+        return {key: value for key, (value, _) in found.items()}
+
+    def _revalidate(self, key: Hashable, refresh: Callable[[], Awaitable[Any]]) -> None:
+        self._revalidate_many([key], lambda _keys: refresh())
+
+    def _revalidate_many(self, keys: List[Hashable], refresh: Callable[[List[Hashable]], Awaitable[Any]]) -> None:
+        # Ключи, которые уже обновляются, второй раз не запрашиваем
+        keys = [key for key in keys if key not in self._refreshing]
+        if not keys:
+            return
+        self._refreshing.update(keys)
+
+        async def _run():
+            try:
+                await refresh(keys)
+            except Exception as e:
+                logger.warning(f"[cache] {self.namespace}: фоновое обновление {keys[:3]!r} не удалось: {e}")
+            finally:
+                self._refreshing.difference_update(keys)
+
+        task = asyncio.create_task(_run())
+        _BACKGROUND.add(task)
+        task.add_done_callback(_BACKGROUND.discard)
+
+    async def set(self, key: Hashable, value: Any) -> None:
+        now = time.time()
+        self._l1[key] = (value, now)
+        await _l2_set_many(self.namespace, [(key, value)], now, self.ttl)
+
+    async def set_many(self, items: Iterable[Tuple[Hashable, Any]]) -> None:
+        now = time.time()
+        items = list(items)
+        for key, value in items:
+            self._l1[key] = (value, now)
+        await _l2_set_many(self.namespace, items, now, self.ttl)
+
+
+# ---------------------------------------------------------------------------
+# L2 (SQLite)
+# ---------------------------------------------------------------------------
+
+
+async def _l2_get(namespace: str, key: Hashable) -> Tuple[Any, float] | None:
+    if _db is None:
+        return None
+    try:
+        async with _db.execute(
+            "SELECT value, stored_at, expires_at FROM entries WHERE ns = ? AND key = ?",
+            (namespace, _key_str(key)),
+        ) as cur:
+            row = await cur.fetchone()
+        if row is None or row[2] < time.time():
+            return None
+        return json.loads(row[0]), row[1]
+    except Exception as e:
+        logger.warning(f"[cache] L2 read error ({namespace}): {e}")
+        return None
+
+
+async def _l2_get_many(namespace: str, keys: List[Hashable]) -> Dict[Hashable, Tuple[Any, float]]:
+    if _db is None or not keys:
+        return {}
+    by_str = {_key_str(key): key for key in keys}
+    rows: Dict[Hashable, Tuple[Any, float]] = {}
+    now = time.time()
+    try:
+        strs = list(by_str)
+        # Не упираемся в лимит параметров SQLite
+        for i in range(0, len(strs), _L2_BATCH):
+            batch = strs[i:i + _L2_BATCH]
+            async with _db.execute(
+                f"SELECT key, value, stored_at, expires_at FROM entries "
+                f"WHERE ns = ? AND key IN ({','.join('?' * len(batch))})",
+                (namespace, *batch),
+            ) as cur:
+                for key, value, stored_at, expires_at in await cur.fetchall():
+                    if expires_at >= now:
+                        rows[by_str[key]] = (json.loads(value), stored_at)
+    except Exception as e:
+        logger.warning(f"[cache] L2 read error ({namespace}): {e}")
+    return rows
+
+
+async def _l2_set_many(namespace: str, items: list, now: float, ttl: float) -> None:
+    global _writes
+    if _db is None or not items:
+        return
+    rows = []
+    for key, value in items:
+        try:
+            rows.append((namespace, _key_str(key), json.dumps(value, ensure_ascii=False), now, now + ttl))
+        except (TypeError, ValueError):
+            logger.debug(f"[cache] {namespace}: значение для {key!r} не сериализуется, только L1")
+    try:
+        await _db.executemany(
+            "INSERT OR REPLACE INTO entries (ns, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        await _db.commit()
+    except Exception as e:
+        logger.warning(f"[cache] L2 write error ({namespace}): {e}")
+        return
+
+    _writes += len(rows)
+    if _writes >= _EVICT_EVERY:
+        _writes = 0
+        await _evict()
+
+
+async def _evict() -> None:
+    """Удаляет просроченные записи и самые старые, если L2 вырос сверх _MAX_BYTES."""
+    try:
+        await _db.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+        async with _db.execute("SELECT COALESCE(SUM(LENGTH(value)), 0), COUNT(*) FROM entries") as cur:
+            total, count = await cur.fetchone()
+        if total > _MAX_BYTES and count:
+            # Удаляем долю самых старых записей пропорционально превышению
+            to_delete = max(1, int(count * (total - _MAX_BYTES) / total) + count // 10)
+            await _db.execute(
+                "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY stored_at LIMIT ?)",
+                (to_delete,),
+            )
+            logger.info(f"[cache] L2 eviction: удалено {to_delete} из {count} записей")
+        await _db.commit()
+    except Exception as e:
+        logger.warning(f"[cache] L2 eviction error: {e}")
+
+
+async def startup() -> None:
+    """Открывает L2. Ошибки не фатальны – кэш продолжит работать только в памяти."""
+    global _db
+    if _db is not None:
+        return
+    try:
+        pathlib.Path(CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        db = await aiosqlite.connect(CACHE_PATH)
+        await db.execute("PRAGMA journal_mode=WAL")
+        await db.execute("PRAGMA synchronous=NORMAL")
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                ns TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (ns, key)
+            )
+            """
+        )
+        await db.execute("CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)")
+        await db.commit()
+        _db = db
+        await _evict()
+        logger.info(f"[cache] L2 открыт: {CACHE_PATH}")
+    except Exception as e:
+        logger.error(f"[cache] Не удалось открыть L2 {CACHE_PATH}: {e}")
+
+
+async def shutdown() -> None:
+    global _db
+    if _db is not None:
+        db, _db = _db, None
+        await db.close()
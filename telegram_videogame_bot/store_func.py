@@ -3,85 +3,157 @@ import asyncio
 import logging
 from config import STEAM_API_KEY
 
+from cachetools import TTLCache
+
+from telegram_videogame_bot import http_client, singleflight, steam_app_index, steam_store, store_cache
+
 logger = logging.getLogger(__name__)
 
+PRICE_REGION = "RU"  # цены в списках – по российскому региону, как и описания (l=russian)
+DETAILS_CONCURRENCY = 5  # одновременных запросов appdetails при обогащении страницы
+DETAILS_TTL = 6 * 60 * 60
+
+# Метаданные игр (описание, рейтинг, дата выхода) меняются редко – храним часами.
+# Цены в списках берутся отдельно (get_page_prices / данные самого списка).
+_DETAILS_CACHE = store_cache.TieredCache("steam:details", TTLCache(maxsize=2048, ttl=DETAILS_TTL))
+_DETAIL_FIELDS = ('name', 'short_description', 'price_overview', 'metacritic', 'release_date', 'is_free', 'url')
+
+
+async def get_page_prices(app_ids):
+    """Цены всей страницы списка одним пакетным запросом: {appid: запись steam_store}."""
+    try:
+        bulk = await steam_store.get_prices_bulk(app_ids, [PRICE_REGION])
+    except Exception as e:
+        logger.error(f"Ошибка пакетного запроса цен Steam: {e}")
+        return {}
+    return bulk.get(PRICE_REGION, {})
+
+
+def format_price(entry, game_data):
+    """Строка цены из пакетной записи; если её нет – price_overview из appdetails."""
+    if entry is None:
+        return game_data.get('price_overview', {}).get('final_formatted', 'N/A')
+    price, currency = entry[1], entry[2]
+    if currency == "FREE" or price == 0.0:
+        return "Бесплатно"
+    if currency == "RUB":
+        return f"{int(round(price))} руб."
+    return f"{price:.2f} {currency}"
+
+
+def _listing_price(item):
+    """Запись цены из элемента featuredcategories (цены там уже есть, в копейках/центах)."""
+    final = item.get('final_price')
+    if final is None:
+        return None
+    original = item.get('original_price')
+    old_price = original / 100 if original and original > final else None
+    return (None, final / 100, item.get('currency', 'USD'), old_price)
+
+
+def _game_info(app_id, game_data, price_entry, name=None):
+    return {
+        'name': name or game_data['name'],
+        'price': format_price(price_entry, game_data),
+        'rating': game_data.get('metacritic', {}).get('score', 'N/A'),
+        'steam_appid': app_id,
+        'release_date': game_data.get('release_date', {}).get('date', 'N/A'),
+        'url': f"https://store.steampowered.com/app/{app_id}"
+    }
+
+
+async def enrich_page(app_ids, prices=None):
+    """Метаданные и цены страницы за один «раунд»: appdetails (из кэша или
+    параллельно) и пакетный запрос цен идут одновременно.
+
+    prices – цены, уже известные из самого списка; тогда запрос цен не нужен.
+    """
+    if prices is not None:
+        return await get_details_many(app_ids), prices
+    return await asyncio.gather(get_details_many(app_ids), get_page_prices(app_ids))
+
 async def get_app_details(app_id, retries=3, timeout=20):
+    """Метаданные игры из appdetails; кэшируются на DETAILS_TTL (поля _DETAIL_FIELDS)."""
+    cached = await _DETAILS_CACHE.get(str(app_id))
+    if cached is not None:
+        return dict(cached)
+    # Одинаковые одновременные запросы (два пользователя листают одну страницу) склеиваются
+    app_data = await singleflight.run(
+        ("steam", "details", str(app_id)),
+        lambda: _fetch_app_details(app_id, retries, timeout),
+    )
+    return dict(app_data) if app_data else None
+
+
+async def get_details_many(app_ids):
+    """appdetails для всей страницы параллельно (не больше DETAILS_CONCURRENCY сразу): {appid: данные}."""
+    sem = asyncio.Semaphore(DETAILS_CONCURRENCY)
+
+    async def one(app_id):
+        async with sem:
+            try:
+                return app_id, await get_app_details(app_id)
+            except Exception as e:
+                logger.error(f"Ошибка при получении данных для игры с app_id={app_id}: {e}")
+                return app_id, None
+
+    return dict(await asyncio.gather(*(one(app_id) for app_id in app_ids)))
+
+
+async def _fetch_app_details(app_id, retries=3, timeout=20):
     url = f"https://store.steampowered.com/api/appdetails?appids={app_id}&l=russian"
     for attempt in range(retries):
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
-            try:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    if data and str(app_id) in data and data[str(app_id)]['success']:
-                        app_data = data[str(app_id)]['data']
-                        app_data['url'] = f"https://store.steampowered.com/app/{app_id}"
+        session = http_client.get_session("steam")
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                response.raise_for_status()
+                data = await response.json()
+                if data and str(app_id) in data and data[str(app_id)]['success']:
+                    app_data = data[str(app_id)]['data']
+                    app_data['url'] = f"https://store.steampowered.com/app/{app_id}"
                         
-                        # Проверка наличия русского описания
-                        description = app_data.get('short_description', '')
-                        if not description:
-                            # Если русского описания нет
-                            fallback_url = f"https://store.steampowered.com/api/appdetails?appids={app_id}&l=english"
-                            async with session.get(fallback_url) as fallback_response:
-                                fallback_response.raise_for_status()
-                                fallback_data = await fallback_response.json()
-                                if fallback_data and str(app_id) in fallback_data and fallback_data[str(app_id)]['success']:
-                                    fallback_app_data = fallback_data[str(app_id)]['data']
-                                    description = fallback_app_data.get('short_description', '')
-                                    description += "\n\n*Русского описания нет*"
-
-                        app_data['short_description'] = description
-                        return app_data
-                    else:
-                        logger.error(f"Не удалось получить данные для app_id={app_id}: {data}")
-                        return None
-            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                logger.error(f"Ошибка при запросе к {url}: {e}")
-                if attempt == retries - 1:
+                    # Проверка наличия русского описания
+                    description = app_data.get('short_description', '')
+                    if not description:
+                        # Если русского описания нет
+                        fallback_url = f"https://store.steampowered.com/api/appdetails?appids={app_id}&l=english"
+                        async with session.get(fallback_url, timeout=aiohttp.ClientTimeout(total=timeout)) as fallback_response:
+                            fallback_response.raise_for_status()
+                            fallback_data = await fallback_response.json()
+                            if fallback_data and str(app_id) in fallback_data and fallback_data[str(app_id)]['success']:
+                                fallback_app_data = fallback_data[str(app_id)]['data']
+                                description = fallback_app_data.get('short_description', '')
+                                description += "\n\n*Русского описания нет*"
+
+                    app_data['short_description'] = description
+                    app_data = {key: app_data[key] for key in _DETAIL_FIELDS if key in app_data}
+                    await _DETAILS_CACHE.set(str(app_id), app_data)
+                    return app_data
+                else:
+                    logger.error(f"Не удалось получить данные для app_id={app_id}: {data}")
                     return None
-                logger.info(f"Повторная попытка {attempt + 1} из {retries}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Ошибка при запросе к {url}: {e}")
+            if attempt == retries - 1:
+                return None
+            logger.info(f"Повторная попытка {attempt + 1} из {retries}")
 
 async def search_games(query, page, page_size=5, retries=3, timeout=20):
-    url = "https://api.steampowered.com/ISteamApps/GetAppList/v2/"
     logger.info(f"Поиск игр по запросу: {query}")
 
-    for attempt in range(retries):
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
-            try:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    logger.info(f"Получено данных: {len(data.get('applist', {}).get('apps', []))} игр")
-            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                logger.error(f"Ошибка при запросе к {url}: {e}")
-                if attempt == retries - 1:
-                    return [], 0
-                logger.info(f"Повторная попытка {attempt + 1} из {retries}")
-                continue
-            break
-
-    games_matching_query = [game for game in data['applist']['apps'] if query.lower() in game['name'].lower()]
+    # Локальный индекс названий (steam_app_index); пока он строится – storesearch API
+    games_matching_query = await steam_app_index.lookup(query)
     logger.info(f"Найдено {len(games_matching_query)} игр по запросу: {query}")
 
     selected_games = games_matching_query[(page - 1) * page_size:page * page_size]
+    details, prices = await enrich_page([game['appid'] for game in selected_games])
 
     games = []
     for game in selected_games:
         app_id = game['appid']
-        try:
-            game_data = await get_app_details(app_id)
-            if game_data:
-                game_info = {
-                    'name': game_data['name'],
-                    'price': game_data.get('price_overview', {}).get('final_formatted', 'N/A'),
-                    'rating': game_data.get('metacritic', {}).get('score', 'N/A'),
-                    'steam_appid': app_id,
-                    'release_date': game_data.get('release_date', {}).get('date', 'N/A'),
-                    'url': f"https://store.steampowered.com/app/{app_id}"
-                }
-                games.append(game_info)
-        except Exception as e:
-            logger.error(f"Ошибка при получении данных для игры с app_id={app_id}: {e}")
+        game_data = details.get(app_id)
+        if game_data:
+            games.append(_game_info(app_id, game_data, prices.get(str(app_id))))
 
     logger.info(f"Возвращено игр: {len(games)}")
     return games, len(games_matching_query)
@@ -89,18 +161,18 @@ async def search_games(query, page, page_size=5, retries=3, timeout=20):
 async def get_popular_games(page, page_size=5, retries=3, timeout=20):
     url = f"https://api.steampowered.com/ISteamChartsService/GetMostPlayedGames/v1/?key={STEAM_API_KEY}&format=json"
     for attempt in range(retries):
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
-            try:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                logger.error(f"Ошибка при запросе к {url}: {e}")
-                if attempt == retries - 1:
-                    return [], 0
-                logger.info(f"Повторная попытка {attempt + 1} из {retries}")
-                continue
-            break
+        session = http_client.get_session("steam")
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                response.raise_for_status()
+                data = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Ошибка при запросе к {url}: {e}")
+            if attempt == retries - 1:
+                return [], 0
+            logger.info(f"Повторная попытка {attempt + 1} из {retries}")
+            continue
+        break
 
     ranks = data['response']['ranks']
     total_games = len(ranks)
@@ -108,21 +180,14 @@ async def get_popular_games(page, page_size=5, retries=3, timeout=20):
     start_index = (page - 1) * page_size
     end_index = min(start_index + page_size, total_games)
     selected_games = ranks[start_index:end_index]
-    games = []
+    details, prices = await enrich_page([game['appid'] for game in selected_games])
 
+    games = []
     for game in selected_games:
         app_id = game['appid']
-        game_data = await get_app_details(app_id)
+        game_data = details.get(app_id)
         if game_data:
-            game_info = {
-                'name': game_data['name'],
-                'price': game_data.get('price_overview', {}).get('final_formatted', 'N/A'),
-                'rating': game_data.get('metacritic', {}).get('score', 'N/A'),
-                'steam_appid': app_id,
-                'release_date': game_data.get('release_date', {}).get('date', 'N/A'),
-                'url': f"https://store.steampowered.com/app/{app_id}"
-            }
-            games.append(game_info)
+            games.append(_game_info(app_id, game_data, prices.get(str(app_id))))
 
     return games, total_games
 
@@ -131,26 +196,26 @@ async def get_discounted_games(sort_option, page, page_size=5, retries=3, timeou
     logger.info(f"Получение игр со скидками, сортировка: {sort_option}, страница: {page}")
 
     for attempt in range(retries):
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
-            try:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    discounts = data.get('specials', {}).get('items', [])
-                    logger.info(f"Получено данных: {len(discounts)} игр со скидками")
-            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                logger.error(f"Ошибка при запросе к {url}: {e}")
-                if attempt == retries - 1:
-                    return [], 0
-                logger.info(f"Повторная попытка {attempt + 1} из {retries}")
-                continue
-            break
-
-    # Сортировка данных
+        session = http_client.get_session("steam")
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                response.raise_for_status()
+                data = await response.json()
+                discounts = data.get('specials', {}).get('items', [])
+                logger.info(f"Получено данных: {len(discounts)} игр со скидками")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Ошибка при запросе к {url}: {e}")
+            if attempt == retries - 1:
+                return [], 0
+            logger.info(f"Повторная попытка {attempt + 1} из {retries}")
+            continue
+        break
+
+    # Сортировка данных (элементы specials содержат цену и скидку, но не рейтинг)
     if sort_option == "rating":
         discounts.sort(key=lambda x: x.get('metacritic', {}).get('score', 0), reverse=True)
     elif sort_option == "price_asc":
-        discounts.sort(key=lambda x: x.get('price_overview', {}).get('final', float('inf')))
+        discounts.sort(key=lambda x: x.get('final_price', float('inf')))
     elif sort_option == "new":
         discounts.sort(key=lambda x: x.get('release_date', ''), reverse=True)
     elif sort_option == "discount":
@@ -159,68 +224,17 @@ async def get_discounted_games(sort_option, page, page_size=5, retries=3, timeou
     total_games = len(discounts)
     selected_games = discounts[(page - 1) * page_size:page * page_size]
 
+    # Название и цена уже есть в списке – из appdetails нужны только рейтинг и дата выхода
+    listing_prices = {str(game['id']): _listing_price(game) for game in selected_games}
+    details, prices = await enrich_page([game['id'] for game in selected_games], listing_prices)
+
     games = []
     for game in selected_games:
         app_id = game['id']
-        try:
-            game_data = await get_app_details(app_id)
-            if game_data:
-                game_info = {
-                    'name': game_data['name'],
-                    'price': game_data.get('price_overview', {}).get('final_formatted', 'N/A'),
-                    'rating': game_data.get('metacritic', {}).get('score', 'N/A'),
-                    'steam_appid': app_id,
-                    'release_date': game_data.get('release_date', {}).get('date', 'N/A'),
-                    'url': f"https://store.steampowered.com/app/{app_id}"
-                }
-                games.append(game_info)
-        except Exception as e:
-            logger.error(f"Ошибка при запросе к https://store.steampowered.com/api/appdetails?appids={app_id}&l=russian: {e}")
+        game_data = details.get(app_id) or {}
+        name = game.get('name') or game_data.get('name')
+        if name:
+            games.append(_game_info(app_id, game_data, prices.get(str(app_id)), name=name))
 
     logger.info(f"Возвращено игр: {len(games)}")
     return games, total_games
-
-async def search_games(query, page, page_size=5, retries=3, timeout=20):
-    url = "https://api.steampowered.com/ISteamApps/GetAppList/v2/"
-    logger.info(f"Поиск игр по запросу: {query}")
-
-    for attempt in range(retries):
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
-            try:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    logger.info(f"Получено данных: {len(data.get('applist', {}).get('apps', []))} игр")
-            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                logger.error(f"Ошибка при запросе к {url}: {e}")
-                if attempt == retries - 1:
-                    return [], 0
-                logger.info(f"Повторная попытка {attempt + 1} из {retries}")
-                continue
-            break
-
-    games_matching_query = [game for game in data['applist']['apps'] if query.lower() in game['name'].lower()]
-    logger.info(f"Найдено {len(games_matching_query)} игр по запросу: {query}")
-
-    selected_games = games_matching_query[(page - 1) * page_size:page * page_size]
-
-    games = []
-    for game in selected_games:
-        app_id = game['appid']
-        try:
-            game_data = await get_app_details(app_id)
-            if game_data:
-                game_info = {
-                    'name': game_data['name'],
-                    'price': game_data.get('price_overview', {}).get('final_formatted', 'N/A'),
-                    'rating': game_data.get('metacritic', {}).get('score', 'N/A'),
-                    'steam_appid': app_id,
-                    'release_date': game_data.get('release_date', {}).get('date', 'N/A'),
-                    'url': f"https://store.steampowered.com/app/{app_id}"
-                }
-                games.append(game_info)
-        except Exception as e:
-            logger.error(f"Ошибка при получении данных для игры с app_id={app_id}: {e}")
-
-    logger.info(f"Возвращено игр: {len(games)}")
-    return games, len(games_matching_query)
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""Ограничитель частоты и предохранитель (circuit breaker) для магазинов.
+
+Всплеск пользователей раньше превращался в пачку 429/403 от PS GraphQL,
+xbox.com и Epic, после чего каждый ждал таймаутов. Здесь на каждое
+семейство хостов из http_client (ps, ms, epic, ...) заведён StoreGuard:
+
+• TokenBucket – не больше rate запросов в секунду (с запасом burst);
+  лишние запросы ждут своей очереди, а не уходят в магазин;
+• предохранитель – после failure_threshold неудач подряд (5xx, 429,
+  403 и таймауты) магазин «выключается» на cooldown секунд: запросы сразу
+  падают с StoreUnavailable, а экран цен пишет «временно недоступен»;
+  затем пропускается один пробный запрос (half-open), и по его исходу
+  предохранитель закрывается или снова размыкается.
+
+http_client.get_session(family) отдаёт GuardedSession – обёртку над
+ClientSession, поэтому код магазинов менять не нужно. Токен берётся до
+начала запроса, так что ожидание в очереди не съедает ClientTimeout.
+Запросы через сторонние прокси (ps_proxies) идут мимо ограничителя.
+stats() – состояние всех ограничителей.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet
+
+import aiohttp
+from loguru import logger
+
+
+class StoreUnavailable(aiohttp.ClientError):
+    """Магазин временно отключён предохранителем."""
+
+
+_DEFAULT_FAILURES = frozenset({403, 429})
+
+
+@dataclass(frozen=True)
+class GuardConfig:
+    rate: float = 5                 # запросов в секунду в среднем
+    burst: int = 10                 # сколько можно отправить разом
+    failure_threshold: int = int(os.getenv("BREAKER_FAILURES", "5"))   # неудач подряд до размыкания
+    cooldown: float = float(os.getenv("BREAKER_COOLDOWN", "60"))       # сек. в разомкнутом состоянии
+    failure_statuses: FrozenSet[int] = field(default=_DEFAULT_FAILURES)  # кроме 5xx
+
+
+# --- Лимиты по семействам хостов (см. http_client.FAMILIES) ---
+GUARDS: Dict[str, GuardConfig] = {
+    "steam": GuardConfig(rate=10, burst=20),
+    "ps": GuardConfig(rate=8, burst=16),
+    "ms": GuardConfig(rate=5, burst=10),
+    "gog": GuardConfig(rate=5, burst=10),
+    # 403 у Epic – обычно челлендж Cloudflare, его решает cloudscraper в epic_client
+    "epic": GuardConfig(rate=4, burst=8, failure_statuses=frozenset({429})),
+    "nintendo": GuardConfig(rate=5, burst=10),
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0                 # сколько запросов ждали токен
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self) -> float:
+        """Сколько токенов можно взять прямо сейчас, без ожидания."""
+        self._refill()
+        return self.tokens
+
+    async def acquire(self) -> None:
+        # Под замком запросы получают токены строго по очереди
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                self.waited += 1
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class StoreGuard:
+    """Token bucket + предохранитель одного магазина."""
+
+    def __init__(self, name: str, cfg: GuardConfig):
+        self.name = name
+        self.cfg = cfg
+        self.bucket = TokenBucket(cfg.rate, cfg.burst)
+        self.state = "closed"           # closed | open | half_open
+        self.failures = 0               # неудач подряд
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial = False             # пробный запрос half-open уже в пути
+
+    # --- Предохранитель ---
+
+    def is_open(self) -> bool:
+        """True – магазин сейчас отключён (и пробный запрос ещё не разрешён)."""
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cfg.cooldown:
+            self.state = "half_open"
+            logger.info(f"[guard] {self.name}: пробный запрос после {self.cfg.cooldown:.0f} сек.")
+        return self.state == "open" or (self.state == "half_open" and self._trial)
+
+    def _check(self) -> None:
+        if self.is_open():
+            self.rejected += 1
+            raise StoreUnavailable(f"{self.name} временно недоступен")
+
+    async def before_request(self) -> bool:
+        """Ждёт токен и проверяет предохранитель. True – это пробный запрос half-open.
+
+        Пробный слот занимается только после ожидания токена: отмена в очереди
+        не оставляет его занятым навсегда.
+        """
+        self._check()
+        await self.bucket.acquire()
+        self._check()   # пока ждали токен, магазин могли отключить
+        if self.state == "half_open":
+            self._trial = True
+            return True
+        return False
+
+    def can_hedge(self) -> bool:
+        """Можно ли отправить страхующий повтор (http_client.hedged), не вставая в очередь."""
+        return self.state == "closed" and not self.bucket._lock.locked() and self.bucket.available() >= 1
+
+    def record(self, ok: bool) -> None:
+        self._trial = False
+        if ok:
+            if self.state != "closed":
+                logger.info(f"[guard] {self.name}: магазин снова доступен")
+            self.state = "closed"
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.cfg.failure_threshold:
+            if self.state != "open":
+                logger.warning(
+                    f"[guard] {self.name}: {self.failures} неудач подряд, отключаю на {self.cfg.cooldown:.0f} сек."
+                )
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_status(self, status: int) -> None:
+        self.record(status < 500 and status not in self.cfg.failure_statuses)
+
+    def release_trial(self) -> None:
+        """Запрос отменён вызывающим – исход неизвестен, пробный слот освобождается."""
+        self._trial = False
+
+    @asynccontextmanager
+    async def request(self, open_request: Callable[[], Any]) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Запрос под лимитом и предохранителем; open_request() открывает запрос aiohttp.
+
+        Исход – статус ответа или сетевая ошибка запроса. Отмена и ошибки в коде
+        вызывающего (разбор ответа и т.п.) на предохранитель не влияют.
+        """
+        trial = await self.before_request()
+        recorded = False
+        try:
+            async with open_request() as resp:
+                self.record_status(resp.status)
+                recorded = True
+                yield resp
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if not recorded:
+                self.record(False)
+                recorded = True
+            raise
+        finally:
+            if not recorded and trial:
+                self.release_trial()
+
+    def stats(self) -> Dict[str, Any]:
+        self.is_open()  # обновляет open → half_open по времени
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "tokens": round(self.bucket.tokens, 1),
+            "throttled": self.bucket.waited,
+            "retry_in": max(0.0, round(self.opened_at + self.cfg.cooldown - time.monotonic(), 1))
+            if self.state == "open" else 0.0,
+        }
+
+
+_GUARDS: Dict[str, StoreGuard] = {}
+
+
+def get(family: str) -> StoreGuard | None:
+    cfg = GUARDS.get(family)
+    if cfg is None:
+        return None
+    guard = _GUARDS.get(family)
+    if guard is None:
+        guard = _GUARDS[family] = StoreGuard(family, cfg)
+    return guard
+
+
+def is_open(family: str) -> bool:
+    """Магазин отключён предохранителем (для экрана цен – не ждать его)."""
+    guard = get(family)
+    return guard is not None and guard.is_open()
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {name: guard.stats() for name, guard in _GUARDS.items()}
+
+
+class GuardedSession:
+    """ClientSession семейства, запросы которой идут через StoreGuard.
+
+    Остальные атрибуты (closed, close(), cookie_jar, ...) – от исходной сессии.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, guard: StoreGuard):
+        self._session = session
+        self.guard = guard
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._session, name)
+
+    def request(self, method: str, url: Any, **kwargs: Any):
+        return self.guard.request(lambda: self._session.request(method, url, **kwargs))
+
+    def get(self, url: Any, **kwargs: Any):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: Any, **kwargs: Any):
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url: Any, **kwargs: Any):
+        kwargs.setdefault("allow_redirects", False)   # как у ClientSession.head
+        return self.request("HEAD", url, **kwargs)
+
+
+def wrap(family: str, session: aiohttp.ClientSession) -> aiohttp.ClientSession | GuardedSession:
+    """Сессия семейства под ограничителем (или как есть, если лимитов для него нет)."""
+    guard = get(family)
+    return session if guard is None else GuardedSession(session, guard)
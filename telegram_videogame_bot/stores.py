@@ -2,6 +2,8 @@ from config import STEAM_API_KEY
 import aiohttp
 import requests
 
+from telegram_videogame_bot import http_client, steam_app_index
+
 async def parse_steam(search_type, filters, page, page_size):
     base_url = "https://api.steampowered.com/path/to/endpoint"
     params = {
@@ -35,21 +37,16 @@ async def parse_steam(search_type, filters, page, page_size):
     return games
 
 async def get_steam_games_on_sale(query, page, page_size):
-    url = f"https://api.steampowered.com/ISteamApps/GetAppList/v2/?key={STEAM_API_KEY}&format=json"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            data = await response.json()
-
-    games_matching_query = [game for game in data['applist']['apps'] if query.lower() in game['name'].lower()]
+    games_matching_query = await steam_app_index.lookup(query, fuzzy=False)
+    session = http_client.get_session("steam")
     selected_games = games_matching_query[(page - 1) * page_size:page * page_size]
 
     games_on_sale = []
     for game in selected_games:
         app_id = game['appid']
         game_url = f"https://store.steampowered.com/api/appdetails?appids={app_id}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(game_url) as game_response:
-                game_data = await game_response.json()
+        async with session.get(game_url) as game_response:
+            game_data = await game_response.json()
 
         if game_data is not None and str(app_id) in game_data and game_data[str(app_id)]['success']:
             price_overview = game_data[str(app_id)]['data'].get('price_overview')
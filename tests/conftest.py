@@ -0,0 +1,12 @@
+import pathlib
+import sys
+
+# Бот запускается из telegram_videogame_bot/ (импорты вида "from config import ...")
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+for path in (ROOT, ROOT / "telegram_videogame_bot"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+FIXTURES = pathlib.Path(__file__).resolve().parent / "fixtures"
+# Сохранённые страницы PS Store лежат в корне репозитория (ps_search_debug.html, ds2_us.html, ...)
+PAGES = ROOT
@@ -0,0 +1,143 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+from telegram_videogame_bot import browser_pool
+
+
+class _Page:
+    def __init__(self):
+        self.closed = False
+
+    async def goto(self, url):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class _Context:
+    def __init__(self, pages):
+        self._pages = pages
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self):
+        page = _Page()
+        self._pages.append(page)
+        return page
+
+    async def close(self):
+        pass
+
+
+class _Browser:
+    def __init__(self, pages):
+        self._pages = pages
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, locale):
+        return _Context(self._pages)
+
+    async def close(self):
+        self.connected = False
+
+
+class _Playwright:
+    """Стенд вместо playwright: считает запущенные браузеры и созданные страницы."""
+
+    def __init__(self):
+        self.browsers, self.pages = [], []
+        self.chromium = self
+
+    def __call__(self):
+        return self
+
+    async def start(self):
+        return self
+
+    async def launch(self, args):
+        self.browsers.append(_Browser(self.pages))
+        return self.browsers[-1]
+
+    async def stop(self):
+        pass
+
+
+@pytest.fixture
+def fake_playwright(monkeypatch):
+    fake = _Playwright()
+    package = types.ModuleType("playwright")
+    api = types.ModuleType("playwright.async_api")
+    api.async_playwright = fake
+    monkeypatch.setitem(sys.modules, "playwright", package)
+    monkeypatch.setitem(sys.modules, "playwright.async_api", api)
+    return fake
+
+
+def test_pages_capped_and_reused(monkeypatch, fake_playwright):
+    monkeypatch.setattr(browser_pool, "MAX_PAGES", 2)
+    pool = browser_pool.BrowserPool()
+    peak = []
+
+    async def visit():
+        async with pool.page("en-US") as page:
+            peak.append(pool.stats()["in_use"])
+            await asyncio.sleep(0.01)
+            return page
+
+    async def scenario():
+        try:
+            return await asyncio.gather(*(visit() for _ in range(6)))
+        finally:
+            await pool.shutdown()
+
+    pages = asyncio.run(scenario())
+    assert max(peak) == 2
+    assert len(fake_playwright.browsers) == 1
+    assert len(fake_playwright.pages) == 2 and len(set(map(id, pages))) == 2   # очередь ждёт, страницы – те же
+
+
+def test_browser_recycled_after_limit(monkeypatch, fake_playwright):
+    monkeypatch.setattr(browser_pool, "RECYCLE_AFTER", 3)
+    pool = browser_pool.BrowserPool()
+
+    async def scenario():
+        try:
+            for _ in range(7):
+                async with pool.page("en-US"):
+                    pass
+        finally:
+            await pool.shutdown()
+
+    asyncio.run(scenario())
+    first, second, third = fake_playwright.browsers
+    assert not first.connected and not second.connected      # старые браузеры закрыты
+    assert pool.stats()["running"] is False                   # после shutdown()
+
+
+def test_broken_page_is_not_returned_to_pool(fake_playwright):
+    pool = browser_pool.BrowserPool()
+
+    async def scenario():
+        try:
+            with pytest.raises(RuntimeError):
+                async with pool.page():
+                    raise RuntimeError("timeout")
+            async with pool.page():
+                pass
+        finally:
+            await pool.shutdown()
+
+    asyncio.run(scenario())
+    broken, fresh = fake_playwright.pages
+    assert broken.closed and fresh is not broken
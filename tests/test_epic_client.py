@@ -0,0 +1,32 @@
+import asyncio
+
+from telegram_videogame_bot import epic_client, store_guard
+
+
+def test_open_breaker_skips_scraper_fallback(monkeypatch):
+    async def unavailable(*args, **kwargs):
+        raise store_guard.StoreUnavailable("epic временно недоступен")
+
+    async def scraper(*args, **kwargs):
+        raise AssertionError("cloudscraper не должен вызываться")
+
+    monkeypatch.setattr(epic_client, "_via_aiohttp", unavailable)
+    monkeypatch.setattr(epic_client, "_via_scraper", scraper)
+
+    assert asyncio.run(epic_client.request("GET", "https://store.epicgames.com/")) is None
+
+
+def test_scraper_cookies_are_published_on_loop_thread(monkeypatch):
+    def fake_call(method, url, kwargs):
+        return epic_client.EpicResponse(200, "ok", "scraper", {"cf_clearance": "abc"}, "UA/1")
+
+    monkeypatch.setattr(epic_client, "_scraper_call", fake_call)
+    monkeypatch.setattr(epic_client, "_cf_cookies", {})
+    monkeypatch.setattr(epic_client, "_cf_user_agent", "UA/0")
+    monkeypatch.setattr(epic_client, "_scraper_slots", None)
+
+    resp = asyncio.run(epic_client._via_scraper("GET", "https://x", json=None, headers={}, timeout=5))
+
+    assert resp.text == "ok"
+    assert epic_client._cf_cookies == {"cf_clearance": "abc"}
+    assert epic_client._cf_user_agent == "UA/1"
@@ -0,0 +1,27 @@
+import asyncio
+
+from telegram_videogame_bot import epic_store
+
+
+def test_prices_use_offer_id_from_search_in_other_region(monkeypatch):
+    async def fake_graphql(query, variables):
+        return {"data": {"Catalog": {"searchStore": {"elements": [
+            {"title": "Alan Wake 2", "productSlug": "alan-wake-2", "namespace": "dc9d2e", "id": "4ab4a4"},
+        ]}}}}
+
+    seen = {}
+
+    async def fake_fetch(game_id, regions, known):
+        seen["known"], seen["regions"] = known, regions
+        return {}
+
+    monkeypatch.setattr(epic_store, "_epic_graphql_request", fake_graphql)
+    monkeypatch.setattr(epic_store, "_fetch_multi_region", fake_fetch)
+
+    async def scenario():
+        games = await epic_store.search_games("alan wake", "US")
+        return await epic_store.get_offers_multi(games[0][0], ["RU", "TR"])
+
+    assert asyncio.run(scenario()) == {}
+    assert seen["regions"] == ["RU", "TR"]
+    assert seen["known"] == {"namespace": "dc9d2e", "id": "4ab4a4"}   # catalogOffer, а не поиск по slug
@@ -0,0 +1,60 @@
+import asyncio
+from collections import Counter
+
+from aiohttp import web
+from cachetools import TTLCache
+
+from telegram_videogame_bot import gog_store
+
+
+def _prices(final, base, currency):
+    return {"_embedded": {"prices": [{"finalPrice": f"{final} {currency}", "basePrice": f"{base} {currency}"}]}}
+
+
+def test_prices_per_country_with_empty_and_error_caching(monkeypatch):
+    hits = Counter()
+
+    async def prices(request):
+        country = request.query["countryCode"]
+        hits[country] += 1
+        if country == "TR":
+            return web.Response(status=404)                  # в стране не продаётся
+        if country == "AR":
+            return web.json_response({"_embedded": {"prices": []}})
+        if country == "PL":
+            return web.Response(status=502)                  # сбой – не кэшируется
+        return web.json_response(_prices(1499, 2999, "USD"))
+
+    async def product(request):
+        hits["product"] += 1
+        return web.json_response({"title": "The Witcher 3", "slug": "the_witcher_3_wild_hunt"})
+
+    for cache in ("PRICE_CACHE", "META_CACHE", "PRODUCT_CACHE"):
+        monkeypatch.setattr(getattr(gog_store, cache), "_l1", TTLCache(maxsize=64, ttl=60))
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/products/{id}/prices", prices)
+        app.router.add_get("/products/{id}", product)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/products/{{id}}"
+        monkeypatch.setattr(gog_store, "PRODUCT_API_URL_TEMPLATE", base)
+        monkeypatch.setattr(gog_store, "PRICES_API_URL_TEMPLATE", base + "/prices")
+        try:
+            first = await gog_store.get_offers_multi("gog:1207664643", ["us", "TR", "AR", "PL"])
+            second = await gog_store.get_offers_multi("gog:1207664643", ["US", "TR", "AR", "PL"])
+        finally:
+            await gog_store.http_client.shutdown()
+            await runner.cleanup()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert set(first) == set(second) == {"US"}
+    us = first["US"]
+    assert (us.price, us.currency, us.old_price, us.label) == (14.99, "USD", 29.99, "GOG.com US")
+    assert us.url == "https://www.gog.com/game/the_witcher_3_wild_hunt"
+    # «Не продаётся» кэшируется, ошибка – нет; карточка продукта – один раз
+    assert hits == {"US": 1, "TR": 1, "AR": 1, "PL": 2, "product": 1}
@@ -0,0 +1,130 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from telegram_videogame_bot import http_client, store_guard
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(http_client, "_HEDGE", {})
+    monkeypatch.setattr(store_guard, "_GUARDS", {})
+    monkeypatch.setattr(http_client, "HEDGE_ENABLED", True)
+
+
+def _warm(family, latency=0.05, n=30):
+    st = http_client._HEDGE.setdefault(family, http_client._HedgeStats())
+    st.latencies.extend([latency] * n)
+    return st
+
+
+def _slow_first(calls, cancelled, slow=1.0, fast=0.01, result=lambda n: {"n": n}):
+    async def factory():
+        n = len(calls)
+        calls.append(n)
+        try:
+            await asyncio.sleep(slow if n == 0 else fast)
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        return result(n)
+    return factory
+
+
+def test_hedge_wins_and_loser_is_cancelled():
+    st = _warm("t")
+    calls, cancelled = [], []
+
+    async def scenario():
+        result = await http_client.hedged("t", _slow_first(calls, cancelled))
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == {"n": 1}
+    assert calls == [0, 1] and cancelled == [0]
+    assert (st.hedges, st.hedge_wins) == (1, 1)
+
+
+def test_no_hedge_before_enough_samples():
+    calls, cancelled = [], []
+    _warm("t", n=http_client._HEDGE_MIN_SAMPLES - 1)
+    assert asyncio.run(http_client.hedged("t", _slow_first(calls, cancelled, slow=0.1))) == {"n": 0}
+    assert calls == [0]
+
+
+def test_budget_caps_hedges():
+    st = _warm("t")
+
+    async def scenario():
+        for _ in range(6):
+            await http_client.hedged("t", _slow_first([], [], slow=0.15))
+
+    asyncio.run(scenario())
+    assert st.calls == 6
+    assert st.hedges == http_client._HEDGE_BURST
+
+
+def test_latency_recorded_for_empty_and_failed_calls():
+    st = http_client._HEDGE.setdefault("t", http_client._HedgeStats())
+
+    async def empty():
+        return {}
+
+    async def failing():
+        raise ValueError("boom")
+
+    async def scenario():
+        assert await http_client.hedged("t", empty) == {}
+        with pytest.raises(ValueError):
+            await http_client.hedged("t", failing)
+
+    asyncio.run(scenario())
+    assert len(st.latencies) == 2
+
+
+def test_all_attempts_failing_raises_last_error():
+    _warm("t")
+    calls = []
+
+    async def factory():
+        n = len(calls)
+        calls.append(n)
+        await asyncio.sleep(0.2 if n == 0 else 0.01)
+        raise RuntimeError(f"attempt {n}")
+
+    with pytest.raises(RuntimeError, match="attempt 0"):
+        asyncio.run(http_client.hedged("t", factory))
+    assert calls == [0, 1]
+
+
+def test_no_hedge_when_store_is_throttled():
+    st = _warm("steam")
+    guard = store_guard.get("steam")
+    guard.bucket.tokens = 0
+    guard.bucket.rate = 0.01          # токен не появится за время теста
+    calls = []
+
+    asyncio.run(http_client.hedged("steam", _slow_first(calls, [], slow=0.2)))
+    assert calls == [0] and st.hedges == 0
+
+
+def test_sessions_are_lazy_shared_and_recreated_after_close(monkeypatch):
+    monkeypatch.setattr(http_client, "_SESSIONS", {})
+
+    async def scenario():
+        assert http_client._SESSIONS == {}                  # до первого обращения ничего не создано
+        steam = http_client.get_session("steam")
+        assert http_client.get_session("steam") is steam    # одна сессия на семейство
+        assert http_client.get_session("ps") is not steam
+        assert isinstance(steam, store_guard.GuardedSession)
+        assert isinstance(http_client.get_session("rates"), aiohttp.ClientSession)   # без лимитов – как есть
+        assert steam.connector.limit_per_host == http_client.FAMILIES["steam"].limit_per_host
+
+        await steam.close()
+        fresh = http_client.get_session("steam")
+        assert fresh is not steam and not fresh.closed
+        await http_client.shutdown()
+        assert http_client._SESSIONS == {} and fresh.closed
+
+    asyncio.run(scenario())
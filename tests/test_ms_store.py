@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from aiohttp import web
+from cachetools import TTLCache
+
+from conftest import FIXTURES
+from telegram_videogame_bot import ms_store
+
+
+def _catalog():
+    return json.loads((FIXTURES / "ms_displaycatalog.json").read_text(encoding="utf-8"))
+
+
+def test_parse_catalog_product_prices_and_game_pass():
+    product = _catalog()["Products"][0]
+    label, price, currency, url, game_pass, hardware, gp_price, old_price = ms_store._parse_catalog_product(product, "US")
+    assert (label, price, currency) == ("Xbox Store US", 29.99, "USD")
+    assert url == "https://www.xbox.com/en-us/games/store/x/9NBLGGH4R315"
+    assert game_pass is True
+    assert gp_price == 23.99          # цена для подписчиков – не обычная цена
+    assert old_price == 59.99
+    assert hardware == ["Xbox", "PC"]
+
+
+def test_parse_catalog_product_game_pass_only():
+    product = _catalog()["Products"][1]
+    assert ms_store._parse_catalog_product(product, "RU") == (
+        "Xbox Store", 0.0, "FREE", "https://www.xbox.com/ru-ru/games/store/x/9P4D0K92BM7V", True, ["PC"]
+    )
+
+
+def test_to_offer_keeps_subscription_price():
+    offer = ms_store._to_offer(ms_store._parse_catalog_product(_catalog()["Products"][0], "US"), "us")
+    assert offer.region == "US"
+    assert offer.game_pass and not offer.included
+    assert offer.subscription_price == 23.99
+
+
+def test_fetch_catalog_against_stand_in(monkeypatch):
+    async def scenario():
+        seen = {}
+
+        async def handler(request):
+            seen.update(request.query)
+            return web.json_response(_catalog())
+
+        app = web.Application()
+        app.router.add_get("/v7.0/products", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(ms_store, "_CATALOG_URL", f"http://127.0.0.1:{port}/v7.0/products")
+        try:
+            prices = await ms_store._fetch_catalog(["9NBLGGH4R315", "9P4D0K92BM7V"], "US")
+        finally:
+            await ms_store.http_client.shutdown()
+            await runner.cleanup()
+        return seen, prices
+
+    seen, prices = asyncio.run(scenario())
+    assert seen["bigIds"] == "9NBLGGH4R315,9P4D0K92BM7V"
+    assert seen["market"] == "US"
+    assert set(prices) == {"9NBLGGH4R315", "9P4D0K92BM7V"}
+
+
+def test_prices_bulk_fetches_only_cache_misses(monkeypatch):
+    calls = []
+
+    async def fake_fetch(pids, region):
+        calls.append((region, tuple(pids)))
+        return {pid: ("Xbox Store", 1.0, region, "", False, []) for pid in pids}
+
+    monkeypatch.setattr(ms_store._PRICE_CACHE, "_l1", TTLCache(maxsize=64, ttl=60))
+    monkeypatch.setattr(ms_store, "_fetch_catalog", fake_fetch)
+
+    async def scenario():
+        await ms_store._PRICE_CACHE.set(ms_store._price_key("A", "US"), ("cached",))
+        return await ms_store.get_prices_bulk(["A", "B"], ["us", "TR"])
+
+    result = asyncio.run(scenario())
+    assert result["US"]["A"] == ("cached",)
+    assert set(result["TR"]) == {"A", "B"}
+    assert sorted(calls) == [("TR", ("A", "B")), ("US", ("B",))]
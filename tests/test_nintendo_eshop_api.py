@@ -0,0 +1,98 @@
+import asyncio
+
+from cachetools import TTLCache
+
+from telegram_videogame_bot import nintendo_eshop_api
+from telegram_videogame_bot.nintendo_eshop_api import NintendoEshopAPI, NintendoGame
+
+
+def _price(nsuid, status, value, currency):
+    return {
+        "title_id": int(nsuid),
+        "sales_status": status,
+        "regular_price": {"raw_value": str(value), "currency": currency},
+    }
+
+
+def test_regional_price_under_another_nsuid(monkeypatch):
+    api = NintendoEshopAPI()
+    calls = []
+
+    async def fake_chunk(country, nsuids):
+        calls.append((country, tuple(nsuids)))
+        table = {
+            "US": [_price("70010000000001", "onsale", 59.99, "USD")],
+            # В Турции основной nsuid не продаётся, цена – у регионального издания
+            "TR": [_price("70010000000001", "not_found", 0, "TRY"), _price("70010000000002", "onsale", 1499, "TRY")],
+        }
+        return {str(p["title_id"]): p for p in table.get(country, [])}
+
+    monkeypatch.setattr(api, "_fetch_price_chunk", fake_chunk)
+    monkeypatch.setattr(nintendo_eshop_api._PRICE_CACHE, "_l1", TTLCache(maxsize=64, ttl=60))
+    game = NintendoGame("70010000000001", "Game", "Switch", nsuids=("70010000000001", "70010000000002"))
+
+    async def scenario():
+        await nintendo_eshop_api._NSUID_INDEX.set(game.nsuid, {
+            "title": game.title, "platform": game.platform, "image_url": None, "nsuids": list(game.nsuids),
+        })
+        return await api.get_offers(game.nsuid, ["US", "TR"])
+
+    offers = asyncio.run(scenario())
+    assert (offers["US"].price, offers["US"].currency) == (59.99, "USD")
+    assert (offers["TR"].price, offers["TR"].currency) == (1499.0, "TRY")
+    # Оба nsuid – в одном запросе на страну, без лишнего запроса по DE
+    assert sorted(calls) == [("TR", ("70010000000001", "70010000000002")), ("US", ("70010000000001", "70010000000002"))]
+
+
+def test_hedges_never_exceed_region_concurrency(monkeypatch):
+    from telegram_videogame_bot import http_client
+
+    api = NintendoEshopAPI()
+    inflight, peak = 0, []
+
+    async def slow_chunk(country, nsuids):
+        nonlocal inflight
+        inflight += 1
+        peak.append(inflight)
+        try:
+            await asyncio.sleep(0.2)     # заметно дольше p90 – повод для повтора
+        finally:
+            inflight -= 1
+        return {n: _price(n, "onsale", 10, "USD") for n in nsuids}
+
+    st = http_client._HedgeStats()
+    st.latencies.extend([0.05] * 30)
+    monkeypatch.setattr(http_client, "_HEDGE", {"nintendo": st})
+    monkeypatch.setattr(http_client, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(nintendo_eshop_api, "PRICE_REGION_CONCURRENCY", 2)
+    monkeypatch.setattr(nintendo_eshop_api._PRICE_CACHE, "_l1", TTLCache(maxsize=64, ttl=60))
+    monkeypatch.setattr(api, "_fetch_price_chunk", slow_chunk)
+
+    regions = ["US", "GB", "JP", "AU"]
+    result = asyncio.run(api.get_prices_bulk(["70010000000077"], regions))
+
+    assert sorted(result) == sorted(regions)
+    assert all(result[r] for r in regions)
+    assert max(peak) == 2
+    assert st.hedges == 0      # все слоты заняты первыми попытками
+
+
+def test_prices_bulk_fetches_only_cache_misses(monkeypatch):
+    api = NintendoEshopAPI()
+    calls = []
+
+    async def fake_chunk(country, nsuids):
+        calls.append((country, tuple(nsuids)))
+        return {n: _price(n, "onsale", 10, "USD") for n in nsuids}
+
+    monkeypatch.setattr(nintendo_eshop_api._PRICE_CACHE, "_l1", TTLCache(maxsize=64, ttl=60))
+    monkeypatch.setattr(api, "_fetch_price_chunk", fake_chunk)
+    cached = _price("70010000000001", "onsale", 5, "USD")
+
+    async def scenario():
+        await nintendo_eshop_api._PRICE_CACHE.set(("70010000000001", "US"), cached)
+        return await api.get_prices_bulk(["70010000000001", "70010000000002"], ["us", "GB"])
+
+    result = asyncio.run(scenario())
+    assert result["US"]["70010000000001"] == cached
+    assert sorted(calls) == [("GB", ("70010000000001", "70010000000002")), ("US", ("70010000000002",))]
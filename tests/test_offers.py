@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from telegram_videogame_bot import prices_func
+from telegram_videogame_bot.offers import FREE, Offer, normalize_prices
+from telegram_videogame_bot.prices_func import RateTable
+
+
+def _offer(price, currency, **kwargs):
+    return Offer(store="steam", region="US", label="Steam US", price=price, currency=currency, url="", **kwargs)
+
+
+def test_discount_percent():
+    assert _offer(29.99, "USD", old_price=59.99).discount == 50
+    assert _offer(59.99, "USD", old_price=59.99).discount == 0
+    assert _offer(59.99, "USD").discount == 0
+    assert _offer(0.0, "USD", old_price=19.99).discount == 0      # бесплатная раздача – не «скидка 100%»
+
+
+def test_normalize_prices_and_sort_order(monkeypatch):
+    table = RateTable()
+    table._apply({"USD": 100.0, "TRY": 2.5}, time.time())
+    monkeypatch.setattr(prices_func, "rates", table)
+
+    usd = _offer(10.0, "USD")
+    try_ = _offer(300.0, "TRY")
+    free = _offer(0.0, FREE)
+    sub = _offer(0.0, "USD", included=True)
+    unknown = _offer(5.0, "XYZ")
+    preset = _offer(1.0, "USD", price_rub=42.0)
+    offers = [usd, try_, free, sub, unknown, preset]
+
+    asyncio.run(normalize_prices(offers))
+
+    assert usd.price_rub == 1000.0 and try_.price_rub == 750.0
+    assert free.price_rub == 0.0 and unknown.price_rub is None
+    assert preset.price_rub == 42.0                               # уже посчитанная цена не трогается
+    assert not sub.is_free and sub.sort_price == 0.0              # в подписке – в начале, но не «бесплатно»
+    ordered = sorted(offers, key=lambda o: o.sort_price)
+    assert ordered[-1] is unknown                                 # без курса – в конце списка
+    assert [o.sort_price for o in ordered] == [0.0, 0.0, 42.0, 750.0, 1000.0, float("inf")]
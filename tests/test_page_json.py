@@ -0,0 +1,48 @@
+import json
+import re
+
+import pytest
+
+from conftest import PAGES
+from telegram_videogame_bot import page_json
+
+PS_PAGES = ["ps_search_debug.html", "ps_search_debug_2.html", "ds2_us.html", "rdr2_us.html"]
+
+
+def _read(name):
+    return (PAGES / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("name", PS_PAGES)
+def test_next_data_matches_regex_extraction(name):
+    html = _read(name)
+    # Прежний способ: нежадный DOTALL-регекс + json.loads
+    match = re.search(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', html, re.DOTALL)
+    assert page_json.extract_next_data(html) == json.loads(match.group(1))
+
+
+def test_next_data_search_page_structure():
+    data = page_json.extract_next_data(_read("ps_search_debug.html"))
+    assert data["page"] == "/[locale]/search/[searchTerm]/[[...page]]"
+    assert "apolloState" in data["props"]
+
+
+def test_next_data_missing_or_broken():
+    assert page_json.extract_next_data("<html><body>no data</body></html>") is None
+    assert page_json.extract_next_data('<script id="__NEXT_DATA__" type="application/json">{"a": </script>') is None
+    assert page_json.extract_next_data('<script id="__NEXT_DATA__" type="application/json">{"a": 1}') is None
+
+
+def test_extract_object_ignores_braces_in_strings():
+    html = (
+        '<script>window.__PRELOADED_STATE__ = {"core": {"productSummaries": '
+        '{"9NBLGGH4R315": {"title": "Game {Deluxe} \\"}\\" Edition", "price": 1}}, "other": 2}};</script>'
+    )
+    obj = page_json.extract_object(html, '"productSummaries":')
+    assert obj == {"9NBLGGH4R315": {"title": 'Game {Deluxe} "}" Edition', "price": 1}}
+
+
+def test_extract_object_missing_or_not_an_object():
+    assert page_json.extract_object("<html></html>", '"productSummaries":') is None
+    assert page_json.extract_object('{"productSummaries": [1, 2]}', '"productSummaries":') is None
+    assert page_json.extract_object('{"productSummaries": {"a": ', '"productSummaries":') is None
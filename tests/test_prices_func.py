@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from telegram_videogame_bot import prices_func
+from telegram_videogame_bot.prices_func import RateTable
+
+
+def test_static_table_until_loaded():
+    table = RateTable()
+    assert table.stale
+    assert table.convert(10, "USD", "RUB") == 910.0
+
+
+def test_same_currency_is_identity():
+    table = RateTable()
+    assert table.convert(12.345, "try", "TRY") == 12.345
+
+
+def test_cross_rate_goes_through_rub():
+    table = RateTable()
+    table._apply({"USD": 100.0, "TRY": 2.5}, time.time())
+    assert not table.stale
+    assert table.rate("USD", "TRY") == pytest.approx(40.0)
+    assert table.convert(1500, "TRY", "USD") == 37.5
+    assert table.convert(1, "usd", "rub") == 100.0
+
+
+def test_unknown_currency_returns_none():
+    table = RateTable()
+    assert table.convert(1, "XYZ", "RUB") is None
+    assert table.rate("RUB", "XYZ") is None
+
+
+def test_apply_keeps_static_fallback_and_marks_old_table_stale():
+    table = RateTable()
+    table._apply({"USD": 80.0}, time.time() - prices_func._RATE_CACHE.ttl - 1)
+    assert table.stale
+    assert table.to_rub["USD"] == 80.0
+    assert table.to_rub["PLN"] == prices_func._STATIC_RATES_TO_RUB["PLN"]   # нет в ответе API
+    assert table.to_rub["RUB"] == 1.0
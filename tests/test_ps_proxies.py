@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from telegram_videogame_bot import ps_proxies
+from telegram_videogame_bot.ps_proxies import ProxyManager
+
+A, B, C = "http://10.0.0.1:3128", "http://10.0.0.2:3128", "http://10.0.0.3:3128"
+
+
+def _manager(tmp_path):
+    manager = ProxyManager(path=str(tmp_path / "proxies.json"))
+    manager._apply({"tr": [A, B, C]})
+    return manager
+
+
+def test_unprobed_proxies_are_not_handed_out(tmp_path):
+    manager = _manager(tmp_path)
+    assert manager.best("TR") is None
+    manager.report(C, False, 0.1)
+    assert manager.best("TR") is None          # проверенный, но нерабочий – тоже нет
+    manager.report(A, True, 0.5)
+    assert manager.best("tr") == A
+
+
+def test_ewma_latency_and_success_pick_best(tmp_path):
+    manager = _manager(tmp_path)
+    manager.report(A, True, 0.5)
+    manager.report(B, True, 0.2)
+    assert manager.best("TR") == B
+
+    manager.report(B, False)
+    state = manager._find(B)
+    assert state.success == pytest.approx(1 - ps_proxies._ALPHA)
+    assert manager.best("TR") == B              # 0.2 / 0.7 всё ещё лучше 0.5 / 1.0
+    manager.report(B, False)
+    assert not state.healthy(0)                 # 0.49 < _HEALTHY_SUCCESS
+    assert manager.best("TR") == A
+
+    manager.report(A, True, 1.5)
+    assert manager._find(A).latency == pytest.approx(0.3 * 1.5 + 0.7 * 0.5)
+
+
+def test_ban_excludes_proxy_and_reload_keeps_stats(tmp_path):
+    manager = _manager(tmp_path)
+    manager.report(A, True, 0.5)
+    manager.report(B, True, 0.2)
+    manager.ban(B)
+    assert manager.best("TR") == A
+
+    (tmp_path / "proxies.json").write_text(json.dumps({"TR": [A, "http://10.0.0.4:3128"]}))
+    assert manager.reload()
+    assert manager._find(A).checks == 1 and manager._find(B) is None
+    assert [p["url"] for p in manager.stats()["TR"]][0] == A
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from cachetools import TTLCache
+
+from telegram_videogame_bot import ps_store
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(ps_store._CONCEPT_CACHE, "_l1", TTLCache(maxsize=64, ttl=60))
+    monkeypatch.setattr(ps_store._REGIONAL_ID_CACHE, "_l1", TTLCache(maxsize=64, ttl=60))
+
+
+def test_concept_page_fetched_once_per_region(monkeypatch):
+    calls = []
+
+    async def fake_fetch(concept_id, region):
+        calls.append((concept_id, region))
+        await asyncio.sleep(0.01)
+        return f"EP0001-CUSA00001_00-{region}"
+
+    monkeypatch.setattr(ps_store, "_fetch_product_id_from_concept", fake_fetch)
+
+    async def scenario():
+        # Одновременные запросы склеиваются, повторный – из кэша
+        first = await asyncio.gather(*(ps_store.get_product_id_from_concept("10001", "tr") for _ in range(3)))
+        again = await ps_store.get_product_id_from_concept("10001", "TR")
+        other = await ps_store.get_product_id_from_concept("10001", "US")
+        return first, again, other
+
+    first, again, other = asyncio.run(scenario())
+    assert set(first) == {again} == {"EP0001-CUSA00001_00-TR"}
+    assert other == "EP0001-CUSA00001_00-US"
+    assert calls == [("10001", "TR"), ("10001", "US")]
+
+
+def _resolver(monkeypatch, *, priced, concept=None, found=None):
+    """Подменяет сеть: цена есть только у priced, концепт ведёт на concept, поиск – на found."""
+    steps = []
+
+    async def fake_price(product_id, region):
+        steps.append(("price", product_id))
+        return {"webctas": [{"type": "ADD_TO_CART"}]} if product_id in priced else None
+
+    async def fake_concept(concept_id, region):
+        steps.append(("concept", concept_id))
+        return concept
+
+    async def fake_search(session, query, lang, country, invariant_name, limit=40):
+        steps.append(("search", country))
+        return [{"id": found}] if found else []
+
+    monkeypatch.setattr(ps_store, "_fetch_price_product", fake_price)
+    monkeypatch.setattr(ps_store, "get_product_id_from_concept", fake_concept)
+    monkeypatch.setattr(ps_store, "search_ps_store_games_for_country", fake_search)
+    return steps
+
+
+def _resolve(region, **kwargs):
+    return asyncio.run(ps_store.resolve_regional_product_id(
+        "UP1004-CUSA03041_00-REDEMPTION000002", region, name="Red Dead Redemption 2",
+        invariant_name="red dead redemption 2", concept_id="10000001", **kwargs,
+    ))
+
+
+def test_regional_id_from_sku_prefix_without_search(monkeypatch):
+    steps = _resolver(monkeypatch, priced={"EP1004-CUSA03041_00-REDEMPTION000002"})
+    assert _resolve("tr") == "EP1004-CUSA03041_00-REDEMPTION000002"
+    assert steps == [("price", "EP1004-CUSA03041_00-REDEMPTION000002")]
+
+    steps.clear()
+    assert _resolve("TR") == "EP1004-CUSA03041_00-REDEMPTION000002"   # из кэша
+    assert steps == []
+
+
+def test_regional_id_falls_back_to_concept_then_search(monkeypatch):
+    steps = _resolver(monkeypatch, priced={"EP1004-CUSA08519_00-REDEMPTIONFULL02"},
+                      concept="EP1004-CUSA08519_00-REDEMPTIONFULL02")
+    assert _resolve("PL") == "EP1004-CUSA08519_00-REDEMPTIONFULL02"
+    assert [s[0] for s in steps] == ["price", "price", "concept", "price"]
+
+    steps = _resolver(monkeypatch, priced=set(), found="EP1004-PPSA01234_00-REDEMPTION2PS5")
+    assert _resolve("IN") == "EP1004-PPSA01234_00-REDEMPTION2PS5"
+    assert [s[0] for s in steps] == ["price", "price", "concept", "search"]     # концепт ничего не дал
+    assert steps[-1] == ("search", "IN")
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from telegram_videogame_bot import singleflight
+
+
+def test_concurrent_calls_share_one_request():
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"price": 1}
+
+    async def scenario():
+        results = await asyncio.gather(*(singleflight.run(("ps", "product", "X", "US"), factory) for _ in range(5)))
+        assert singleflight.inflight() == 0
+        return results
+
+    results = asyncio.run(scenario())
+    assert calls == [1]
+    assert all(r is results[0] for r in results)
+
+
+def test_different_keys_are_not_merged():
+    calls = []
+
+    async def factory(region):
+        calls.append(region)
+        await asyncio.sleep(0)
+        return region
+
+    async def scenario():
+        return await asyncio.gather(
+            singleflight.run(("steam", "prices", "1", "RU"), lambda: factory("RU")),
+            singleflight.run(("steam", "prices", "1", "US"), lambda: factory("US")),
+        )
+
+    assert asyncio.run(scenario()) == ["RU", "US"]
+    assert sorted(calls) == ["RU", "US"]
+
+
+def test_error_reaches_every_waiter_and_key_is_released():
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("HTTP 500")
+
+    async def ok():
+        return "ok"
+
+    async def scenario():
+        results = await asyncio.gather(
+            *(singleflight.run("k", failing) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        # После ошибки ключ свободен – следующий вызов делает новый запрос
+        return await singleflight.run("k", ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert calls == [1]
+
+
+def test_cancelled_waiter_does_not_cancel_shared_request():
+    async def factory():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def scenario():
+        first = asyncio.create_task(singleflight.run("k2", factory))
+        second = asyncio.create_task(singleflight.run("k2", factory))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == 42
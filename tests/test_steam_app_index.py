@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from telegram_videogame_bot import steam_app_index
+from telegram_videogame_bot.steam_app_index import SteamAppIndex, _build
+
+APPS = {
+    10: "Counter-Strike",
+    730: "Counter-Strike 2",
+    1091500: "Cyberpunk 2077",
+    1245620: "ELDEN RING",
+    2050650: "Resident Evil 4",
+    883710: "Resident Evil 2",
+    570: "Dota 2",
+    4000: "Garry's Mod",
+}
+
+
+def _index():
+    idx = SteamAppIndex(path="/nonexistent/steam_apps.json.gz")
+    idx._snap = _build(APPS)
+    return idx
+
+
+def test_search_substring_ranked_exact_prefix_other():
+    idx = _index()
+    assert [a["appid"] for a in idx.search("counter-strike")] == [10, 730]
+    assert [a["name"] for a in idx.search("EVIL")] == ["Resident Evil 2", "Resident Evil 4"]
+    assert idx.search("  elden   ring ") == [{"appid": 1245620, "name": "ELDEN RING"}]
+    assert idx.search("half-life") == []
+
+
+def test_search_short_query_is_prefix():
+    idx = _index()
+    assert [a["appid"] for a in idx.search("do")] == [570]
+    assert idx.search("a") == []                       # «a» – не префикс ни одного названия
+
+
+def test_fuzzy_handles_typos_and_word_order():
+    idx = _index()
+    assert idx.fuzzy("cyberpnk 2077")[0]["appid"] == 1091500
+    assert idx.fuzzy("ring elden")[0]["appid"] == 1245620
+
+
+def test_lookup_falls_back_to_storesearch_until_ready(monkeypatch):
+    async def fake_search(query, limit=20):
+        return [("steam:1091500", "Cyberpunk 2077")]
+
+    monkeypatch.setattr(steam_app_index.steam_store, "search_games", fake_search)
+    monkeypatch.setattr(steam_app_index, "index", SteamAppIndex(path="/nonexistent/steam_apps.json.gz"))
+    assert asyncio.run(steam_app_index.lookup("cyberpunk")) == [{"appid": 1091500, "name": "Cyberpunk 2077"}]
+
+    monkeypatch.setattr(steam_app_index, "index", _index())
+    assert asyncio.run(steam_app_index.lookup("cyberpnk 2077"))[0]["appid"] == 1091500
+    assert asyncio.run(steam_app_index.lookup("cyberpnk 2077", fuzzy=False)) == []
+
+
+def test_weekly_full_refresh_drops_delisted_apps(monkeypatch, tmp_path):
+    idx = SteamAppIndex(path=str(tmp_path / "steam_apps.json.gz"))
+    idx._snap = _build(APPS)
+    idx.updated_at = idx.full_at = time.time()
+    requested = []
+
+    async def fake_changes(since):
+        requested.append(since)
+        if since is None:
+            return {appid: name for appid, name in APPS.items() if appid != 4000}   # Garry's Mod снят
+        return {2358720: "Black Myth: Wukong"}
+
+    monkeypatch.setattr(idx, "_fetch_changes", fake_changes)
+
+    asyncio.run(idx.refresh())
+    assert requested[-1] is not None                  # недавно был полный – только изменения
+    assert idx.search("garry") and idx.search("wukong")
+
+    idx.full_at -= steam_app_index._FULL_REBUILD_INTERVAL
+    asyncio.run(idx.refresh())
+    assert requested[-1] is None
+    assert idx.search("garry") == [] and idx.search("wukong") == []
+
+    reloaded = SteamAppIndex(path=idx.path)
+    assert asyncio.run(reloaded.load())
+    assert reloaded.full_at == idx.full_at and len(reloaded) == len(APPS) - 1
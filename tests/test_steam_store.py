@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from aiohttp import web
+from cachetools import TTLCache
+
+from telegram_videogame_bot import steam_store, store_cache
+
+
+def test_stale_prices_refresh_in_batches(monkeypatch):
+    calls = []
+
+    async def fake_fetch(appids, region):
+        calls.append((len(appids), region))
+        return {appid: ("Steam", 1.0, "RUB") for appid in appids}
+
+    monkeypatch.setattr(steam_store, "_fetch_prices", fake_fetch)
+    monkeypatch.setattr(steam_store._PRICE_CACHE, "_l1", TTLCache(maxsize=256, ttl=60 * 60))
+    appids = [str(i) for i in range(1000, 1060)]
+    stale = time.time() - steam_store._PRICE_CACHE.soft_ttl - 1
+    for appid in appids:
+        steam_store._PRICE_CACHE._l1[steam_store._price_key(appid, "RU")] = (("Steam", 2.0, "RUB"), stale)
+
+    async def scenario():
+        bulk = await steam_store.get_prices_bulk(appids, ["RU"])
+        assert not calls                      # устаревшие цены отдаются сразу
+        assert len(bulk["RU"]) == 60
+        await asyncio.sleep(0.05)             # фоновое обновление
+        return bulk
+
+    asyncio.run(scenario())
+    assert sorted(calls) == [(10, "RU"), (50, "RU")]
+    assert steam_store._PRICE_CACHE.peek(steam_store._price_key("1000", "RU"))[1] == 1.0
+
+
+def test_missing_prices_fetched_in_chunks(monkeypatch):
+    calls = []
+
+    async def fake_fetch(appids, region):
+        calls.append((len(appids), region))
+        return {appid: ("Steam US", 9.99, "USD") for appid in appids if appid != "2000"}
+
+    monkeypatch.setattr(steam_store, "_fetch_prices", fake_fetch)
+    monkeypatch.setattr(steam_store._PRICE_CACHE, "_l1", TTLCache(maxsize=256, ttl=60 * 60))
+    appids = [str(i) for i in range(2000, 2070)]
+
+    bulk = asyncio.run(steam_store.get_prices_bulk(appids, ["US"]))
+    assert sorted(calls) == [(20, "US"), (50, "US")]
+    assert len(bulk["US"]) == 69 and "2000" not in bulk["US"]
+
+
+def test_free_titles_detected_from_basic_appdetails(monkeypatch):
+    basic_calls = []
+
+    async def handler(request):
+        appids = request.query["appids"]
+        if request.query["filters"] == "basic":
+            basic_calls.append(appids)
+            return web.json_response({appids: {"success": True, "data": {"is_free": appids == "570"}}})
+        # price_overview: бесплатные и не продающиеся игры приходят как "data": []
+        return web.json_response({
+            "570": {"success": True, "data": []},
+            "999": {"success": True, "data": []},
+            "10": {"success": True, "data": {"price_overview": {"currency": "USD", "initial": 999, "final": 499}}},
+        })
+
+    monkeypatch.setattr(steam_store, "_FREE_CACHE", store_cache.TieredCache("t:free", TTLCache(maxsize=16, ttl=60)))
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/api/appdetails", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(steam_store, "STEAM_APPDETAILS_URL", f"http://127.0.0.1:{port}/api/appdetails")
+        try:
+            first = await steam_store._fetch_prices(["570", "999", "10"], "US")
+            second = await steam_store._fetch_prices(["570", "999", "10"], "US")
+        finally:
+            await steam_store.http_client.shutdown()
+            await runner.cleanup()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == {
+        "570": ("Steam US", 0.0, "FREE"),
+        "10": ("Steam US", 4.99, "USD", 9.99),
+    }
+    assert sorted(basic_calls) == ["570", "999"]      # второй раз – из кэша
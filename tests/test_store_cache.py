@@ -0,0 +1,191 @@
+import asyncio
+import time
+
+import pytest
+from cachetools import TTLCache
+
+from telegram_videogame_bot import store_cache
+from telegram_videogame_bot.store_cache import TieredCache
+
+
+@pytest.fixture
+def l2_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_cache, "CACHE_PATH", str(tmp_path / "store_cache.db"))
+    monkeypatch.setattr(store_cache, "_db", None)
+    return tmp_path / "store_cache.db"
+
+
+def _cache(ns="test", ttl=60, **kwargs):
+    return TieredCache(ns, TTLCache(maxsize=128, ttl=ttl), **kwargs)
+
+
+def test_l1_only_without_startup(monkeypatch):
+    monkeypatch.setattr(store_cache, "_db", None)
+    cache = _cache()
+
+    async def scenario():
+        await cache.set(("US", "steam:1"), ("Steam US", 9.99, "USD"))
+        return await cache.get(("US", "steam:1")), await cache.get("missing", "default")
+
+    assert asyncio.run(scenario()) == (("Steam US", 9.99, "USD"), "default")
+
+
+def test_expired_entry_is_a_miss(monkeypatch):
+    monkeypatch.setattr(store_cache, "_db", None)
+    cache = _cache(ttl=60)
+    cache._l1["k"] = ("old", time.time() - 61)
+    assert asyncio.run(cache.get("k")) is None
+    assert cache.peek("k") is None
+
+
+def test_l2_survives_restart_and_returns_lists(l2_path):
+    async def scenario():
+        await store_cache.startup()
+        await _cache("ps:product").set(("EP0001", "TR"), ("PS Store TR", 799.0, "TRY"))
+        await store_cache.shutdown()
+
+        # «Рестарт»: пустой L1, тот же файл L2
+        await store_cache.startup()
+        cache = _cache("ps:product")
+        value = await cache.get(("EP0001", "TR"))
+        other_ns = await _cache("ms:price").get(("EP0001", "TR"))
+        await store_cache.shutdown()
+        return value, other_ns, cache.peek(("EP0001", "TR"))
+
+    value, other_ns, promoted = asyncio.run(scenario())
+    assert value == ["PS Store TR", 799.0, "TRY"]   # кортежи из JSON – списками
+    assert other_ns is None
+    assert promoted == value                         # поднято в L1
+
+
+def test_l2_respects_ttl(l2_path):
+    async def scenario():
+        await store_cache.startup()
+        cache = _cache("short", ttl=0.05)
+        await cache.set("k", 1)
+        await asyncio.sleep(0.1)
+        fresh = _cache("short", ttl=0.05)
+        value = await fresh.get("k")
+        await store_cache.shutdown()
+        return value
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_get_many_reads_l2_in_one_query(l2_path, monkeypatch):
+    async def scenario():
+        await store_cache.startup()
+        await _cache("steam:price").set_many((f"steam:{i}:RU", i) for i in range(1200))
+
+        calls = []
+        original = store_cache._l2_get_many
+
+        async def counting(namespace, keys):
+            calls.append(len(keys))
+            return await original(namespace, keys)
+
+        monkeypatch.setattr(store_cache, "_l2_get_many", counting)
+        cache = _cache("steam:price")
+        cache._l1["steam:0:RU"] = (0, time.time())
+        keys = [f"steam:{i}:RU" for i in range(1200)] + ["steam:missing:RU"]
+        found = await cache.get_many(keys)
+        await store_cache.shutdown()
+        return calls, found
+
+    calls, found = asyncio.run(scenario())
+    assert calls == [1200]                           # всё, кроме попадания в L1
+    assert len(found) == 1200 and found["steam:1199:RU"] == 1199
+
+
+def test_eviction_drops_oldest_entries(l2_path, monkeypatch):
+    async def scenario():
+        await store_cache.startup()
+        cache = _cache("big", ttl=3600)
+        for i in range(20):
+            await cache.set(f"k{i}", "x" * 100)
+        monkeypatch.setattr(store_cache, "_MAX_BYTES", 1000)
+        await store_cache._evict()
+        async with store_cache._db.execute("SELECT key FROM entries ORDER BY stored_at") as cur:
+            keys = [row[0] for row in await cur.fetchall()]
+        await store_cache.shutdown()
+        return keys
+
+    keys = asyncio.run(scenario())
+    assert len(keys) <= 10
+    assert keys[-1] == "k19"                         # самые свежие остаются
+
+
+def test_soft_ttl_serves_stale_and_refreshes_once(monkeypatch):
+    monkeypatch.setattr(store_cache, "_db", None)
+    cache = _cache("ps:product", ttl=3600, soft_ttl=10)
+    cache._l1["k"] = ("stale", time.time() - 20)
+    calls = []
+
+    async def refresh():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        await cache.set("k", "fresh")
+
+    async def scenario():
+        stale = await asyncio.gather(*(cache.get("k", refresh=refresh) for _ in range(3)))
+        await asyncio.sleep(0.05)
+        return stale, await cache.get("k", refresh=refresh)
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale == ["stale"] * 3                    # ответ сразу, без ожидания обновления
+    assert fresh == "fresh"
+    assert calls == [1]                              # одно фоновое обновление на ключ
+
+
+def test_fresh_entry_is_not_refreshed(monkeypatch):
+    monkeypatch.setattr(store_cache, "_db", None)
+    cache = _cache(ttl=3600, soft_ttl=10)
+    calls = []
+
+    async def refresh():
+        calls.append(1)
+
+    async def scenario():
+        await cache.set("k", 1)
+        value = await cache.get("k", refresh=refresh)
+        await asyncio.sleep(0)
+        return value
+
+    assert asyncio.run(scenario()) == 1
+    assert calls == []
+
+
+def test_failed_refresh_keeps_stale_value(monkeypatch):
+    monkeypatch.setattr(store_cache, "_db", None)
+    cache = _cache(ttl=3600, soft_ttl=10)
+    cache._l1["k"] = ("stale", time.time() - 20)
+
+    async def refresh():
+        raise RuntimeError("HTTP 503")
+
+    async def scenario():
+        await cache.get("k", refresh=refresh)
+        await asyncio.sleep(0.01)
+        return await cache.get("k"), cache._refreshing
+
+    assert asyncio.run(scenario()) == ("stale", set())
+
+
+def test_get_many_refreshes_stale_keys_in_one_call(monkeypatch):
+    monkeypatch.setattr(store_cache, "_db", None)
+    cache = _cache(ttl=3600, soft_ttl=10)
+    now = time.time()
+    for i in range(5):
+        cache._l1[f"k{i}"] = (i, now - 20 if i % 2 else now)
+    batches = []
+
+    async def refresh(keys):
+        batches.append(sorted(keys))
+
+    async def scenario():
+        found = await cache.get_many([f"k{i}" for i in range(5)], refresh=refresh)
+        await asyncio.sleep(0.01)
+        return found
+
+    assert asyncio.run(scenario()) == {f"k{i}": i for i in range(5)}
+    assert batches == [["k1", "k3"]]
@@ -0,0 +1,62 @@
+import asyncio
+
+from cachetools import TTLCache
+
+from telegram_videogame_bot import store_func
+
+
+class _Response:
+    def __init__(self, data):
+        self._data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return self._data
+
+
+class _Session:
+    """Отвечает appdetails полным набором полей; английское описание – отдельным запросом."""
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        english = url.endswith("l=english")
+        return _Response({"620": {"success": True, "data": {
+            "name": "Portal 2",
+            "short_description": "Co-op puzzles" if english else "",
+            "metacritic": {"score": 95},
+            "release_date": {"date": "18 Apr, 2011"},
+            "screenshots": [{"id": 0}] * 30,
+            "pc_requirements": {"minimum": "<ul>...</ul>"},
+            "detailed_description": "x" * 10000,
+        }}})
+
+
+def test_details_trimmed_cached_and_fetched_once(monkeypatch):
+    session = _Session()
+    monkeypatch.setattr(store_func.http_client, "get_session", lambda family: session)
+    monkeypatch.setattr(store_func._DETAILS_CACHE, "_l1", TTLCache(maxsize=16, ttl=60))
+
+    async def scenario():
+        first = await store_func.get_details_many([620, 620])
+        again = await store_func.get_app_details(620)
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert set(store_func._DETAILS_CACHE.peek("620")) <= set(store_func._DETAIL_FIELDS)
+    assert "screenshots" not in again and "detailed_description" not in again
+    assert again["short_description"] == "Co-op puzzles\n\n*Русского описания нет*"
+    assert again["url"] == "https://store.steampowered.com/app/620"
+    assert first[620] == again
+    # Русский запрос и английский фолбэк – один раз на весь срок кэша
+    assert len(session.urls) == 2
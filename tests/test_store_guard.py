@@ -0,0 +1,177 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiohttp
+import pytest
+
+from telegram_videogame_bot import store_guard
+from telegram_videogame_bot.store_guard import GuardConfig, StoreGuard, StoreUnavailable
+
+
+class _Resp:
+    def __init__(self, status):
+        self.status = status
+
+
+def _open(status=200, delay=0.0, exc=None):
+    @asynccontextmanager
+    async def opener():
+        await asyncio.sleep(delay)
+        if exc is not None:
+            raise exc
+        yield _Resp(status)
+    return opener
+
+
+async def _call(guard, **kwargs):
+    async with guard.request(_open(**kwargs)) as resp:
+        return resp.status
+
+
+def _guard(**kwargs):
+    cfg = dict(rate=1000, burst=1000, failure_threshold=2, cooldown=0.05)
+    cfg.update(kwargs)
+    return StoreGuard("test", GuardConfig(**cfg))
+
+
+def _trip(guard):
+    async def scenario():
+        for _ in range(guard.cfg.failure_threshold):
+            await _call(guard, status=503)
+    asyncio.run(scenario())
+    assert guard.state == "open"
+
+
+def test_opens_after_consecutive_failures_and_rejects():
+    guard = _guard()
+
+    async def scenario():
+        assert await _call(guard, status=503) == 503
+        assert guard.state == "closed"
+        with pytest.raises(aiohttp.ClientError):
+            await _call(guard, exc=aiohttp.ClientConnectionError("reset"))
+        assert guard.state == "open"
+        with pytest.raises(StoreUnavailable):
+            await _call(guard)
+
+    asyncio.run(scenario())
+    assert guard.rejected == 1
+
+
+def test_success_resets_failure_count():
+    guard = _guard(failure_threshold=3)
+
+    async def scenario():
+        for status in (503, 429, 200, 503, 503):
+            await _call(guard, status=status)
+
+    asyncio.run(scenario())
+    assert guard.state == "closed" and guard.failures == 2
+
+
+def test_failure_statuses_per_store():
+    epic = _guard(failure_statuses=frozenset({429}), failure_threshold=1)
+
+    async def scenario():
+        await _call(epic, status=403)     # челлендж Cloudflare – не сбой магазина
+        assert epic.state == "closed"
+        await _call(epic, status=429)
+
+    asyncio.run(scenario())
+    assert epic.state == "open"
+
+
+def test_half_open_trial_success_closes():
+    guard = _guard()
+    _trip(guard)
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        trial = asyncio.create_task(_call(guard, delay=0.02))
+        await asyncio.sleep(0.005)
+        assert guard.state == "half_open"
+        with pytest.raises(StoreUnavailable):   # второй запрос, пока идёт пробный
+            await _call(guard)
+        return await trial
+
+    assert asyncio.run(scenario()) == 200
+    assert guard.state == "closed"
+
+
+def test_half_open_trial_failure_reopens():
+    guard = _guard()
+    _trip(guard)
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        await _call(guard, status=503)
+
+    asyncio.run(scenario())
+    assert guard.state == "open"
+
+
+def test_cancelled_trial_releases_the_slot():
+    guard = _guard()
+    _trip(guard)
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        trial = asyncio.create_task(_call(guard, delay=1))
+        await asyncio.sleep(0.01)
+        assert guard._trial and guard.is_open()
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        assert guard.state == "half_open" and not guard.is_open()
+        return await _call(guard)
+
+    assert asyncio.run(scenario()) == 200
+    assert guard.state == "closed"
+
+
+def test_cancel_while_waiting_for_token_keeps_store_usable():
+    guard = _guard(rate=1, burst=1)
+    _trip(guard)
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        guard.bucket.tokens = 0
+        waiting = asyncio.create_task(_call(guard))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert not guard._trial and not guard.is_open()
+
+    asyncio.run(scenario())
+
+
+def test_caller_errors_after_response_are_not_store_failures():
+    guard = _guard(failure_threshold=1)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            async with guard.request(_open(status=200)):
+                raise ValueError("bad JSON")
+
+    asyncio.run(scenario())
+    assert guard.state == "closed" and guard.failures == 0
+
+
+def test_token_bucket_throttles():
+    guard = _guard(rate=50, burst=2)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(4):
+            await _call(guard)
+        return loop.time() - started
+
+    assert asyncio.run(scenario()) >= 0.035          # 2 сверх burst при 50/сек
+    assert guard.bucket.waited == 2
+
+
+def test_unguarded_family_is_passed_through(monkeypatch):
+    monkeypatch.setattr(store_guard, "_GUARDS", {})
+    session = object()
+    assert store_guard.wrap("rates", session) is session
+    assert isinstance(store_guard.wrap("ps", session), store_guard.GuardedSession)